@@ -16,7 +16,10 @@ from app.core.database import Base  # noqa: F401, E402
 from app.generator.models import UrlShorted  # noqa: F401, E402
 
 config = context.config
-fileConfig(config.config_file_name)
+# Processes that already set up logging (the app, when migrating on startup)
+# keep it: fileConfig would disable their loggers and replace their handlers
+if config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
 
 target_metadata = Base.metadata
 
@@ -0,0 +1,58 @@
+"""url_shortened change feed
+
+Revision ID: 5e2c9a7f41d3
+Revises: bbb6d6464af5
+Create Date: 2026-10-19 10:24:51.318204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5e2c9a7f41d3"
+down_revision: Union[str, None] = "bbb6d6464af5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Notifies a row change on channel url_shortened_changes (read by
+    # app.generator.changefeed). NOTIFY payloads are limited to 8000 bytes,
+    # so a URL too long to fit is left out and the change only invalidates
+    # the cached token. Only the function is created: notifying transactions
+    # serialize on a global lock at commit, so the trigger calling it is
+    # installed by `python -m app.generator.changefeed enable`, when the
+    # change feed is turned on.
+    op.execute(
+        """
+        CREATE FUNCTION url_shortened_notify() RETURNS trigger AS $$
+        DECLARE
+            changed_at double precision := extract(epoch FROM clock_timestamp());
+            payload text;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                payload := json_build_object('id', OLD.id, 'at', changed_at);
+            ELSE
+                payload := json_build_object(
+                    'id', NEW.id, 'url', NEW.url, 'at', changed_at
+                );
+                IF octet_length(payload) > 7900 THEN
+                    payload := json_build_object('id', NEW.id, 'at', changed_at);
+                END IF;
+            END IF;
+            PERFORM pg_notify('url_shortened_changes', payload);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS url_shortened_change_feed ON url_shortened")
+    op.execute("DROP FUNCTION url_shortened_notify()")
@@ -1,6 +1,16 @@
+import logging
+
 import pytest
 import fakeredis
+from sqlalchemy import Insert
 import app.generator.service as _service
+import app.generator.warmup as _warmup
+import app.dependencies as _dependencies
+from app.core.circuit import db_breaker, redis_breaker
+from app.core.cache import KeyCache
+from app.core.logs import AsyncQueueHandler
+from app.generator.models import UrlShorted
+from app.generator.tokens import TokenLength
 from fastapi.testclient import TestClient
 
 from app.main import app
@@ -28,8 +38,14 @@ class FakeSession:
     def add(self, entry):
         self.added.append(entry)
 
-    async def execute(self, stmt):
+    async def merge(self, entry):
+        self.added.append(entry)
+        return entry
+
+    async def execute(self, stmt, params=None):
         self.exec_args.append(stmt)
+        if isinstance(stmt, Insert):
+            self.added.append(UrlShorted(**params))
 
         class Result:
             def __init__(self, val):
@@ -38,6 +54,9 @@ class FakeSession:
             def scalar_one_or_none(self):
                 return self._val
 
+            def all(self):
+                return self._val or []
+
         return Result(self._return_value)
 
 
@@ -45,12 +64,31 @@ class FakeSession:
 def make_redis_client(monkeypatch):
     def _make():
         fake = fakeredis.FakeRedis(decode_responses=True)
-        monkeypatch.setattr(_service, "redis_client", fake)
+        monkeypatch.setattr(_service, "url_cache", KeyCache(fake))
         return fake
 
     return _make
 
 
+@pytest.fixture
+def make_session_factory():
+    """
+    Builds a replacement for AsyncSessionLocal that yields the given session.
+    """
+
+    def _make(session):
+        class _SessionContext:
+            async def __aenter__(self):
+                return session
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return lambda: _SessionContext()
+
+    return _make
+
+
 @pytest.fixture
 def make_db_session():
     def _make(commit_side_effects=None, return_value=None):
@@ -82,6 +120,43 @@ def override_get_db(monkeypatch, db_session):
 def patch_service_settings(monkeypatch):
     monkeypatch.setattr(_service, "BASE_URL", "http://short")
     monkeypatch.setattr(_service, "CACHE_DEFAULT_TIMEOUT", 60)
+    monkeypatch.setattr(
+        _service, "token_length", TokenLength(client=fakeredis.FakeRedis())
+    )
+    monkeypatch.setattr(_warmup, "HOTSET_SAMPLE_RATE", 0)
+    monkeypatch.setattr(_dependencies, "RATE_LIMIT_ENABLED", False)
+
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breakers():
+    for breaker in (db_breaker, redis_breaker):
+        breaker.record_success()
+
+
+def _flush_async_logs():
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, AsyncQueueHandler):
+            handler.flush()
+
+
+# Output is only captured while a test phase runs: queued log records are
+# written before it ends instead of leaking to the terminal in between
+@pytest.hookimpl(hookwrapper=True, trylast=True)
+def pytest_runtest_setup(item):
+    yield
+    _flush_async_logs()
+
+
+@pytest.hookimpl(hookwrapper=True, trylast=True)
+def pytest_runtest_call(item):
+    yield
+    _flush_async_logs()
+
+
+@pytest.hookimpl(hookwrapper=True, trylast=True)
+def pytest_runtest_teardown(item):
+    yield
+    _flush_async_logs()
 
 
 @pytest.fixture
@@ -0,0 +1,93 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from prometheus_client import Histogram
+
+batch_size = Histogram(
+    "lookup_batch_size",
+    "Distinct keys resolved per batched lookup",
+    ["batcher"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512),
+)
+batch_fill = Histogram(
+    "lookup_batch_fill_ratio",
+    "Keys per batched lookup over the batch maximum",
+    ["batcher"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1.0),
+)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-key lookups into one bulk call.
+
+    The first `load` starts a `window` seconds timer; keys requested until
+    it fires, or until `max_size` distinct keys are pending, are resolved
+    together by `load_many(keys)`, which returns a dict of the keys found.
+    Each waiter gets its key's value (None when missing) or the exception
+    raised by the bulk call. Concurrent loads of the same key share a slot.
+
+    Args:
+        name (str): Batcher name used in metrics.
+        load_many (Callable): Coroutine function resolving a list of keys.
+        window (float): Seconds to wait for more keys after the first one.
+        max_size (int): Keys that flush a batch immediately.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        load_many: Callable[[list[str]], Awaitable[dict[str, str]]],
+        window: float,
+        max_size: int,
+    ):
+        self.name = name
+        self.load_many = load_many
+        self.window = window
+        self.max_size = max_size
+        self._pending: dict[str, asyncio.Future] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def load(self, key: str) -> str | None:
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            if len(self._pending) >= self.max_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+        # A cancelled request must not cancel the lookup other waiters share
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, {}
+        if pending:
+            task = asyncio.ensure_future(self._run(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, pending: dict[str, asyncio.Future]) -> None:
+        batch_size.labels(self.name).observe(len(pending))
+        batch_fill.labels(self.name).observe(len(pending) / self.max_size)
+        try:
+            values = await self.load_many(list(pending))
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # Marks it retrieved in case every waiter was cancelled
+                    future.exception()
+            return
+        except BaseException:
+            for future in pending.values():
+                future.cancel()
+            raise
+
+        for key, future in pending.items():
+            if not future.done():
+                future.set_result(values.get(key))
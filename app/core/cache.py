@@ -1,4 +1,474 @@
+import bisect
+import hashlib
+import logging
+import os
+import time
+import weakref
+from collections import OrderedDict
+from typing import Callable, Iterable
+from urllib.parse import urlparse
+
 import redis
-from app.settings import REDIS_URL
+from prometheus_client import Gauge
+from app.settings import (
+    REDIS_URL,
+    REDIS_NODES,
+    CACHE_LAYOUT,
+    CACHE_HASH_PREFIX_LENGTH,
+    CACHE_NODE_EJECT_AFTER,
+    CACHE_NODE_EJECT_SECONDS,
+    CACHE_RING_VNODES,
+    LOCAL_CACHE_MAX_ENTRIES,
+    LOCAL_CACHE_TIMEOUT,
+    REDIS_CONNECT_TIMEOUT,
+    REDIS_SOCKET_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+cache_node_up = Gauge(
+    "cache_node_up", "Whether a cache node is in the hash ring (1) or ejected", ["node"]
+)
+
+
+_clients: weakref.WeakSet[redis.Redis] = weakref.WeakSet()
+
+
+def connect(url: str) -> redis.Redis:
+    """
+    Redis client for `url`. Connections open on first use, and are reset in
+    workers forked from a preloading server master (`_reset_after_fork`).
+    """
+    client = redis.Redis.from_url(
+        url,
+        decode_responses=True,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+    )
+    _clients.add(client)
+    return client
+
+
+def _reset_after_fork() -> None:
+    # redis-py would notice the new pid on the next checkout, under its
+    # fork lock; a forked worker starts with empty pools right away instead
+    for client in list(_clients):
+        client.connection_pool.reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+redis_client = connect(REDIS_URL)
+
+
+class KeyCache:
+    """
+    Stores every token as its own top-level Redis key.
+    """
+
+    def __init__(self, client: redis.Redis):
+        self.client = client
+
+    def get(self, token: str) -> str | None:
+        return self.client.get(token)
+
+    def set(self, token: str, value: str, ex: int) -> None:
+        self.client.set(token, value, ex=ex)
+
+    def delete(self, token: str) -> None:
+        self.client.delete(token)
+
+    def get_many(self, tokens: list[str]) -> list[str | None]:
+        return self.client.mget(tokens) if tokens else []
+
+    def delete_many(self, tokens: list[str]) -> None:
+        if tokens:
+            self.client.delete(*tokens)
+
+    def set_many(self, items: Iterable[tuple[str, str]], ex: int) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for token, value in items:
+            pipe.set(token, value, ex=ex)
+        pipe.execute()
+
+
+class HashBucketCache:
+    """
+    Groups tokens into small Redis hashes keyed by token prefix.
+
+    `ABC123` is stored as field `123` of hash `u:ABC` (prefix length 3), with
+    the TTL applied per field through HEXPIRE (Redis >= 7.4). Buckets are
+    only memory efficient while Redis keeps them listpack encoded, so the
+    prefix length should keep buckets under `hash-max-listpack-entries`
+    (128 by default) and `hash-max-listpack-value` should be raised above
+    the typical stored URL size.
+    """
+
+    def __init__(self, client: redis.Redis, prefix_length: int = 4, namespace="u:"):
+        self.client = client
+        self.prefix_length = prefix_length
+        self.namespace = namespace
+
+    def locate(self, token: str) -> tuple[str, str]:
+        return (
+            f"{self.namespace}{token[: self.prefix_length]}",
+            token[self.prefix_length :],
+        )
+
+    def get(self, token: str) -> str | None:
+        return self.client.hget(*self.locate(token))
+
+    def set(self, token: str, value: str, ex: int) -> None:
+        key, field = self.locate(token)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hset(key, field, value)
+        pipe.hexpire(key, ex, field)
+        pipe.execute()
+
+    def delete(self, token: str) -> None:
+        self.client.hdel(*self.locate(token))
+
+    def get_many(self, tokens: list[str]) -> list[str | None]:
+        pipe = self.client.pipeline(transaction=False)
+        for token in tokens:
+            pipe.hget(*self.locate(token))
+        return pipe.execute()
+
+    def delete_many(self, tokens: list[str]) -> None:
+        buckets: dict[str, list[str]] = {}
+        for token in tokens:
+            key, field = self.locate(token)
+            buckets.setdefault(key, []).append(field)
+        pipe = self.client.pipeline(transaction=False)
+        for key, fields in buckets.items():
+            pipe.hdel(key, *fields)
+        pipe.execute()
+
+    def set_many(self, items: Iterable[tuple[str, str]], ex: int) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for token, value in items:
+            key, field = self.locate(token)
+            pipe.hset(key, field, value)
+            pipe.hexpire(key, ex, field)
+        pipe.execute()
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache with a fixed TTL per entry.
+
+    Sits in front of Redis in every worker; a `max_entries` of 0 disables it.
+    Entries are not invalidated across workers, so deletions may take up to
+    `timeout` seconds to be seen by other processes.
+    """
+
+    def __init__(self, max_entries: int, timeout: int):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> str | None:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[token]
+            return None
+
+        self._entries.move_to_end(token)
+        return value
+
+    def set(self, token: str, value: str) -> None:
+        if not self.max_entries:
+            return
+
+        self._entries[token] = (time.monotonic() + self.timeout, value)
+        self._entries.move_to_end(token)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, token: str) -> None:
+        self._entries.pop(token, None)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring with `vnodes` virtual nodes per node.
+
+    Each node owns the arcs ending at its points, so adding or removing one
+    of N nodes only remaps about 1/N of the keys, and virtual nodes keep the
+    arcs of every node about the same size.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 160):
+        self.vnodes = vnodes
+        self.nodes: list[str] = []
+        self._points: list[int] = []
+        self._owners: list[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str) -> None:
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for i in range(self.vnodes):
+            point = _hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str) -> None:
+        self.nodes.remove(node)
+        kept = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in kept]
+        self._owners = [o for _, o in kept]
+
+    def node_for(self, key: str, skip: Iterable[str] = ()) -> str | None:
+        """
+        Returns the node owning `key`, or the next one clockwise that is not
+        in `skip`; None when every node is skipped.
+        """
+        if not self._points:
+            return None
+        start = bisect.bisect(self._points, _hash(key))
+        if not skip:
+            return self._owners[start % len(self._owners)]
+        skip = set(skip)
+        if skip.issuperset(self.nodes):
+            return None
+        for i in range(start, start + len(self._owners)):
+            owner = self._owners[i % len(self._owners)]
+            if owner not in skip:
+                return owner
+        return None
+
+
+class ShardedCache:
+    """
+    Spreads the token cache over several Redis nodes without Redis Cluster.
+
+    Tokens are routed with a `HashRing` (on `route(token)`, so hash layout
+    buckets stay whole on one node). Batch operations send one MGET or
+    pipeline per node. A node failing `eject_after` calls in a row is
+    taken out of the ring for `eject_seconds`: its tokens are served as
+    misses by the next node meanwhile, then it is tried again. Reads and
+    writes on a failing node count as misses; deletions raise, so callers
+    know a token may stay cached on it until it expires.
+
+    Tokens deleted while their node is ejected are remembered and deleted
+    from it before it serves again, so it does not bring deleted links
+    back. Past `max_missed_deletes` of them the node is flushed instead.
+    Tokens written to another node while their own is ejected are cached
+    there for at most `eject_seconds`: they are not invalidated when their
+    node is back, and could otherwise be served stale if it is ejected
+    again.
+
+    Args:
+        shards (dict): Cache layout (`KeyCache` or `HashBucketCache`) of each
+            node, by node name.
+        route (Callable | None): Maps a token to its ring key, the token
+            itself by default.
+        max_missed_deletes (int): Deletions remembered per ejected node.
+    """
+
+    def __init__(
+        self,
+        shards: dict[str, KeyCache | HashBucketCache],
+        vnodes: int = 160,
+        eject_after: int = 3,
+        eject_seconds: float = 10.0,
+        route: Callable[[str], str] | None = None,
+        max_missed_deletes: int = 100_000,
+    ):
+        self.shards = shards
+        self.ring = HashRing(shards, vnodes)
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.route = route or (lambda token: token)
+        self._failures = dict.fromkeys(shards, 0)
+        self._ejected: dict[str, float] = {}
+        self.max_missed_deletes = max_missed_deletes
+        # Tokens to delete from each ejected node when it is back, None once
+        # there were too many and the node must be flushed
+        self._missed_deletes: dict[str, set[str] | None] = {}
+        for node in shards:
+            cache_node_up.labels(node).set(1)
+
+    def add_node(self, node: str, shard: KeyCache | HashBucketCache) -> None:
+        self.shards[node] = shard
+        self._failures[node] = 0
+        self.ring.add(node)
+        cache_node_up.labels(node).set(1)
+
+    @property
+    def ejected(self) -> list[str]:
+        now = time.monotonic()
+        return [node for node, until in self._ejected.items() if until > now]
+
+    def _node(self, token: str) -> str:
+        node = self.ring.node_for(self.route(token), self.ejected)
+        if node is None:
+            raise redis.ConnectionError("Every cache node is ejected")
+        return node
+
+    def _group(self, tokens: Iterable[str]) -> dict[str, list[str]]:
+        groups: dict[str, list[str]] = {}
+        skip = self.ejected
+        for token in tokens:
+            node = self.ring.node_for(self.route(token), skip)
+            if node is None:
+                raise redis.ConnectionError("Every cache node is ejected")
+            groups.setdefault(node, []).append(token)
+        return groups
+
+    def _timeout(self, token: str, node: str, ex: int) -> int:
+        # Shorter TTL for copies cached away from the token's own node
+        if node == self.ring.node_for(self.route(token)):
+            return ex
+        return min(ex, max(int(self.eject_seconds), 1))
+
+    def _miss_deletes(self, tokens: Iterable[str]) -> None:
+        ejected = self.ejected
+        if not ejected:
+            return
+        for token in tokens:
+            owner = self.ring.node_for(self.route(token))
+            if owner not in ejected:
+                continue
+            missed = self._missed_deletes.setdefault(owner, set())
+            if missed is None:
+                continue
+            missed.add(token)
+            if len(missed) > self.max_missed_deletes:
+                self._missed_deletes[owner] = None
+
+    def _replay_deletes(self, node: str) -> None:
+        if node not in self._missed_deletes:
+            return
+        missed = self._missed_deletes[node]
+        if missed is None:
+            logger.warning("Flushing cache node %s, it missed too many deletes", node)
+            self.shards[node].client.flushdb()
+        else:
+            self.shards[node].delete_many(list(missed))
+        del self._missed_deletes[node]
+
+    def _call(self, node: str, method: str, *args, fallback=None, **kwargs):
+        try:
+            if node in self._ejected:
+                # First call since the ejection ended
+                self._replay_deletes(node)
+            result = getattr(self.shards[node], method)(*args, **kwargs)
+        except redis.RedisError as e:
+            self._failures[node] += 1
+            if self._failures[node] >= self.eject_after:
+                if node not in self.ejected:
+                    logger.warning("Ejecting cache node %s: %s", node, e)
+                self._ejected[node] = time.monotonic() + self.eject_seconds
+                cache_node_up.labels(node).set(0)
+            if method.startswith("delete"):
+                raise
+            return fallback
+        if self._failures[node]:
+            self._failures[node] = 0
+            if self._ejected.pop(node, None) is not None:
+                logger.info("Cache node %s is back in the ring", node)
+                cache_node_up.labels(node).set(1)
+        return result
+
+    def get(self, token: str) -> str | None:
+        return self._call(self._node(token), "get", token)
+
+    def set(self, token: str, value: str, ex: int) -> None:
+        node = self._node(token)
+        ex = self._timeout(token, node, ex) if self._ejected else ex
+        self._call(node, "set", token, value, ex=ex)
+
+    def delete(self, token: str) -> None:
+        self._miss_deletes([token])
+        self._call(self._node(token), "delete", token)
+
+    def get_many(self, tokens: list[str]) -> list[str | None]:
+        found: dict[str, str | None] = {}
+        for node, group in self._group(tokens).items():
+            values = self._call(node, "get_many", group, fallback=[None] * len(group))
+            found.update(zip(group, values))
+        return [found.get(token) for token in tokens]
+
+    def set_many(self, items: Iterable[tuple[str, str]], ex: int) -> None:
+        items = dict(items)
+        for node, group in self._group(items).items():
+            if not self._ejected:
+                self._call(node, "set_many", [(t, items[t]) for t in group], ex=ex)
+                continue
+            by_timeout: dict[int, list[tuple[str, str]]] = {}
+            for token in group:
+                timeout = self._timeout(token, node, ex)
+                by_timeout.setdefault(timeout, []).append((token, items[token]))
+            for timeout, batch in by_timeout.items():
+                self._call(node, "set_many", batch, ex=timeout)
+
+    def delete_many(self, tokens: list[str]) -> None:
+        self._miss_deletes(tokens)
+        for node, group in self._group(tokens).items():
+            self._call(node, "delete_many", group)
+
+
+def node_name(url: str) -> str:
+    """
+    Ring identity of a Redis URL: host, port and database, without
+    credentials, so it is stable across restarts and safe in metrics.
+    """
+    parsed = urlparse(url)
+    return f"{parsed.hostname}:{parsed.port or 6379}{parsed.path or '/0'}"
+
+
+def build_url_cache(
+    client: redis.Redis, layout: str, prefix_length: int = 4
+) -> KeyCache | HashBucketCache:
+    """
+    Returns the token cache for the configured layout ("key" or "hash").
+    """
+    if layout == "hash":
+        return HashBucketCache(client, prefix_length)
+    if layout == "key":
+        return KeyCache(client)
+    raise ValueError(f"Unknown cache layout: {layout}")
+
+
+def build_sharded_cache(
+    urls: list[str], layout: str, prefix_length: int = 4
+) -> ShardedCache:
+    """
+    Returns a `ShardedCache` over the Redis nodes at `urls`.
+    """
+    shards = {
+        node_name(url): build_url_cache(connect(url), layout, prefix_length)
+        for url in urls
+    }
+    return ShardedCache(
+        shards,
+        vnodes=CACHE_RING_VNODES,
+        eject_after=CACHE_NODE_EJECT_AFTER,
+        eject_seconds=CACHE_NODE_EJECT_SECONDS,
+        route=(lambda token: token[:prefix_length]) if layout == "hash" else None,
+    )
+
 
-redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+if REDIS_NODES:
+    url_cache = build_sharded_cache(
+        REDIS_NODES.split(","), CACHE_LAYOUT, CACHE_HASH_PREFIX_LENGTH
+    )
+else:
+    url_cache = build_url_cache(redis_client, CACHE_LAYOUT, CACHE_HASH_PREFIX_LENGTH)
+local_cache = LocalCache(LOCAL_CACHE_MAX_ENTRIES, LOCAL_CACHE_TIMEOUT)
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+import redis
+from prometheus_client import Counter, Gauge
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app.core.tracing import client_span
+from app.settings import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_HALF_OPEN_CALLS,
+    BREAKER_RESET_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+breaker_state = Gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["backend"],
+)
+breaker_failures = Counter(
+    "circuit_breaker_failures_total", "Failed calls seen by the breaker", ["backend"]
+)
+breaker_rejections = Counter(
+    "circuit_breaker_rejections_total",
+    "Calls short-circuited while the breaker was open",
+    ["backend"],
+)
+
+
+class CircuitOpen(Exception):
+    """
+    Exception raised when a call is short-circuited by an open breaker.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling a backend after `failure_threshold` consecutive failures.
+
+    While open every call is rejected immediately. After `reset_timeout`
+    seconds the breaker goes half-open and lets `half_open_calls` probe
+    calls through: a success closes it, a failure opens it again.
+
+    Args:
+        name (str): Backend name used in logs and metrics.
+        failures (tuple): Exception types counted as backend failures.
+        excluded (tuple): Subclasses of `failures` that are regular outcomes
+            (e.g. a unique violation) and count as a successful call.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failures: tuple[type[BaseException], ...],
+        excluded: tuple[type[BaseException], ...] = (),
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+        half_open_calls: int = BREAKER_HALF_OPEN_CALLS,
+    ):
+        self.name = name
+        self.failures = failures
+        self.excluded = excluded
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._state = CLOSED
+        self._probes = 0
+        breaker_state.labels(name).set(0)
+
+    @property
+    def state(self) -> str:
+        elapsed = time.monotonic() - self.opened_at
+        if self._state == OPEN and elapsed >= self.reset_timeout:
+            self._set_state(HALF_OPEN)
+            self._probes = 0
+        return self._state
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            logger.warning("Circuit %s: %s -> %s", self.name, self._state, state)
+        self._state = state
+        breaker_state.labels(self.name).set(_STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes < self.half_open_calls:
+            self._probes += 1
+            return True
+        breaker_rejections.labels(self.name).inc()
+        return False
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        if self._state != CLOSED:
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        breaker_failures.labels(self.name).inc()
+        self.consecutive_failures += 1
+        if (
+            self._state == HALF_OPEN
+            or self.consecutive_failures >= self.failure_threshold
+        ):
+            self.opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+    def _record(self, error: BaseException | None) -> None:
+        if error is None or isinstance(error, self.excluded):
+            self.record_success()
+        elif isinstance(error, self.failures):
+            self.record_failure()
+        elif self._state == HALF_OPEN:
+            # Unrelated error (e.g. cancellation): give the probe slot back
+            self._probes = max(self._probes - 1, 0)
+
+    def guard(self, fn: Callable, *args, fallback: Any = None, **kwargs) -> Any:
+        """
+        Calls `fn`, returning `fallback` instead of raising when the breaker
+        is open or the call fails with a backend failure. Traced as a
+        `<name> <fn>` span of the current request.
+        """
+        if not self.allow():
+            return fallback
+        try:
+            with client_span(self.name, getattr(fn, "__name__", "call")):
+                result = fn(*args, **kwargs)
+        except self.failures as e:
+            self._record(e)
+            if isinstance(e, self.excluded):
+                raise
+            logger.debug("%s call failed: %r", self.name, e)
+            return fallback
+        except BaseException as e:
+            # Not a backend failure, but the probe slot must still be freed
+            self._record(e)
+            raise
+        self.record_success()
+        return result
+
+    async def call(
+        self, fn: Callable[..., Awaitable], *args, timeout: float | None = None
+    ) -> Any:
+        """
+        Awaits `fn(*args)` within `timeout` seconds.
+
+        Raises:
+            CircuitOpen: If the breaker is open.
+        """
+        if not self.allow():
+            raise CircuitOpen(f"{self.name} circuit is open")
+        try:
+            result = await asyncio.wait_for(fn(*args), timeout=timeout)
+        except BaseException as e:
+            self._record(e)
+            raise
+        self.record_success()
+        return result
+
+
+redis_breaker = CircuitBreaker("redis", failures=(redis.RedisError,))
+db_breaker = CircuitBreaker(
+    "postgres",
+    failures=(SQLAlchemyError, OSError, asyncio.TimeoutError),
+    excluded=(IntegrityError,),
+)
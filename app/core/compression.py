@@ -0,0 +1,151 @@
+import base64
+import zlib
+from collections import Counter
+from typing import Iterable
+
+from app.settings import (
+    URL_COMPRESSION_DICTIONARY_PATH,
+    URL_COMPRESSION_ENABLED,
+    URL_COMPRESSION_MIN_LENGTH,
+)
+
+COMPRESSED_PREFIX = "~z"
+
+# Raw deflate stream (no zlib header/checksum), the dictionary already tells
+# us which payload we are looking at.
+_WBITS = -15
+
+# Substrings frequently seen in long campaign/tracking URLs. zlib favours the
+# end of the dictionary, so the most common fragments are placed last.
+DEFAULT_DICTIONARY = (
+    b"ad_click_id=ad_domain=ad_position=backend_model=search-backend"
+    b"&search_layout=grid&searchVariation=&position=&tracking_id="
+    b"&pdp_filters=item_id:&is_advertising=true#is_advertising=true"
+    b"&type=pad&me.audience=&me.bu=&me.component_id=&me.content_id="
+    b"&me.flow=-1&me.logic=user_journey&me.position=0"
+    b"&fbclid=&gclid=&msclkid=&mc_cid=&mc_eid=&ref=&source=&campaign="
+    b"&utm_id=&utm_term=&utm_content=&utm_campaign=&utm_medium=cpc"
+    b"&utm_medium=email&utm_medium=social&utm_source=google"
+    b"&utm_source=facebook&utm_source=newsletter?utm_source="
+    b".html.php.aspx/index/product/p/MLB/category/search?q="
+    b".com.br/.com/.org/.net/mercadolivre.com.br/www.mercadolivre.com.br/"
+    b"http://www.https://www."
+)
+
+
+def dictionary_id(dictionary: bytes) -> str:
+    """
+    Returns the short identifier embedded in values compressed with `dictionary`.
+    """
+    return f"{zlib.crc32(dictionary) & 0xFFFF:04x}"
+
+
+def train_dictionary(samples: Iterable[str], size: int = 4096) -> bytes:
+    """
+    Builds a zlib preset dictionary from a sample of real URLs.
+
+    URLs are split into their structural fragments (host, path segments and
+    query parameters) and the most frequent ones are concatenated, most
+    common last, until `size` bytes are used.
+
+    Args:
+        samples (Iterable[str]): URLs representative of the stored data.
+        size (int): Maximum dictionary size in bytes (zlib uses up to 32KB).
+
+    Returns:
+        bytes: The trained dictionary.
+    """
+    counter: Counter[str] = Counter()
+    for url in samples:
+        scheme, _, rest = url.partition("://")
+        counter[f"{scheme}://"] += 1
+        rest = rest.replace("?", "\x00?").replace("&", "\x00&").replace("#", "\x00#")
+        rest = rest.replace("/", "\x00/")
+        for fragment in rest.split("\x00"):
+            if "=" in fragment:
+                fragment = fragment.split("=", 1)[0] + "="
+            if len(fragment) > 2:
+                counter[fragment] += 1
+
+    chunks: list[bytes] = []
+    used = 0
+    for fragment, count in counter.most_common():
+        if count < 2:
+            break
+        encoded = fragment.encode()
+        if used + len(encoded) > size:
+            continue
+        chunks.append(encoded)
+        used += len(encoded)
+
+    return b"".join(reversed(chunks))
+
+
+class UrlCompressor:
+    """
+    Compacts long URLs into a text-safe representation.
+
+    Values are only compressed when they are at least `min_length` characters
+    long and the result is actually smaller. Compressed values look like
+    `~z<dict-id>:<base85 payload>`; since stored URLs always start with a
+    scheme, anything else is returned untouched by `decompress`, which keeps
+    plain values written before compression was enabled readable.
+    """
+
+    def __init__(
+        self,
+        dictionary: bytes = DEFAULT_DICTIONARY,
+        min_length: int = 128,
+        level: int = 9,
+        enabled: bool = True,
+    ):
+        self.dictionary = dictionary
+        self.min_length = min_length
+        self.level = level
+        self.enabled = enabled
+        self.prefix = f"{COMPRESSED_PREFIX}{dictionary_id(dictionary)}:"
+        self._dictionaries = {dictionary_id(DEFAULT_DICTIONARY): DEFAULT_DICTIONARY}
+        self._dictionaries[dictionary_id(dictionary)] = dictionary
+
+    def compress(self, url: str) -> str:
+        if not self.enabled or len(url) < self.min_length:
+            return url
+
+        compressor = zlib.compressobj(
+            self.level, zlib.DEFLATED, _WBITS, zdict=self.dictionary
+        )
+        payload = compressor.compress(url.encode()) + compressor.flush()
+        compressed = self.prefix + base64.b85encode(payload).decode("ascii")
+
+        return compressed if len(compressed) < len(url) else url
+
+    def decompress(self, value: str) -> str:
+        if not value.startswith(COMPRESSED_PREFIX):
+            return value
+
+        header, _, payload = value.partition(":")
+        dictionary = self._dictionaries.get(header[len(COMPRESSED_PREFIX) :])
+        if dictionary is None:
+            raise ValueError(f"Unknown compression dictionary {header!r}")
+
+        decompressor = zlib.decompressobj(_WBITS, zdict=dictionary)
+        data = decompressor.decompress(base64.b85decode(payload))
+        return (data + decompressor.flush()).decode()
+
+
+def load_compressor(
+    enabled: bool, min_length: int, dictionary_path: str | None = None
+) -> UrlCompressor:
+    """
+    Builds the compressor from settings, reading a trained dictionary if configured.
+    """
+    dictionary = DEFAULT_DICTIONARY
+    if dictionary_path:
+        with open(dictionary_path, "rb") as f:
+            dictionary = f.read()
+    return UrlCompressor(dictionary, min_length=min_length, enabled=enabled)
+
+
+url_compressor = load_compressor(
+    URL_COMPRESSION_ENABLED, URL_COMPRESSION_MIN_LENGTH, URL_COMPRESSION_DICTIONARY_PATH
+)
@@ -1,8 +1,162 @@
+import os
+import time
+import uuid
+
+from prometheus_client import Gauge, Histogram
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from app.settings import DATABASE_URL
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.startup import worker_count
+from app.core.tracing import trace_queries
+from app.settings import (
+    CHANGE_FEED_ENABLED,
+    CHANGE_FEED_SOURCE,
+    DATABASE_URL,
+    DB_CONNECTION_BUDGET,
+    DB_MAX_OVERFLOW,
+    DB_PGBOUNCER_MODE,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_REPLICAS,
+    WEB_CONCURRENCY,
+)
+
+DEFAULT_POOL_SIZE = 20
+
+# Connections each worker opens outside its pool: the change feed listener
+DEDICATED_CONNECTIONS = int(CHANGE_FEED_ENABLED and CHANGE_FEED_SOURCE == "postgres")
+
+pool_checked_out = Gauge(
+    "db_pool_checked_out", "Connections checked out of this worker's pool"
+)
+pool_capacity = Gauge(
+    "db_pool_capacity", "Connections this worker's pool may open (size + overflow)"
+)
+pool_acquire_seconds = Histogram(
+    "db_pool_acquire_seconds",
+    "Time spent waiting for a pooled connection",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+class PoolWaitStats:
+    """
+    Exponentially weighted average of the time spent waiting for a pooled
+    connection. The average decays while no connection is requested, so a
+    past spike does not keep reporting a saturated pool forever. `waiting`
+    counts the checkouts in progress.
+    """
+
+    def __init__(self, alpha: float = 0.2, half_life: float = 1.0):
+        self.alpha = alpha
+        self.half_life = half_life
+        self.average = 0.0
+        self.waiting = 0
+        self.updated_at = time.monotonic()
+
+    def observe(self, seconds: float) -> None:
+        self.average = self.current() * (1 - self.alpha) + seconds * self.alpha
+        self.updated_at = time.monotonic()
+
+    def current(self) -> float:
+        elapsed = time.monotonic() - self.updated_at
+        return self.average * 0.5 ** (elapsed / self.half_life)
+
+
+pool_wait = PoolWaitStats()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long each checkout waits for a connection.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        pool_wait.waiting += 1
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait.waiting -= 1
+            elapsed = time.perf_counter() - start
+            pool_wait.observe(elapsed)
+            pool_acquire_seconds.observe(elapsed)
+
+
+def pool_size_for(
+    pool_size: int = DB_POOL_SIZE,
+    budget: int = DB_CONNECTION_BUDGET,
+    workers: int = WEB_CONCURRENCY,
+    replicas: int = DB_REPLICAS,
+    max_overflow: int = DB_MAX_OVERFLOW,
+    dedicated: int = DEDICATED_CONNECTIONS,
+) -> int:
+    """
+    Connections of each worker's pool.
+
+    An explicit `pool_size` wins. Otherwise the global `budget` is split
+    evenly across every worker of every replica, overflow and `dedicated`
+    connections (opened outside the pool) included, so
+    `replicas * workers * (size + max_overflow + dedicated)` stays within
+    it; `workers` 0 counts the workers the server starts (see
+    `worker_count`).
+
+    Raises:
+        ValueError: If the budget does not leave every worker a connection.
+    """
+    if pool_size > 0:
+        return pool_size
+    if budget <= 0:
+        return DEFAULT_POOL_SIZE
+
+    workers = worker_count(workers)
+    size = budget // (max(replicas, 1) * workers) - max_overflow - dedicated
+    if size < 1:
+        raise ValueError(
+            f"DB_CONNECTION_BUDGET={budget} is too small for {replicas} replicas "
+            f"of {workers} workers with {max_overflow} overflow and {dedicated} "
+            "dedicated connections"
+        )
+    return size
+
+
+def engine_options(pgbouncer: bool = DB_PGBOUNCER_MODE) -> dict:
+    """
+    Pool and driver options of the application engine.
+
+    Behind a transaction-pooling PgBouncer consecutive transactions may run
+    on different server connections, so asyncpg's statement cache and
+    SQLAlchemy's prepared statement cache are disabled and statements get
+    unique names.
+    """
+    size = pool_size_for()
+    options = {
+        "pool_size": size,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "poolclass": InstrumentedQueuePool,
+    }
+    if pgbouncer:
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return options
+
 
-engine = create_async_engine(DATABASE_URL, echo=False, pool_size=20, max_overflow=0)
+engine = create_async_engine(DATABASE_URL, echo=False, **engine_options())
+pool_capacity.set(engine.pool.size() + DB_MAX_OVERFLOW)
+# engine.pool is replaced in forked workers (see below), so it is looked up
+# on every scrape
+pool_checked_out.set_function(lambda: engine.pool.checkedout())
+trace_queries(engine.sync_engine)
+# Workers forked from a preloading server master must not share its pooled
+# connections: drop them without closing the master's sockets
+os.register_at_fork(after_in_child=lambda: engine.sync_engine.dispose(close=False))
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 Base = declarative_base()
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+
+import redis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.cache import ShardedCache, redis_client, url_cache
+from app.core.circuit import CLOSED, db_breaker, redis_breaker
+from app.core.database import engine
+from app.core.storage import UrlStore, url_store
+from app.settings import HEALTH_PROBE_INTERVAL, HEALTH_PROBE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+def pool_stats(db_engine: AsyncEngine) -> dict:
+    """
+    Returns connection pool usage for `db_engine`.
+
+    Saturation is the fraction of the pool capacity (size + max overflow)
+    currently checked out; at 1.0 new requests wait for a connection.
+    """
+    pool = db_engine.pool
+    size = pool.size()
+    checked_out = pool.checkedout()
+    capacity = size + max(getattr(pool, "_max_overflow", 0), 0)
+    return {
+        "size": size,
+        "checked_out": checked_out,
+        "overflow": max(pool.overflow(), 0),
+        "saturation": round(checked_out / capacity, 3) if capacity else 0.0,
+    }
+
+
+class HealthMonitor:
+    """
+    Probes the event loop, PostgreSQL (or the embedded store on edge nodes)
+    and Redis from a background task.
+
+    Health endpoints only read the last results, so checking health costs
+    nothing on the request path no matter how often it is polled. Event
+    loop lag is measured as how late the probe's own `sleep` wakes up.
+
+    With a sharded token cache (REDIS_NODES) each cache node is probed and
+    reported too. Redis counts as up while the main Redis and at least one
+    cache node answer, as the ring serves the tokens of ejected nodes from
+    the others. The database probe needs a pooled connection, so when it
+    times out with every connection checked out and the postgres circuit
+    closed, the database is busy rather than down and still counts as up
+    (readiness then depends on the pool saturation limit).
+    """
+
+    def __init__(
+        self,
+        db_engine: AsyncEngine = engine,
+        cache_client=redis_client,
+        cache_nodes: dict[str, redis.Redis] | None = None,
+        store: UrlStore | None = url_store,
+        interval: float = HEALTH_PROBE_INTERVAL,
+        timeout: float = HEALTH_PROBE_TIMEOUT,
+    ):
+        self.db_engine = db_engine
+        self.cache_client = cache_client
+        if cache_nodes is None and isinstance(url_cache, ShardedCache):
+            cache_nodes = {
+                node: shard.client for node, shard in url_cache.shards.items()
+            }
+        self.cache_nodes = cache_nodes or {}
+        self.store = store
+        self.interval = interval
+        self.timeout = timeout
+        self.loop_lag = 0.0
+        self.db_ok = False
+        self.redis_ok = False
+        self.cache_nodes_ok: dict[str, bool] = {}
+        self.pool: dict = {}
+        self.checked_at = 0.0
+        self._task: asyncio.Task | None = None
+
+    @property
+    def stale(self) -> bool:
+        """
+        True when the probe loop has not reported for several intervals.
+        """
+        return time.monotonic() - self.checked_at > 5 * self.interval + self.timeout
+
+    def snapshot(self) -> dict:
+        return {
+            "event_loop_lag_ms": round(self.loop_lag * 1000, 3),
+            "database": self.db_ok,
+            "redis": self.redis_ok,
+            "cache_nodes": self.cache_nodes_ok,
+            "db_pool": self.pool,
+            "circuits": {"postgres": db_breaker.state, "redis": redis_breaker.state},
+            "probe_age_s": round(time.monotonic() - self.checked_at, 3),
+        }
+
+    async def _probe_db(self) -> bool:
+        if self.store is not None:
+            return self.store.ping()
+        async with self.db_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return True
+
+    async def _probe_redis(self, client: redis.Redis) -> bool:
+        return await asyncio.to_thread(client.ping)
+
+    async def _guarded(self, probe, *args) -> bool:
+        try:
+            return bool(await asyncio.wait_for(probe(*args), timeout=self.timeout))
+        except Exception as e:
+            logger.debug("Health probe %s failed: %r", probe.__name__, e)
+            return False
+
+    async def refresh(self) -> None:
+        nodes = list(self.cache_nodes)
+        db_ok, redis_ok, *nodes_ok = await asyncio.gather(
+            self._guarded(self._probe_db),
+            self._guarded(self._probe_redis, self.cache_client),
+            *(
+                self._guarded(self._probe_redis, self.cache_nodes[node])
+                for node in nodes
+            ),
+        )
+        self.pool = pool_stats(self.db_engine)
+        if (
+            not db_ok
+            and self.store is None
+            and self.pool["saturation"] >= 1
+            and db_breaker.state == CLOSED
+        ):
+            # Every connection is busy serving requests that succeed
+            db_ok = True
+        self.db_ok = db_ok
+        self.cache_nodes_ok = dict(zip(nodes, nodes_ok))
+        self.redis_ok = redis_ok and (not nodes or any(nodes_ok))
+        self.checked_at = time.monotonic()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.loop_lag = max(loop.time() - started - self.interval, 0.0)
+            await self.refresh()
+
+    async def start(self) -> None:
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+health_monitor = HealthMonitor()
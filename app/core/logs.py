@@ -0,0 +1,191 @@
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+import orjson
+from prometheus_client import Counter
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+log_records_dropped = Counter(
+    "log_records_dropped", "Log records dropped because the log queue was full"
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line.
+
+    Fields passed with `extra={...}` are added to the object as they are.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "pid": record.process,
+            "message": record.getMessage(),
+        }
+        payload.update(
+            (key, value)
+            for key, value in vars(record).items()
+            if key not in _RECORD_ATTRS
+        )
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(payload, default=repr).decode()
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limits repetitive records at `level` and above.
+
+    Records are grouped by logger, level and message template (the format
+    string, before arguments are merged, so it only works with lazy
+    `logger.warning("... %s", value)` calls). Each group lets `burst`
+    records through per `period` seconds, then one in `sample_every` (none
+    when 0). The first record let through after suppressed ones carries
+    their count in a `suppressed` attribute.
+    """
+
+    def __init__(
+        self,
+        period: float = 10.0,
+        burst: int = 5,
+        sample_every: int = 0,
+        level: int = logging.WARNING,
+        max_keys: int = 1000,
+    ):
+        super().__init__()
+        self.period = period
+        self.burst = burst
+        self.sample_every = sample_every
+        self.level = level
+        self.max_keys = max_keys
+        self._groups: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.level or self.burst <= 0:
+            return True
+
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            group = self._groups.get(key)
+            if group is None or now - group[0] >= self.period:
+                if group is None and len(self._groups) >= self.max_keys:
+                    self._groups.clear()
+                suppressed = group[2] if group else 0
+                group = self._groups[key] = [now, 0, suppressed]
+
+            group[1] += 1
+            seen = group[1]
+            allowed = seen <= self.burst or (
+                self.sample_every > 0 and (seen - self.burst) % self.sample_every == 0
+            )
+            if not allowed:
+                group[2] += 1
+                return False
+            if group[2]:
+                record.suppressed = group[2]
+                group[2] = 0
+        return True
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Waits for room instead of failing when stopped with a full queue
+        self.queue.put(self._sentinel)
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    Non-blocking handler: records are put on a bounded queue and formatted
+    and written to `stream` by a background listener thread.
+
+    The calling thread (the event loop) only checks the rate limit and
+    enqueues the record; message arguments are merged later, in the
+    listener, so they should not be mutated after logging. When the queue
+    is full records are dropped instead of blocking; they are counted in
+    `log_records_dropped`, and the first record queued after them is
+    preceded by a warning with their number. The listener is restarted in
+    forked children, where threads do not survive.
+
+    Args:
+        stream: Where the listener writes, e.g. `sys.stdout`.
+        maxsize (int): Queue capacity.
+        period, burst, sample_every: See `RateLimitFilter`.
+    """
+
+    def __init__(
+        self,
+        stream=None,
+        maxsize: int = 10000,
+        period: float = 10.0,
+        burst: int = 5,
+        sample_every: int = 0,
+    ):
+        super().__init__(queue.Queue(maxsize))
+        self.target = logging.StreamHandler(stream)
+        self.dropped = 0
+        self._unreported = 0
+        self.addFilter(RateLimitFilter(period, burst, sample_every))
+        self.listener: _Listener | None = None
+        self._start_listener()
+        os.register_at_fork(after_in_child=self._start_listener)
+
+    def _start_listener(self) -> None:
+        self.queue = queue.Queue(self.queue.maxsize)
+        self.listener = _Listener(self.queue, self.target)
+        self.listener.start()
+
+    def setFormatter(self, fmt: logging.Formatter | None) -> None:
+        # Formatting happens in the listener thread, on the target handler
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self._unreported:
+                self.queue.put_nowait(self._dropped_record())
+                self._unreported = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+            log_records_dropped.inc()
+
+    def _dropped_record(self) -> logging.LogRecord:
+        return logging.makeLogRecord(
+            {
+                "name": __name__,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": "%d log records dropped, the log queue was full",
+                "args": (self._unreported,),
+            }
+        )
+
+    def flush(self) -> None:
+        """
+        Waits for the listener to write every queued record.
+        """
+        if self.listener:
+            # The listener marks each record done once handled
+            self.queue.join()
+        self.target.flush()
+
+    def close(self) -> None:
+        if self.listener:
+            self.listener.stop()
+            self.listener = None
+        self.target.close()
+        super().close()
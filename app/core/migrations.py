@@ -0,0 +1,110 @@
+"""
+Schema migration entry point.
+
+    python -m app.core.migrations
+
+Runs `alembic upgrade head` while holding a PostgreSQL advisory lock, so any
+number of pods/jobs may start it at once and only one of them migrates.
+Workers never migrate on boot; they only compare the database revision with
+the head revision shipped in the image (see `check_schema_revision`).
+"""
+
+import logging
+import os
+from functools import lru_cache
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.pool import NullPool
+
+from app.settings import SYNC_DATABASE_URL
+
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "..", "..", "alembic.ini")
+
+# Arbitrary application-wide key for pg_advisory_lock
+MIGRATION_LOCK_ID = 724_110_001
+
+logger = logging.getLogger(__name__)
+
+
+def _alembic_config() -> Config:
+    config = Config(ALEMBIC_INI)
+    # Keep the caller's logging instead of alembic.ini's (see alembic/env.py)
+    config.attributes["configure_logger"] = False
+    config.set_main_option(
+        "script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "alembic")
+    )
+    return config
+
+
+@lru_cache(maxsize=1)
+def head_revision() -> str | None:
+    """
+    Returns the head revision of the migration scripts (read once per process).
+    """
+    return ScriptDirectory.from_config(_alembic_config()).get_current_head()
+
+
+def run_migrations() -> None:
+    """
+    Upgrades the database to head, serialized through an advisory lock.
+
+    Processes that wait on the lock find the schema already at head and
+    alembic turns their upgrade into a no-op.
+    """
+    engine = create_engine(SYNC_DATABASE_URL, poolclass=NullPool)
+    try:
+        with engine.connect() as lock_conn:
+            logger.info("Waiting for migration lock")
+            lock_conn.execute(
+                text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID}
+            )
+            try:
+                command.upgrade(_alembic_config(), "head")
+            finally:
+                lock_conn.execute(
+                    text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID}
+                )
+    finally:
+        engine.dispose()
+
+
+async def current_revision(db: AsyncSession) -> str | None:
+    """
+    Returns the revision the database is at, None if it was never migrated.
+    """
+    try:
+        result = await db.execute(text("SELECT version_num FROM alembic_version"))
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning("Could not read schema revision: %r", e)
+        return None
+    return result.scalar_one_or_none()
+
+
+async def check_schema_revision(db: AsyncSession) -> bool:
+    """
+    Checks with a single query that the database is at the expected head.
+
+    Returns:
+        bool: True if the schema is up to date.
+    """
+    expected = head_revision()
+    current = await current_revision(db)
+    if current != expected:
+        logger.error(
+            "Database schema at revision %s, expected %s. "
+            "Run `python -m app.core.migrations`.",
+            current,
+            expected,
+        )
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_migrations()
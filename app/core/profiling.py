@@ -0,0 +1,84 @@
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_filename}:{code.co_name}:{frame.f_lineno}"
+
+
+class StackSampler:
+    """
+    Samples the call stack of one thread at a fixed interval.
+
+    Runs in a background daemon thread, so the sampled thread (the event
+    loop) only pays for the GIL switches. Results use the "folded" format
+    (`root;caller;callee count` per line) understood by flamegraph.pl,
+    speedscope and inferno, the same output as `py-spy record --format raw`.
+    """
+
+    def __init__(self, thread_id: int | None = None, interval: float = 0.005):
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(_frame_label(frame))
+            frame = frame.f_back
+        if stack:
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.items())
+
+
+class ProfileSession:
+    """
+    Deterministic cProfile session over the calling thread.
+    """
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.started_at = 0.0
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self) -> None:
+        self.profiler.disable()
+
+    def report(self, limit: int = 50, sort: str = "cumulative") -> str:
+        output = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=output)
+        stats.sort_stats(sort).print_stats(limit)
+        return output.getvalue()
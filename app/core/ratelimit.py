@@ -0,0 +1,126 @@
+import logging
+import time
+
+import redis
+
+from app.core.cache import redis_client
+from app.core.circuit import redis_breaker
+from app.core.database import pool_wait
+from app.core.health import health_monitor
+from app.settings import (
+    RATE_LIMIT_CREATE,
+    RATE_LIMIT_DELETE,
+    RATE_LIMIT_LOCAL_MAX_KEYS,
+    RATE_LIMIT_WINDOW,
+    SHED_MAX_LOOP_LAG,
+    SHED_MAX_POOL_WAIT,
+    SHED_MAX_POOL_WAITERS,
+    SHEDDING_ENABLED,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `capacity` requests of burst, refilled at `rate`
+    requests per second. A request may cost several tokens.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def allow(self, cost: int = 1) -> bool:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+
+class RateLimiter:
+    """
+    Per-client limit of `limit` requests per `window` seconds, where a
+    request acting on several items (batch deletes) counts once per item.
+
+    A local token bucket per client answers first and rejects floods without
+    leaving the process. Requests it lets through are counted in Redis with
+    a sliding window counter (current window + weighted previous window), so
+    the limit holds across workers and pods. If Redis is unavailable (or its
+    circuit breaker is open) the limiter fails open on the local bucket.
+    """
+
+    def __init__(
+        self,
+        scope: str,
+        limit: int,
+        window: int,
+        client: redis.Redis = redis_client,
+        max_local_keys: int = RATE_LIMIT_LOCAL_MAX_KEYS,
+    ):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+        self.client = client
+        self.max_local_keys = max_local_keys
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def _local_allow(self, key: str, cost: int) -> bool:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_local_keys:
+                self._buckets.clear()
+            bucket = self._buckets[key] = TokenBucket(
+                self.limit / self.window, self.limit
+            )
+        return bucket.allow(cost)
+
+    def _shared_allow(self, key: str, cost: int) -> bool:
+        now = time.time()
+        current_window, elapsed = divmod(now, self.window)
+        current_key = f"rl:{self.scope}:{key}:{int(current_window)}"
+        previous_key = f"rl:{self.scope}:{key}:{int(current_window) - 1}"
+
+        pipe = self.client.pipeline(transaction=False)
+        pipe.incrby(current_key, cost)
+        pipe.expire(current_key, self.window * 2)
+        pipe.get(previous_key)
+        current, _, previous = pipe.execute()
+
+        weight = 1 - elapsed / self.window
+        return int(previous or 0) * weight + current <= self.limit
+
+    def allow(self, key: str, cost: int = 1) -> bool:
+        if not self._local_allow(key, cost):
+            return False
+        return redis_breaker.guard(self._shared_allow, key, cost, fallback=True)
+
+    def retry_after(self) -> int:
+        return max(int(self.window - time.time() % self.window), 1)
+
+
+def is_overloaded() -> bool:
+    """
+    True when the worker should shed work that needs the database: pooled
+    connections are taking too long to acquire, too many checkouts are
+    queued for one (seen before the average catches up with a sudden burst)
+    or the event loop is lagging.
+    """
+    if not SHEDDING_ENABLED:
+        return False
+    return (
+        pool_wait.current() > SHED_MAX_POOL_WAIT
+        or pool_wait.waiting > SHED_MAX_POOL_WAITERS
+        or health_monitor.loop_lag > SHED_MAX_LOOP_LAG
+    )
+
+
+create_limiter = RateLimiter("create", RATE_LIMIT_CREATE, RATE_LIMIT_WINDOW)
+delete_limiter = RateLimiter("delete", RATE_LIMIT_DELETE, RATE_LIMIT_WINDOW)
@@ -0,0 +1,105 @@
+import secrets
+
+import redis
+
+from app.settings import (
+    REDIS_CONNECT_TIMEOUT,
+    REGION_ID,
+    REGION_LOOKUP_TIMEOUT,
+    REGION_PEER_REDIS_URLS,
+    REGION_TOKEN_PREFIXES,
+)
+
+
+def parse_region_map(value: str) -> dict[str, str]:
+    """
+    Parses `"sa=ABC,us=DEF"` into `{"sa": "ABC", "us": "DEF"}`.
+    """
+    regions = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        region, sep, setting = item.partition("=")
+        if not sep or not region.strip() or not setting.strip():
+            raise ValueError(f"Invalid region setting: {item!r}")
+        regions[region.strip()] = setting.strip()
+    return regions
+
+
+class RegionRouter:
+    """
+    Maps tokens to the region that created them.
+
+    Every region owns a disjoint set of prefix characters and only creates
+    tokens starting with one of them, so uniqueness is enforced by the
+    region's own database without a cross-region commit. The first
+    character of any token tells which region is authoritative for it.
+    Disabled (single region) when `region` is empty.
+
+    Args:
+        region (str): This region's id.
+        prefixes (dict): Prefix characters owned by each region.
+        peer_urls (dict): Redis URL of every other region.
+    """
+
+    def __init__(
+        self,
+        region: str = "",
+        prefixes: dict[str, str] | None = None,
+        peer_urls: dict[str, str] | None = None,
+    ):
+        prefixes = prefixes or {}
+        self.region = region
+        self.peer_urls = peer_urls or {}
+        self._owners: dict[str, str] = {}
+        for owner, chars in prefixes.items():
+            for char in chars.upper():
+                if not char.isalnum() or char in self._owners:
+                    raise ValueError(f"Invalid or shared region prefix: {char!r}")
+                self._owners[char] = owner
+        self.local_prefixes = prefixes.get(region, "").upper()
+        if region and not self.local_prefixes:
+            raise ValueError(f"No token prefixes configured for region {region!r}")
+        self._peers: dict[str, redis.Redis] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.region)
+
+    def owner(self, token: str) -> str | None:
+        return self._owners.get(token[:1].upper())
+
+    def is_local(self, token: str) -> bool:
+        return not self.enabled or self.owner(token) in (None, self.region)
+
+    def owns(self, token: str) -> bool:
+        """
+        Whether this region may create `token`: its first character is one
+        of this region's prefixes (always, when regions are disabled).
+        """
+        return not self.enabled or self.owner(token) == self.region
+
+    def token_prefix(self) -> str:
+        """
+        Returns the first character for a new token created in this region
+        (empty when regions are disabled).
+        """
+        return secrets.choice(self.local_prefixes) if self.enabled else ""
+
+    def peer(self, region: str) -> redis.Redis | None:
+        """
+        Returns a client for `region`'s Redis, or None if none is configured.
+        """
+        if region not in self._peers and region in self.peer_urls:
+            self._peers[region] = redis.Redis.from_url(
+                self.peer_urls[region],
+                decode_responses=True,
+                socket_timeout=REGION_LOOKUP_TIMEOUT,
+                socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+            )
+        return self._peers.get(region)
+
+
+region_router = RegionRouter(
+    REGION_ID,
+    parse_region_map(REGION_TOKEN_PREFIXES),
+    parse_region_map(REGION_PEER_REDIS_URLS),
+)
@@ -0,0 +1,126 @@
+"""
+Production server: a gunicorn master supervising uvicorn workers.
+
+    python -m app.core.server
+
+The master imports the app once before forking (SERVER_PRELOAD), so workers
+start without importing it again and share its code and read-only data
+(compression dictionary, token index) copy-on-write. Nothing connects at
+import time: the database pool, Redis pools, the embedded SQLite store and
+the log writer thread are reset in each forked worker, and tracing and the
+background tasks start in each worker's lifespan.
+
+Workers default to one per available CPU (container quota included), and
+use uvloop and httptools when installed. Startup phases (`import` in the
+master, `worker_init` and the lifespan phases in each worker) are logged and
+exported as `startup_phase_seconds`.
+"""
+
+import logging
+import os
+import time
+
+from gunicorn.app.base import BaseApplication
+from gunicorn.util import import_app
+from uvicorn.workers import UvicornWorker
+
+from app.core.startup import event_loop, http_parser, startup_timer, worker_count
+from app.settings import (
+    SERVER_ACCESS_LOG,
+    SERVER_BACKLOG,
+    SERVER_BIND,
+    SERVER_GRACEFUL_TIMEOUT,
+    SERVER_HTTP,
+    SERVER_KEEPALIVE,
+    SERVER_LOOP,
+    SERVER_PRELOAD,
+)
+
+APP = "app.main:app"
+LOG_CONFIG = os.path.join(os.path.dirname(__file__), "..", "..", "logging.conf")
+
+logger = logging.getLogger(__name__)
+
+
+class Worker(UvicornWorker):
+    """
+    Uvicorn worker on the event loop and HTTP parser picked by SERVER_LOOP
+    and SERVER_HTTP, logging requests only with SERVER_ACCESS_LOG.
+    """
+
+    CONFIG_KWARGS = {
+        "loop": event_loop(SERVER_LOOP),
+        "http": http_parser(SERVER_HTTP),
+        "access_log": SERVER_ACCESS_LOG,
+    }
+
+
+def _when_ready(server) -> None:
+    logger.info(
+        "Master %d ready in %.1f ms, starting %d workers (%s, %s)",
+        os.getpid(),
+        (time.perf_counter() - server.app.started_at) * 1000,
+        server.num_workers,
+        Worker.CONFIG_KWARGS["loop"],
+        Worker.CONFIG_KWARGS["http"],
+    )
+
+
+def _post_fork(server, worker) -> None:
+    worker.forked_at = time.perf_counter()
+
+
+def _post_worker_init(worker) -> None:
+    startup_timer.record("worker_init", time.perf_counter() - worker.forked_at)
+
+
+def server_options(workers: int | None = None) -> dict:
+    """
+    Gunicorn settings of the server, from the SERVER_* settings.
+
+    Args:
+        workers (int | None): Worker processes, `worker_count()` when None.
+    """
+    return {
+        "bind": SERVER_BIND,
+        "workers": workers or worker_count(),
+        "worker_class": "app.core.server.Worker",
+        "preload_app": SERVER_PRELOAD,
+        "backlog": SERVER_BACKLOG,
+        "keepalive": SERVER_KEEPALIVE,
+        "graceful_timeout": SERVER_GRACEFUL_TIMEOUT,
+        "logconfig": LOG_CONFIG,
+        "when_ready": _when_ready,
+        "post_fork": _post_fork,
+        "post_worker_init": _post_worker_init,
+    }
+
+
+class Server(BaseApplication):
+    """
+    Gunicorn application serving `app_uri` with `options`, configured in
+    code instead of from the command line.
+    """
+
+    def __init__(self, options: dict, app_uri: str = APP):
+        self.options = options
+        self.app_uri = app_uri
+        self.started_at = time.perf_counter()
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # In the master when preloading, otherwise in each worker
+        with startup_timer.phase("import"):
+            return import_app(self.app_uri)
+
+
+def main():
+    Server(server_options()).run()
+
+
+if __name__ == "__main__":
+    main()
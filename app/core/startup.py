@@ -0,0 +1,118 @@
+import importlib.util
+import logging
+import math
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Gauge
+
+from app.settings import WEB_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+startup_phase_seconds = Gauge(
+    "startup_phase_seconds", "Time spent in each startup phase", ["phase"]
+)
+
+
+def _cgroup_cpu_limit(root: str) -> float | None:
+    """
+    CPUs allowed by the container's CFS quota (cgroup v2, then v1), None
+    when unlimited.
+    """
+    try:
+        with open(os.path.join(root, "cpu.max")) as f:
+            quota, period = f.read().split()
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(root, "cpu", "cpu.cfs_quota_us")) as f:
+            quota = int(f.read())
+        with open(os.path.join(root, "cpu", "cpu.cfs_period_us")) as f:
+            period = int(f.read())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 and period > 0 else None
+
+
+def available_cpus(cgroup_root: str = "/sys/fs/cgroup") -> int:
+    """
+    CPUs this process may actually use: the ones it is pinned to, capped
+    by the container's CPU quota (rounded up), which `os.cpu_count()`
+    ignores.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit(cgroup_root)
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(cpus, 1)
+
+
+def worker_count(configured: int = WEB_CONCURRENCY) -> int:
+    """
+    Server workers of this pod: WEB_CONCURRENCY when set, otherwise one per
+    available CPU, since each async worker keeps a core busy on its own.
+    """
+    if configured > 0:
+        return configured
+    return available_cpus()
+
+
+def event_loop(choice: str = "auto") -> str:
+    """
+    Event loop of the workers: uvloop when installed, unless `choice` names
+    one ("asyncio", "uvloop").
+    """
+    if choice != "auto":
+        return choice
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def http_parser(choice: str = "auto") -> str:
+    """
+    HTTP/1.1 implementation of the workers: httptools when installed, unless
+    `choice` names one ("h11", "httptools").
+    """
+    if choice != "auto":
+        return choice
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+class StartupTimer:
+    """
+    Durations of the startup phases of this process, logged as each one
+    ends and exported as `startup_phase_seconds{phase}`. Phases timed in
+    the server's master before forking (the preloaded import) are inherited
+    by its workers.
+    """
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = seconds
+        startup_phase_seconds.labels(name).set(seconds)
+        logger.info("Startup phase %s took %.1f ms", name, seconds * 1000)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.phases.items()
+        )
+
+
+startup_timer = StartupTimer()
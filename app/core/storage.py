@@ -0,0 +1,240 @@
+import logging
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import time
+from typing import Iterable
+
+from app.core.token_index import TokenIndex
+from app.settings import EMBEDDED_DB_PATH, EMBEDDED_RELOAD_INTERVAL, STORAGE_BACKEND
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS url_shortened (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def stream_id(value: str) -> tuple[int, int]:
+    """
+    Parses a Redis stream id ("1700000000000-3") for ordering.
+    """
+    ms, _, seq = value.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class UrlStore(ABC):
+    """
+    Read-only token storage answering cache misses in place of PostgreSQL.
+
+    Used by redirect-only nodes; values are stored exactly as in
+    `url_shortened` (possibly compressed).
+    """
+
+    @abstractmethod
+    def get(self, token: str) -> str | None:
+        """
+        The stored value of `token`, None when it does not exist.
+        """
+
+    def get_many(self, tokens: list[str]) -> dict[str, str]:
+        return {token: url for token in tokens if (url := self.get(token))}
+
+    def ping(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteUrlStore(UrlStore):
+    """
+    Embedded SQLite copy of `url_shortened` in WAL mode.
+
+    Lookups are a primary key read on a local file, with no network I/O,
+    and WAL lets every worker on the host read while one of them applies
+    the deltas synced from the primary. The id of the last applied change
+    is stored in the same file, in the same transaction as the changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect()
+        # A SQLite connection must not be used across fork: workers forked
+        # from a preloading server master open their own
+        os.register_at_fork(after_in_child=self._connect)
+
+    def _connect(self) -> None:
+        self.conn = sqlite3.connect(
+            self.path, timeout=5.0, isolation_level=None, check_same_thread=False
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA mmap_size=268435456")
+        self.conn.executescript(SCHEMA)
+
+    def get(self, token: str) -> str | None:
+        row = self.conn.execute(
+            "SELECT url FROM url_shortened WHERE id = ?", (token,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get_many(self, tokens: list[str]) -> dict[str, str]:
+        if not tokens:
+            return {}
+        placeholders = ",".join("?" * len(tokens))
+        return dict(
+            self.conn.execute(
+                f"SELECT id, url FROM url_shortened WHERE id IN ({placeholders})",
+                tokens,
+            ).fetchall()
+        )
+
+    def ping(self) -> bool:
+        self.conn.execute("SELECT 1").fetchone()
+        return True
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT count(*) FROM url_shortened").fetchone()[0]
+
+    @property
+    def offset(self) -> str:
+        row = self.conn.execute(
+            "SELECT value FROM sync_state WHERE key = 'offset'"
+        ).fetchone()
+        return row[0] if row else "0-0"
+
+    def _set_offset(self, offset: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sync_state (key, value) VALUES ('offset', ?)",
+            (offset,),
+        )
+
+    def load(self, rows: Iterable[tuple[str, str]], offset: str) -> None:
+        """
+        Bulk loads a snapshot of `url_shortened` taken at change `offset`.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO url_shortened (id, url) VALUES (?, ?)", rows
+            )
+            self._set_offset(offset)
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def apply(self, changes: list[tuple[str, str, str | None]]) -> int:
+        """
+        Applies `(change_id, token, url)` changes newer than the stored
+        offset; a None url deletes the token.
+
+        Safe to call concurrently from several workers with the same batch:
+        the offset is re-read under the write lock, so each change is
+        applied once.
+
+        Returns:
+            int: The number of changes applied.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = stream_id(self.offset)
+            pending = [c for c in changes if stream_id(c[0]) > current]
+            for _, token, url in pending:
+                if url is None:
+                    self.conn.execute(
+                        "DELETE FROM url_shortened WHERE id = ?", (token,)
+                    )
+                else:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO url_shortened (id, url) VALUES (?, ?)",
+                        (token, url),
+                    )
+            if pending:
+                self._set_offset(pending[-1][0])
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        return len(pending)
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class MmapUrlStore(UrlStore):
+    """
+    Read-only store backed by a `TokenIndex`, remapped when a new generation
+    replaces the file.
+
+    The file is checked at most once per `reload_interval` seconds, on the
+    lookup path; between generations, created and deleted tokens are not
+    seen by this store.
+    """
+
+    def __init__(self, path: str, reload_interval: float = 5.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.index = TokenIndex(path)
+        self._next_check = time.monotonic() + reload_interval
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval
+
+        try:
+            stat = os.stat(self.path)
+        except OSError as e:
+            logger.warning("Token index %s unavailable: %s", self.path, e)
+            return
+        if (stat.st_ino, stat.st_mtime_ns, stat.st_size) == self.index.identity:
+            return
+
+        try:
+            index = TokenIndex(self.path)
+        except (OSError, ValueError) as e:
+            logger.error("Could not load new token index generation: %s", e)
+            return
+        previous, self.index = self.index, index
+        previous.close()
+        logger.info("Loaded token index generation with %d tokens", len(self.index))
+
+    def get(self, token: str) -> str | None:
+        self._maybe_reload()
+        return self.index.get(token)
+
+    def ping(self) -> bool:
+        return not self.index.mm.closed
+
+    def close(self) -> None:
+        self.index.close()
+
+
+def build_url_store(backend: str, path: str) -> UrlStore | None:
+    """
+    Returns the embedded store for `backend`, or None when lookups go to
+    PostgreSQL.
+    """
+    if backend == "postgres":
+        return None
+    if backend == "sqlite":
+        return SqliteUrlStore(path)
+    if backend == "mmap":
+        return MmapUrlStore(path, EMBEDDED_RELOAD_INTERVAL)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+url_store = build_url_store(STORAGE_BACKEND, EMBEDDED_DB_PATH)
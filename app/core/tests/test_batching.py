@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from app.core.batching import MicroBatcher
+
+
+def make_batcher(values, calls, window=0.01, max_size=10):
+    async def load_many(keys):
+        calls.append(list(keys))
+        if isinstance(values, Exception):
+            raise values
+        return {key: values[key] for key in keys if key in values}
+
+    return MicroBatcher("test", load_many, window, max_size)
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_resolves_concurrent_keys_in_one_call():
+    calls = []
+    batcher = make_batcher({"a": "1", "b": "2"}, calls)
+
+    results = await asyncio.gather(*(batcher.load(k) for k in ("a", "b", "a", "c")))
+
+    assert results == ["1", "2", "1", None]
+    assert calls == [["a", "b", "c"]]
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_flushes_when_full():
+    calls = []
+    batcher = make_batcher({}, calls, window=10.0, max_size=2)
+
+    await asyncio.wait_for(
+        asyncio.gather(*(batcher.load(k) for k in ("a", "b", "c", "d"))), 1.0
+    )
+
+    assert calls == [["a", "b"], ["c", "d"]]
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_propagates_errors_to_every_waiter():
+    batcher = make_batcher(RuntimeError("down"), [])
+
+    results = await asyncio.gather(
+        batcher.load("a"), batcher.load("b"), return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_micro_batcher_cancelled_waiter_does_not_cancel_the_batch():
+    calls = []
+    batcher = make_batcher({"a": "1"}, calls)
+
+    first = asyncio.ensure_future(batcher.load("a"))
+    second = asyncio.ensure_future(batcher.load("a"))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "1"
+    assert calls == [["a"]]
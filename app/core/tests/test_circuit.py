@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from app.core.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+class BackendError(Exception):
+    pass
+
+
+class ExpectedError(BackendError):
+    pass
+
+
+def failing():
+    raise BackendError()
+
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker(
+        "test",
+        failures=(BackendError,),
+        excluded=(ExpectedError,),
+        failure_threshold=2,
+        reset_timeout=60,
+    )
+
+
+def test_guard_opens_after_consecutive_failures_and_short_circuits(breaker):
+    calls = []
+
+    assert breaker.guard(failing, fallback="down") == "down"
+    assert breaker.state == CLOSED
+    assert breaker.guard(failing, fallback="down") == "down"
+    assert breaker.state == OPEN
+
+    assert breaker.guard(calls.append, 1, fallback="down") == "down"
+    assert calls == []
+
+
+def test_half_open_probe_success_closes_the_breaker(breaker):
+    breaker.guard(failing)
+    breaker.guard(failing)
+    breaker.opened_at -= 60
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.guard(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_failure_reopens_and_limits_probes(breaker):
+    breaker.guard(failing)
+    breaker.guard(failing)
+    breaker.opened_at -= 60
+
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+
+
+def test_half_open_probe_slot_is_released_by_unrelated_errors(breaker):
+    breaker.guard(failing)
+    breaker.guard(failing)
+    breaker.opened_at -= 60
+
+    def unrelated():
+        raise KeyError()
+
+    with pytest.raises(KeyError):
+        breaker.guard(unrelated)
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.guard(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_excluded_errors_are_raised_and_count_as_success(breaker):
+    breaker.guard(failing)
+
+    def expected():
+        raise ExpectedError()
+
+    with pytest.raises(ExpectedError):
+        breaker.guard(expected)
+
+    assert breaker.consecutive_failures == 0
+
+
+@pytest.mark.asyncio
+async def test_call_raises_circuit_open_and_counts_timeouts():
+    breaker = CircuitBreaker(
+        "test", failures=(asyncio.TimeoutError,), failure_threshold=1
+    )
+
+    with pytest.raises(asyncio.TimeoutError):
+        await breaker.call(asyncio.sleep, 1, timeout=0.001)
+
+    with pytest.raises(CircuitOpen):
+        await breaker.call(asyncio.sleep, 0)
@@ -0,0 +1,53 @@
+import pytest
+
+from app.core.compression import (
+    DEFAULT_DICTIONARY,
+    UrlCompressor,
+    dictionary_id,
+    train_dictionary,
+)
+
+LONG_URL = (
+    "https://www.mercadolivre.com.br/smart-cmera-wi-fi-positivo-casa-inteligente"
+    "/p/MLB27823553?pdp_filters=item_id:MLB4460338862#is_advertising=true"
+    "&searchVariation=MLB27823553&backend_model=search-backend&position=1"
+    "&search_layout=grid&type=pad&utm_source=google&utm_medium=cpc"
+)
+
+
+def test_compress_long_url_round_trips_and_is_smaller():
+    compressor = UrlCompressor(min_length=64)
+
+    stored = compressor.compress(LONG_URL)
+
+    assert stored.startswith(f"~z{dictionary_id(DEFAULT_DICTIONARY)}:")
+    assert len(stored) < len(LONG_URL)
+    assert compressor.decompress(stored) == LONG_URL
+
+
+@pytest.mark.parametrize(
+    "compressor",
+    [UrlCompressor(min_length=1024), UrlCompressor(min_length=1, enabled=False)],
+)
+def test_compress_returns_url_untouched_below_threshold_or_when_disabled(compressor):
+    assert compressor.compress(LONG_URL) == LONG_URL
+
+
+def test_decompress_keeps_plain_urls_untouched():
+    assert UrlCompressor().decompress("http://example.com") == "http://example.com"
+
+
+def test_decompress_with_unknown_dictionary_raises_value_error():
+    with pytest.raises(ValueError):
+        UrlCompressor().decompress("~zffff:abc")
+
+
+def test_trained_dictionary_values_are_readable_by_a_compressor_sharing_it():
+    samples = [LONG_URL.replace("MLB27823553", f"MLB{i}") for i in range(20)]
+    dictionary = train_dictionary(samples, size=512)
+    writer = UrlCompressor(dictionary, min_length=64)
+    reader = UrlCompressor(dictionary)
+
+    assert len(dictionary) <= 512
+    assert b"utm_source=" in dictionary
+    assert reader.decompress(writer.compress(LONG_URL)) == LONG_URL
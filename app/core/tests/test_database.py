@@ -0,0 +1,51 @@
+import pytest
+
+import app.core.database as database
+from app.core.database import DEFAULT_POOL_SIZE, engine_options, pool_size_for
+
+
+def test_pool_size_for_prefers_the_explicit_size():
+    assert pool_size_for(pool_size=7, budget=1000, workers=4, replicas=2) == 7
+
+
+def test_pool_size_for_defaults_without_a_budget():
+    assert pool_size_for(pool_size=0, budget=0) == DEFAULT_POOL_SIZE
+
+
+def test_pool_size_for_splits_the_budget_across_workers_and_replicas():
+    size = pool_size_for(pool_size=0, budget=400, workers=9, replicas=4, max_overflow=2)
+
+    assert size == 9
+    assert 4 * 9 * (size + 2) <= 400
+
+
+def test_pool_size_for_leaves_room_for_dedicated_connections():
+    size = pool_size_for(pool_size=0, budget=400, workers=9, replicas=4, dedicated=1)
+
+    assert size == 10
+    assert 4 * 9 * (size + 1) <= 400
+
+
+def test_pool_size_for_rejects_a_budget_below_one_connection_per_worker():
+    with pytest.raises(ValueError):
+        pool_size_for(pool_size=0, budget=10, workers=9, replicas=2)
+
+
+def test_engine_options_disable_statement_caches_in_pgbouncer_mode():
+    options = engine_options(pgbouncer=True)
+    connect_args = options["connect_args"]
+
+    assert connect_args["statement_cache_size"] == 0
+    assert connect_args["prepared_statement_cache_size"] == 0
+    assert (
+        connect_args["prepared_statement_name_func"]()
+        != connect_args["prepared_statement_name_func"]()
+    )
+    assert "connect_args" not in engine_options(pgbouncer=False)
+
+
+def test_pool_checked_out_reads_the_pool_replaced_after_fork(monkeypatch):
+    database.engine.sync_engine.dispose(close=False)
+    monkeypatch.setattr(database.engine.sync_engine.pool, "checkedout", lambda: 3)
+
+    assert database.pool_checked_out.collect()[0].samples[0].value == 3
@@ -0,0 +1,83 @@
+import fakeredis
+import pytest
+
+from app.core.health import HealthMonitor
+
+
+class FakePool:
+    _max_overflow = 0
+
+    def size(self):
+        return 4
+
+    def checkedout(self):
+        return 3
+
+    def overflow(self):
+        return -4
+
+
+class FakeEngine:
+    pool = FakePool()
+
+    def connect(self):
+        raise ConnectionRefusedError()
+
+
+@pytest.mark.asyncio
+async def test_refresh_records_probe_results_and_pool_saturation():
+    monitor = HealthMonitor(
+        FakeEngine(), fakeredis.FakeRedis(decode_responses=True), timeout=0.1
+    )
+
+    await monitor.refresh()
+
+    assert monitor.redis_ok is True
+    assert monitor.db_ok is False
+    assert monitor.pool == {
+        "size": 4,
+        "checked_out": 3,
+        "overflow": 0,
+        "saturation": 0.75,
+    }
+    assert monitor.stale is False
+
+
+@pytest.mark.asyncio
+async def test_refresh_probes_every_cache_node():
+    down = fakeredis.FakeServer()
+    down.connected = False
+    nodes = {"a": fakeredis.FakeRedis(), "b": fakeredis.FakeRedis(server=down)}
+    monitor = HealthMonitor(
+        FakeEngine(), fakeredis.FakeRedis(), cache_nodes=nodes, timeout=0.1
+    )
+
+    await monitor.refresh()
+
+    assert monitor.cache_nodes_ok == {"a": True, "b": False}
+    assert monitor.redis_ok is True
+
+    nodes["a"] = fakeredis.FakeRedis(server=down)
+    await monitor.refresh()
+
+    assert monitor.redis_ok is False
+    assert monitor.snapshot()["cache_nodes"] == {"a": False, "b": False}
+
+
+class SaturatedPool(FakePool):
+    def checkedout(self):
+        return 4
+
+
+class SaturatedEngine(FakeEngine):
+    pool = SaturatedPool()
+
+
+@pytest.mark.asyncio
+async def test_refresh_does_not_fail_the_database_when_the_pool_is_exhausted():
+    monitor = HealthMonitor(SaturatedEngine(), fakeredis.FakeRedis(), timeout=0.1)
+
+    await monitor.refresh()
+
+    assert monitor.pool["saturation"] == 1.0
+    assert monitor.db_ok is True
@@ -0,0 +1,111 @@
+import io
+import logging
+import sys
+import threading
+
+import orjson
+from prometheus_client import REGISTRY
+
+from app.core.logs import AsyncQueueHandler, JsonFormatter, RateLimitFilter
+
+
+def make_record(msg="Backend %s unavailable", args=("redis",), level=logging.WARNING):
+    return logging.LogRecord("app.test", level, __file__, 1, msg, args, None)
+
+
+def test_json_formatter_merges_arguments_and_extra_fields():
+    record = make_record()
+    record.url_length = 42
+
+    payload = orjson.loads(JsonFormatter().format(record))
+
+    assert payload["message"] == "Backend redis unavailable"
+    assert payload["level"] == "WARNING"
+    assert payload["logger"] == "app.test"
+    assert payload["url_length"] == 42
+    assert "exc_info" not in payload
+
+
+def test_json_formatter_includes_the_traceback():
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        record = logging.LogRecord(
+            "app.test", logging.ERROR, __file__, 1, "failed", (), sys.exc_info()
+        )
+
+    payload = orjson.loads(JsonFormatter().format(record))
+
+    assert "RuntimeError: boom" in payload["exc_info"]
+
+
+def test_rate_limit_filter_suppresses_repeats_and_reports_the_count():
+    limiter = RateLimitFilter(period=60.0, burst=2)
+
+    allowed = [limiter.filter(make_record(args=(i,))) for i in range(5)]
+
+    assert allowed == [True, True, False, False, False]
+    assert limiter.filter(make_record(msg="Other %s")) is True
+
+    limiter._groups[("app.test", logging.WARNING, "Backend %s unavailable")][0] -= 60
+    record = make_record()
+    assert limiter.filter(record) is True
+    assert record.suppressed == 3
+
+
+def test_rate_limit_filter_samples_after_the_burst():
+    limiter = RateLimitFilter(period=60.0, burst=1, sample_every=3)
+
+    allowed = [limiter.filter(make_record()) for _ in range(7)]
+
+    assert allowed == [True, False, False, True, False, False, True]
+
+
+def test_rate_limit_filter_ignores_lower_levels():
+    limiter = RateLimitFilter(period=60.0, burst=1)
+
+    assert all(limiter.filter(make_record(level=logging.INFO)) for _ in range(10))
+
+
+def test_async_handler_writes_from_the_listener_thread():
+    stream = io.StringIO()
+    handler = AsyncQueueHandler(stream, burst=0)
+    handler.setFormatter(JsonFormatter())
+    threads = []
+    original_emit = handler.target.emit
+    handler.target.emit = lambda record: (
+        threads.append(threading.current_thread()),
+        original_emit(record),
+    )
+
+    handler.handle(make_record())
+    handler.flush()
+    handler.close()
+
+    assert orjson.loads(stream.getvalue())["message"] == "Backend redis unavailable"
+    assert threads and threading.current_thread() not in threads
+
+
+def test_async_handler_drops_records_when_the_queue_is_full():
+    stream = io.StringIO()
+    handler = AsyncQueueHandler(stream, maxsize=2, burst=0)
+    writing, release = threading.Event(), threading.Event()
+    handler.target.emit = lambda record: (writing.set(), release.wait(5))
+    dropped = REGISTRY.get_sample_value("log_records_dropped_total")
+
+    handler.handle(make_record())
+    writing.wait(5)
+    for _ in range(4):
+        handler.handle(make_record())
+    release.set()
+    handler.flush()
+    handler.target.emit = lambda record: stream.write(record.getMessage() + "\n")
+    handler.handle(make_record())
+    handler.close()
+
+    assert handler.dropped == 2
+    assert REGISTRY.get_sample_value("log_records_dropped_total") == dropped + 2
+    assert stream.getvalue().splitlines() == [
+        "2 log records dropped, the log queue was full",
+        "Backend redis unavailable",
+    ]
@@ -0,0 +1,64 @@
+import io
+import logging
+
+import pytest
+from alembic import command
+
+import app.core.migrations as migrations
+
+
+@pytest.mark.asyncio
+async def test_check_schema_revision_when_database_is_at_head(make_db_session):
+    db_client = make_db_session(return_value=migrations.head_revision())
+
+    assert await migrations.check_schema_revision(db_client) is True
+    assert len(db_client.exec_args) == 1
+
+
+@pytest.mark.asyncio
+async def test_check_schema_revision_when_database_is_behind(make_db_session):
+    db_client = make_db_session(return_value=None)
+
+    assert await migrations.check_schema_revision(db_client) is False
+
+
+@pytest.mark.asyncio
+async def test_check_schema_revision_when_database_is_unreachable(make_db_session):
+    db_client = make_db_session()
+
+    async def refused(stmt):
+        raise ConnectionRefusedError()
+
+    db_client.execute = refused
+
+    assert await migrations.check_schema_revision(db_client) is False
+
+
+def test_head_revision_is_read_once(monkeypatch):
+    migrations.head_revision.cache_clear()
+    calls = []
+    original = migrations.ScriptDirectory.from_config
+
+    def counting_from_config(config):
+        calls.append(config)
+        return original(config)
+
+    monkeypatch.setattr(migrations.ScriptDirectory, "from_config", counting_from_config)
+
+    assert migrations.head_revision() == migrations.head_revision()
+    assert len(calls) == 1
+
+
+def test_migrations_keep_the_application_logging(caplog):
+    logger = logging.getLogger("app.test")
+    handlers = list(logging.getLogger().handlers)
+    config = migrations._alembic_config()
+    config.output_buffer = io.StringIO()
+
+    # Offline (--sql) upgrade runs alembic/env.py without a database
+    command.upgrade(config, "head", sql=True)
+    logger.warning("still logging")
+
+    assert not logger.disabled
+    assert logging.getLogger().handlers == handlers
+    assert "still logging" in caplog.text
@@ -0,0 +1,27 @@
+import threading
+import time
+
+from app.core.profiling import StackSampler
+
+
+def busy_function(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_stack_sampler_collects_folded_stacks_of_the_target_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_function, args=(stop,))
+    worker.start()
+    sampler = StackSampler(worker.ident, interval=0.001)
+
+    sampler.start()
+    time.sleep(0.05)
+    sampler.stop()
+    stop.set()
+    worker.join()
+
+    assert sampler.samples > 0
+    stack, count = sampler.folded().splitlines()[0].rsplit(" ", 1)
+    assert "busy_function" in stack
+    assert int(count) > 0
@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+import redis
+
+import app.core.ratelimit as ratelimit
+import app.dependencies as dependencies
+from app.core.database import PoolWaitStats
+from app.core.ratelimit import RateLimiter, TokenBucket
+
+
+@pytest.fixture
+def fake_redis():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def test_token_bucket_allows_burst_then_rejects():
+    bucket = TokenBucket(rate=0.001, capacity=2)
+
+    assert [bucket.allow() for _ in range(3)] == [True, True, False]
+
+
+def test_rate_limiter_is_shared_across_workers_through_redis(fake_redis):
+    worker_a = RateLimiter("create", limit=3, window=60, client=fake_redis)
+    worker_b = RateLimiter("create", limit=3, window=60, client=fake_redis)
+
+    results = [worker_a.allow("ip:1"), worker_b.allow("ip:1"), worker_a.allow("ip:1")]
+
+    assert results == [True, True, True]
+    assert worker_b.allow("ip:1") is False
+    assert worker_b.allow("ip:2") is True
+
+
+def test_rate_limiter_charges_the_cost_of_each_request(fake_redis):
+    worker_a = RateLimiter("delete", limit=5, window=60, client=fake_redis)
+    worker_b = RateLimiter("delete", limit=5, window=60, client=fake_redis)
+
+    assert worker_a.allow("ip:1", cost=6) is False
+    assert worker_a.allow("ip:1", cost=3) is True
+    assert worker_b.allow("ip:1", cost=2) is True
+    assert worker_b.allow("ip:1") is False
+
+
+def test_rate_limiter_local_bucket_rejects_without_calling_redis(fake_redis):
+    limiter = RateLimiter("create", limit=1, window=60, client=fake_redis)
+    limiter.allow("ip:1")
+    calls = []
+    fake_redis.pipeline = lambda **kwargs: calls.append(kwargs)
+
+    assert limiter.allow("ip:1") is False
+    assert calls == []
+
+
+def test_rate_limiter_fails_open_when_redis_is_down(fake_redis):
+    limiter = RateLimiter("create", limit=5, window=60, client=fake_redis)
+
+    def broken_pipeline(**kwargs):
+        raise redis.ConnectionError()
+
+    fake_redis.pipeline = broken_pipeline
+
+    assert limiter.allow("ip:1") is True
+
+
+def test_is_overloaded_when_pool_wait_or_loop_lag_exceed_limits(monkeypatch):
+    stats = PoolWaitStats(alpha=1)
+    monkeypatch.setattr(ratelimit, "pool_wait", stats)
+    monkeypatch.setattr(ratelimit.health_monitor, "loop_lag", 0.0)
+
+    assert ratelimit.is_overloaded() is False
+
+    stats.observe(ratelimit.SHED_MAX_POOL_WAIT * 10)
+    assert ratelimit.is_overloaded() is True
+
+    stats.observe(0.0)
+    stats.waiting = ratelimit.SHED_MAX_POOL_WAITERS + 1
+    assert ratelimit.is_overloaded() is True
+
+    stats.waiting = 0
+    monkeypatch.setattr(ratelimit.health_monitor, "loop_lag", 10.0)
+    assert ratelimit.is_overloaded() is True
+
+
+def test_pool_wait_average_decays_while_idle(monkeypatch):
+    stats = PoolWaitStats(alpha=1, half_life=1.0)
+    stats.observe(1.0)
+
+    monkeypatch.setattr(
+        "app.core.database.time.monotonic", lambda: stats.updated_at + 2.0
+    )
+
+    assert stats.current() == pytest.approx(0.25)
+
+
+def test_client_key_only_trusts_known_api_keys(monkeypatch):
+    monkeypatch.setattr(dependencies, "API_KEYS", frozenset({"partner-1"}))
+
+    def request(api_key):
+        return SimpleNamespace(
+            headers={"x-api-key": api_key}, client=SimpleNamespace(host="10.0.0.1")
+        )
+
+    assert dependencies.client_key(request("partner-1")) == "key:partner-1"
+    assert dependencies.client_key(request("random-123")) == "ip:10.0.0.1"
@@ -0,0 +1,38 @@
+import pytest
+
+from app.core.regions import RegionRouter, parse_region_map
+
+
+def test_parse_region_map():
+    assert parse_region_map("sa=AB, us=CD,") == {"sa": "AB", "us": "CD"}
+    assert parse_region_map("") == {}
+
+    with pytest.raises(ValueError):
+        parse_region_map("sa")
+
+
+def test_region_router_maps_tokens_to_owning_region():
+    router = RegionRouter("sa", {"sa": "AB", "us": "cd"})
+
+    assert router.owner("ABC123") == "sa"
+    assert router.owner("d12345") == "us"
+    assert router.owner("Z12345") is None
+    assert router.is_local("BBBBBB")
+    assert not router.is_local("CCCCCC")
+    assert router.token_prefix() in {"A", "B"}
+
+
+def test_region_router_disabled_without_region():
+    router = RegionRouter()
+
+    assert not router.enabled
+    assert router.token_prefix() == ""
+    assert router.is_local("ABC123")
+
+
+def test_region_router_rejects_shared_prefixes_and_missing_local_prefixes():
+    with pytest.raises(ValueError):
+        RegionRouter("sa", {"sa": "AB", "us": "BC"})
+
+    with pytest.raises(ValueError):
+        RegionRouter("eu", {"sa": "AB"})
@@ -0,0 +1,83 @@
+import pytest
+
+from app.core import startup
+from app.core.database import pool_size_for
+from app.core.server import Server, server_options
+from app.core.startup import (
+    StartupTimer,
+    available_cpus,
+    event_loop,
+    http_parser,
+    worker_count,
+)
+
+
+@pytest.fixture
+def four_cpus(monkeypatch):
+    monkeypatch.setattr(startup.os, "sched_getaffinity", lambda pid: {0, 1, 2, 3})
+
+
+def test_available_cpus_is_capped_by_the_cgroup_v2_quota(tmp_path, four_cpus):
+    (tmp_path / "cpu.max").write_text("150000 100000\n")
+
+    assert available_cpus(str(tmp_path)) == 2
+
+
+def test_available_cpus_without_a_quota_counts_the_allowed_cpus(tmp_path, four_cpus):
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+
+    assert available_cpus(str(tmp_path)) == 4
+    assert available_cpus(str(tmp_path / "missing")) == 4
+
+
+def test_available_cpus_reads_the_cgroup_v1_quota(tmp_path, four_cpus):
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("100000\n")
+    (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+
+    assert available_cpus(str(tmp_path)) == 1
+
+
+def test_worker_count_prefers_the_configured_value(monkeypatch):
+    monkeypatch.setattr(startup, "available_cpus", lambda: 6)
+
+    assert worker_count(3) == 3
+    assert worker_count(0) == 6
+
+
+def test_pool_size_for_splits_the_budget_across_auto_sized_workers(monkeypatch):
+    monkeypatch.setattr(startup, "available_cpus", lambda: 4)
+
+    assert pool_size_for(pool_size=0, budget=100, workers=0, replicas=5) == 5
+
+
+def test_event_loop_and_http_parser_prefer_the_fast_implementations(monkeypatch):
+    monkeypatch.setattr(startup.importlib.util, "find_spec", lambda name: object())
+    assert (event_loop(), http_parser()) == ("uvloop", "httptools")
+    assert (event_loop("asyncio"), http_parser("h11")) == ("asyncio", "h11")
+
+    monkeypatch.setattr(startup.importlib.util, "find_spec", lambda name: None)
+    assert (event_loop(), http_parser()) == ("asyncio", "h11")
+
+
+def test_startup_timer_records_each_phase():
+    timer = StartupTimer()
+
+    with timer.phase("import"):
+        pass
+    timer.record("warmup", 0.25)
+
+    assert list(timer.phases) == ["import", "warmup"]
+    assert timer.summary().endswith("warmup 250.0 ms")
+    assert startup.startup_phase_seconds.labels("warmup")._value.get() == 0.25
+
+
+def test_server_preloads_the_app_with_auto_sized_workers(monkeypatch):
+    monkeypatch.setattr(startup, "available_cpus", lambda: 3)
+
+    server = Server(server_options())
+
+    assert server.cfg.workers == 3
+    assert server.cfg.preload_app is True
+    assert server.cfg.worker_class_str == "app.core.server.Worker"
+    assert Server(server_options(workers=8)).cfg.workers == 8
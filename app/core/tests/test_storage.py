@@ -0,0 +1,53 @@
+import pytest
+
+from app.core.storage import SqliteUrlStore, build_url_store, stream_id
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SqliteUrlStore(str(tmp_path / "edge" / "urls.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_sqlite_store_reads_loaded_snapshot(store):
+    store.load([("AAAAAA", "http://a"), ("BBBBBB", "http://b")], "5-0")
+
+    assert store.get("AAAAAA") == "http://a"
+    assert store.get("CCCCCC") is None
+    assert store.get_many(["AAAAAA", "CCCCCC"]) == {"AAAAAA": "http://a"}
+    assert store.offset == "5-0"
+    assert len(store) == 2
+    assert store.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_sqlite_store_applies_only_changes_newer_than_offset(store):
+    store.load([("AAAAAA", "http://a")], "5-0")
+    changes = [
+        ("4-0", "OLDOLD", "http://old"),
+        ("6-0", "BBBBBB", "http://b"),
+        ("6-1", "AAAAAA", None),
+    ]
+
+    assert store.apply(changes) == 2
+    assert store.apply(changes) == 0
+
+    assert store.get("AAAAAA") is None
+    assert store.get("BBBBBB") == "http://b"
+    assert store.get("OLDOLD") is None
+    assert store.offset == "6-1"
+
+
+def test_stream_id_orders_numerically():
+    assert stream_id("10-0") > stream_id("9-5")
+    assert stream_id("9-10") > stream_id("9-9")
+
+
+def test_build_url_store(tmp_path):
+    assert build_url_store("postgres", "unused") is None
+    assert isinstance(
+        build_url_store("sqlite", str(tmp_path / "urls.db")), SqliteUrlStore
+    )
+
+    with pytest.raises(ValueError):
+        build_url_store("mysql", "unused")
@@ -0,0 +1,84 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.core.storage import MmapUrlStore, build_url_store
+from app.core.token_index import TokenIndex, export_index, write_index
+
+
+def test_write_index_and_lookup(tmp_path):
+    path = str(tmp_path / "tokens.idx")
+    rows = [("AAAAAA", "http://a"), ("AAAAAAA", "http://skip"), ("BBBBBB", "")]
+    rows += [(f"C{i:05d}", f"http://c/{i}") for i in range(100)]
+
+    assert write_index(path, rows) == (102, 1)
+
+    index = TokenIndex(path)
+    assert len(index) == 102
+    assert index.get("AAAAAA") == "http://a"
+    assert index.get("BBBBBB") == ""
+    assert index.get("C00042") == "http://c/42"
+    assert index.get("C00100") is None
+    assert index.get("ZZZZZZ") is None
+    assert index.get("AAAAAAA") is None
+    assert index.get("ÁAAAAA") is None
+    index.close()
+
+
+def test_write_index_pads_shorter_tokens(tmp_path):
+    path = str(tmp_path / "tokens.idx")
+    rows = [("ALIAS", "http://alias"), ("ALIASES", "http://aliases")]
+
+    assert write_index(path, rows, token_width=7) == (2, 0)
+
+    index = TokenIndex(path)
+    assert index.get("ALIAS") == "http://alias"
+    assert index.get("ALIASES") == "http://aliases"
+    assert index.get("ALIA") is None
+    index.close()
+
+
+def test_write_index_rejects_unsorted_rows_and_keeps_previous_file(tmp_path):
+    path = str(tmp_path / "tokens.idx")
+    write_index(path, [("AAAAAA", "http://a")])
+
+    with pytest.raises(ValueError):
+        write_index(path, [("BBBBBB", "http://b"), ("AAAAAA", "http://a")])
+
+    assert TokenIndex(path).get("AAAAAA") == "http://a"
+    assert os.listdir(tmp_path) == ["tokens.idx"]
+
+
+def test_mmap_store_swaps_to_new_generation(tmp_path):
+    path = str(tmp_path / "tokens.idx")
+    write_index(path, [("AAAAAA", "http://a")])
+    store = MmapUrlStore(path, reload_interval=0)
+
+    assert store.get("AAAAAA") == "http://a"
+
+    write_index(path, [("BBBBBB", "http://b")])
+
+    assert store.get("AAAAAA") is None
+    assert store.get("BBBBBB") == "http://b"
+    assert store.ping()
+    store.close()
+
+
+def test_export_index_from_database(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'primary.db'}"
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE url_shortened (id TEXT, url TEXT)"))
+        conn.execute(
+            text(
+                "INSERT INTO url_shortened VALUES "
+                "('ZZZZZZ', 'http://z'), ('AAAAAA', 'http://a')"
+            )
+        )
+    engine.dispose()
+    path = str(tmp_path / "tokens.idx")
+
+    assert export_index(path, database_url, batch_size=1) == (2, 0)
+    assert isinstance(build_url_store("mmap", path), MmapUrlStore)
+    assert TokenIndex(path).get("ZZZZZZ") == "http://z"
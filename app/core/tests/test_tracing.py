@@ -0,0 +1,242 @@
+import threading
+import time
+
+import orjson
+import pytest
+import redis
+from fastapi.testclient import TestClient
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from opentelemetry.trace import StatusCode, set_span_in_context
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core import tracing
+from app.core.circuit import redis_breaker
+from app.core.tracing import (
+    HeadSampler,
+    JsonLinesSpanExporter,
+    TailSamplingProcessor,
+    TracingMiddleware,
+    client_span,
+    setup_tracing,
+    shutdown_tracing,
+    trace_queries,
+)
+from app.main import app
+
+
+def _provider(processor, rate=0.0):
+    provider = TracerProvider(sampler=HeadSampler(rate))
+    provider.add_span_processor(processor)
+    return provider
+
+
+def _names(exporter):
+    return sorted(span.name for span in exporter.get_finished_spans())
+
+
+@pytest.fixture
+def exported():
+    exporter = InMemorySpanExporter()
+    setup_tracing(exporter, sample_rate=1.0)
+    yield exporter
+    shutdown_tracing()
+
+
+def test_head_sampler_keeps_the_configured_share_and_follows_the_parent():
+    exporter = InMemorySpanExporter()
+    processor = TailSamplingProcessor(exporter, slow_threshold=60)
+    tracer = _provider(processor, rate=1.0).get_tracer("test")
+
+    with tracer.start_as_current_span("root") as root:
+        with tracer.start_as_current_span("child") as child:
+            pass
+    processor.force_flush()
+
+    assert root.get_span_context().trace_flags.sampled
+    assert child.get_span_context().trace_flags.sampled
+    assert _names(exporter) == ["child", "root"]
+    processor.shutdown()
+
+
+def test_tail_sampling_drops_fast_traces_and_keeps_slow_ones_whole():
+    exporter = InMemorySpanExporter()
+    processor = TailSamplingProcessor(exporter, slow_threshold=0.005)
+    tracer = _provider(processor).get_tracer("test")
+
+    with tracer.start_as_current_span("fast"):
+        with tracer.start_as_current_span("fast child"):
+            pass
+    with tracer.start_as_current_span("slow") as slow:
+        with tracer.start_as_current_span("slow child"):
+            time.sleep(0.01)
+    processor.force_flush()
+
+    assert not slow.get_span_context().trace_flags.sampled
+    assert _names(exporter) == ["slow", "slow child"]
+    assert processor._pending == {}
+    processor.shutdown()
+
+
+def test_tail_sampling_keeps_failed_traces():
+    exporter = InMemorySpanExporter()
+    processor = TailSamplingProcessor(exporter, slow_threshold=60)
+    tracer = _provider(processor).get_tracer("test")
+
+    with pytest.raises(RuntimeError):
+        with tracer.start_as_current_span("failed"):
+            raise RuntimeError("boom")
+    processor.force_flush()
+
+    (span,) = exporter.get_finished_spans()
+    assert span.status.status_code is StatusCode.ERROR
+    processor.shutdown()
+
+
+def test_tail_sampling_bounds_the_pending_traces():
+    exporter = InMemorySpanExporter()
+    processor = TailSamplingProcessor(exporter, slow_threshold=0, max_traces=2)
+    tracer = _provider(processor).get_tracer("test")
+
+    roots = [tracer.start_span(f"root {i}") for i in range(3)]
+    for i, root in enumerate(roots):
+        tracer.start_span(f"child {i}", context=set_span_in_context(root)).end()
+    for root in roots:
+        root.end()
+    processor.force_flush()
+
+    assert len(processor._pending) == 0
+    assert _names(exporter) == ["child 1", "child 2", "root 0", "root 1", "root 2"]
+    processor.shutdown()
+
+
+def test_export_never_blocks_the_caller_and_counts_dropped_spans():
+    release = threading.Event()
+
+    class BlockingExporter(SpanExporter):
+        def __init__(self):
+            self.spans = []
+
+        def export(self, spans):
+            release.wait()
+            self.spans.extend(spans)
+            return SpanExportResult.SUCCESS
+
+    exporter = BlockingExporter()
+    processor = TailSamplingProcessor(
+        exporter, max_queue_size=2, max_batch_size=1, export_interval=60
+    )
+    tracer = _provider(processor, rate=1.0).get_tracer("test")
+    dropped = tracing.spans_dropped.labels("queue_full")
+    before = dropped._value.get()
+
+    start = time.perf_counter()
+    for i in range(10):
+        tracer.start_span(f"span {i}").end()
+    elapsed = time.perf_counter() - start
+    release.set()
+    processor.shutdown()
+
+    assert elapsed < 1
+    assert dropped._value.get() - before == 10 - len(exporter.spans)
+    assert 2 <= len(exporter.spans) <= 3
+
+
+def test_json_lines_exporter_appends_one_line_per_span(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = JsonLinesSpanExporter(str(path))
+    processor = TailSamplingProcessor(exporter)
+    tracer = _provider(processor, rate=1.0).get_tracer("test")
+
+    with tracer.start_as_current_span("root", attributes={"token": "ABC123"}):
+        with tracer.start_as_current_span("child"):
+            pass
+    processor.shutdown()
+
+    child, root = (orjson.loads(line) for line in path.read_bytes().splitlines())
+    assert (child["name"], root["name"]) == ("child", "root")
+    assert child["trace_id"] == root["trace_id"]
+    assert child["parent_id"] == root["span_id"]
+    assert root["parent_id"] is None
+    assert root["attributes"] == {"token": "ABC123"}
+    assert root["duration_ms"] >= child["duration_ms"]
+
+
+def test_client_span_is_a_no_op_outside_of_traced_requests(exported):
+    with client_span("redis", "get"):
+        pass
+    shutdown_tracing()
+
+    assert exported.get_finished_spans() == ()
+
+
+def test_middleware_traces_requests_with_their_redis_calls(
+    exported, make_redis_client
+):
+    fake = make_redis_client()
+    fake.set("ABC123", "https://original.example/")
+    client = TestClient(TracingMiddleware(app, excluded_paths={"/healthz"}))
+
+    response = client.get("/ABC123", follow_redirects=False)
+    client.get("/healthz")
+    shutdown_tracing()
+
+    assert response.status_code == 302
+    spans = {span.name: span for span in exported.get_finished_spans()}
+    assert sorted(spans) == ["GET /{url_id}", "redis get"]
+    root = spans["GET /{url_id}"]
+    assert root.attributes["http.route"] == "/{url_id}"
+    assert root.attributes["code.function"] == "get_url"
+    assert root.attributes["http.response.status_code"] == 302
+    assert spans["redis get"].parent.span_id == root.context.span_id
+
+
+def test_middleware_continues_the_caller_trace(exported, make_redis_client):
+    make_redis_client()
+    client = TestClient(TracingMiddleware(app))
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+    client.get(
+        "/ABC123",
+        headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"},
+        follow_redirects=False,
+    )
+    shutdown_tracing()
+
+    root = next(s for s in exported.get_finished_spans() if s.name == "GET /{url_id}")
+    assert f"{root.context.trace_id:032x}" == trace_id
+    assert root.parent.is_remote
+
+
+@pytest.mark.asyncio
+async def test_trace_queries_records_sql_statements(exported):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    trace_queries(engine.sync_engine)
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            with tracing._tracer.start_as_current_span("request"):
+                await conn.execute(text("SELECT 2"))
+    finally:
+        await engine.dispose()
+    shutdown_tracing()
+
+    spans = {span.name: span for span in exported.get_finished_spans()}
+    assert sorted(spans) == ["request", "sqlite SELECT"]
+    assert spans["sqlite SELECT"].attributes["db.statement"] == "SELECT 2"
+
+
+def test_redis_breaker_guard_still_returns_the_fallback_when_traced(exported):
+    def get(_key):
+        raise redis.ConnectionError()
+
+    with tracing._tracer.start_as_current_span("request"):
+        assert redis_breaker.guard(get, "ABC123", fallback="cached") == "cached"
+    shutdown_tracing()
+
+    spans = {span.name: span for span in exported.get_finished_spans()}
+    assert spans["redis get"].status.status_code is StatusCode.ERROR
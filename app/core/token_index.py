@@ -0,0 +1,212 @@
+"""
+Immutable memory-mapped token index for read-only redirect replicas.
+
+    python -m app.core.token_index --output data/tokens.idx
+
+File layout (little endian):
+
+    header   magic, token width, token count, blob size
+    tokens   count ASCII tokens, NUL-padded to the token width, sorted bytewise
+    offsets  count + 1 uint64 offsets of each URL in the blob
+    blob     stored URLs (possibly compressed), concatenated
+
+Every worker on a host maps the same file, so the page cache holds a
+single copy shared by all of them. A new generation is written next to
+the live file and moved over it atomically; readers notice the new file
+and remap it.
+"""
+
+import argparse
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from typing import Iterable
+
+from sqlalchemy import create_engine, text
+
+from app.settings import SYNC_DATABASE_URL
+
+MAGIC = b"URLIDX01"
+HEADER = struct.Struct("<8sHxxxxxxQQ")
+OFFSET = struct.Struct("<Q")
+
+logger = logging.getLogger(__name__)
+
+
+def write_index(path: str, rows: Iterable[tuple[str, str]], token_width: int = 6):
+    """
+    Writes `(token, url)` rows, sorted by token, as a new index generation
+    at `path`.
+
+    Tokens shorter than `token_width` are padded with NUL bytes, which keeps
+    the bytewise order (a token sorts before its extensions). Rows whose
+    token is longer or not ASCII are skipped.
+
+    Returns:
+        tuple[int, int]: The number of tokens written and skipped.
+
+    Raises:
+        ValueError: If the rows are not sorted or contain duplicates.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    count = skipped = blob_size = 0
+    previous = b""
+
+    sections = [tempfile.TemporaryFile(dir=directory) for _ in range(3)]
+    tokens, offsets, blob = sections
+    out = tempfile.NamedTemporaryFile(dir=directory, delete=False)
+    try:
+        offsets.write(OFFSET.pack(0))
+        for token, url in rows:
+            if len(token) > token_width or not token.isascii():
+                skipped += 1
+                continue
+            key = token.encode().ljust(token_width, b"\0")
+            if key <= previous:
+                raise ValueError(f"Tokens must be sorted and unique: {token}")
+            value = url.encode()
+            tokens.write(key)
+            blob.write(value)
+            blob_size += len(value)
+            offsets.write(OFFSET.pack(blob_size))
+            previous = key
+            count += 1
+
+        out.write(HEADER.pack(MAGIC, token_width, count, blob_size))
+        for section in sections:
+            section.seek(0)
+            while chunk := section.read(1 << 20):
+                out.write(chunk)
+        out.flush()
+        os.fsync(out.fileno())
+        out.close()
+    except BaseException:
+        out.close()
+        os.remove(out.name)
+        raise
+    finally:
+        for section in sections:
+            section.close()
+
+    os.chmod(out.name, 0o644)
+    os.replace(out.name, path)
+    return count, skipped
+
+
+class TokenIndex:
+    """
+    Binary search over a memory-mapped index file.
+
+    A 256-entry fan-out table of where each first byte starts (as in git
+    pack indexes) is built on open and narrows every search to the tokens
+    sharing the key's first character.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.token_width, self.count, blob_size = HEADER.unpack_from(self.mm)
+        if magic != MAGIC:
+            self.mm.close()
+            raise ValueError(f"Not a token index: {path}")
+        self.tokens_at = HEADER.size
+        self.offsets_at = self.tokens_at + self.count * self.token_width
+        self.blob_at = self.offsets_at + (self.count + 1) * OFFSET.size
+        self.fanout = [self._lower_bound(bytes([b]), 0, self.count) for b in range(256)]
+        self.fanout.append(self.count)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _lower_bound(self, key: bytes, lo: int, hi: int) -> int:
+        mm, width, base = self.mm, self.token_width, self.tokens_at
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = base + mid * width
+            if mm[start : start + width] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, key: bytes) -> int:
+        """
+        Returns the position of `key`, or -1 when absent.
+        """
+        mm, width, base = self.mm, self.token_width, self.tokens_at
+        lo, hi = self.fanout[key[0]], self.fanout[key[0] + 1]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = base + mid * width
+            current = mm[start : start + width]
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def get(self, token: str) -> str | None:
+        if len(token) > self.token_width or not token.isascii():
+            return None
+        position = self.find(token.encode().ljust(self.token_width, b"\0"))
+        if position < 0:
+            return None
+        start, end = struct.unpack_from(
+            "<QQ", self.mm, self.offsets_at + position * OFFSET.size
+        )
+        return self.mm[self.blob_at + start : self.blob_at + end].decode()
+
+    def close(self) -> None:
+        self.mm.close()
+
+
+def export_index(output: str, database_url: str, batch_size: int = 10_000):
+    """
+    Builds a new index generation at `output` from `url_shortened`.
+
+    Rows are streamed in bytewise token order (`COLLATE "C"` on
+    PostgreSQL), so the export never holds the table in memory. The token
+    width is the longest token's, so 6-character tokens are not padded to
+    the length of the occasional long alias.
+    """
+    engine = create_engine(database_url)
+    order = 'id COLLATE "C"' if engine.dialect.name == "postgresql" else "id"
+    with engine.connect() as conn:
+        width = conn.execute(text("SELECT max(length(id)) FROM url_shortened"))
+        token_width = width.scalar() or 6
+
+    def _rows():
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(
+                text(f"SELECT id, url FROM url_shortened ORDER BY {order}")
+            )
+            while rows := result.fetchmany(batch_size):
+                yield from rows
+
+    try:
+        return write_index(output, _rows(), token_width)
+    finally:
+        engine.dispose()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--database-url", default=SYNC_DATABASE_URL)
+    args = parser.parse_args()
+
+    count, skipped = export_index(args.output, args.database_url)
+    logger.info("Wrote %d tokens to %s (%d skipped)", count, args.output, skipped)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+import contextlib
+import logging
+import os
+import queue
+import threading
+from typing import Sequence
+
+import orjson
+from opentelemetry import trace
+from opentelemetry.propagate import extract
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.sampling import (
+    Decision,
+    Sampler,
+    SamplingResult,
+    TraceIdRatioBased,
+)
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from prometheus_client import Counter
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.settings import (
+    TRACING_BATCH_SIZE,
+    TRACING_EXCLUDED_PATHS,
+    TRACING_EXPORT_INTERVAL,
+    TRACING_EXPORTER,
+    TRACING_FILE_PATH,
+    TRACING_MAX_PENDING_TRACES,
+    TRACING_OTLP_ENDPOINT,
+    TRACING_QUEUE_SIZE,
+    TRACING_SAMPLE_RATE,
+    TRACING_SERVICE_NAME,
+    TRACING_SLOW_THRESHOLD,
+)
+
+logger = logging.getLogger(__name__)
+
+traces_kept = Counter(
+    "tracing_traces_kept_total", "Traces sent to the exporter", ["reason"]
+)
+spans_dropped = Counter(
+    "tracing_spans_dropped_total", "Spans lost before export", ["reason"]
+)
+
+_NO_SPAN = contextlib.nullcontext()
+_STOP = object()
+
+# Set by `setup_tracing`; spans are only created while it is
+_tracer: trace.Tracer | None = None
+_provider: TracerProvider | None = None
+
+
+class HeadSampler(Sampler):
+    """
+    Samples `rate` of the traces started here by trace id, and follows the
+    caller's decision for traces started upstream.
+
+    Traces left out are still recorded (RECORD_ONLY), so the tail sampling
+    of `TailSamplingProcessor` can keep the slow ones; they are not marked
+    sampled downstream.
+    """
+
+    def __init__(self, rate: float):
+        self._ratio = TraceIdRatioBased(rate)
+
+    def should_sample(
+        self,
+        parent_context,
+        trace_id,
+        name,
+        kind=None,
+        attributes=None,
+        links=None,
+        trace_state=None,
+    ) -> SamplingResult:
+        parent = trace.get_current_span(parent_context).get_span_context()
+        if parent.is_valid:
+            sampled = parent.trace_flags.sampled
+            trace_state = parent.trace_state
+        else:
+            sampled = trace_id & TraceIdRatioBased.TRACE_ID_LIMIT < self._ratio.bound
+        decision = Decision.RECORD_AND_SAMPLE if sampled else Decision.RECORD_ONLY
+        return SamplingResult(decision, attributes, trace_state)
+
+    def get_description(self) -> str:
+        return f"HeadSampler{{{self._ratio.rate}}}"
+
+
+class TailSamplingProcessor(SpanProcessor):
+    """
+    Exports head-sampled traces, plus the ones whose local root span took
+    `slow_threshold` seconds or more or ended in error.
+
+    Spans of traces not head-sampled wait in memory until their local root
+    ends; at most `max_traces` traces are pending, the oldest dropped first.
+    Kept spans go to a bounded queue that a background thread drains in
+    batches of `max_batch_size` (or every `export_interval` seconds), so a
+    slow exporter never blocks a request: spans arriving with the queue
+    full are dropped and counted.
+
+    Args:
+        exporter (SpanExporter): Where the kept spans go.
+        slow_threshold (float): Root span duration, in seconds, always kept.
+        max_traces (int): Traces awaiting their tail decision.
+        max_queue_size (int): Spans awaiting export.
+        max_batch_size (int): Spans per export call.
+        export_interval (float): Seconds between exports of partial batches.
+    """
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        slow_threshold: float = TRACING_SLOW_THRESHOLD,
+        max_traces: int = TRACING_MAX_PENDING_TRACES,
+        max_queue_size: int = TRACING_QUEUE_SIZE,
+        max_batch_size: int = TRACING_BATCH_SIZE,
+        export_interval: float = TRACING_EXPORT_INTERVAL,
+    ):
+        self.exporter = exporter
+        self.slow_threshold_ns = int(slow_threshold * 1e9)
+        self.max_traces = max_traces
+        self.max_batch_size = max_batch_size
+        self.export_interval = export_interval
+        self._pending: dict[int, list[ReadableSpan]] = {}
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(max_queue_size)
+        self._thread = threading.Thread(
+            target=self._run, name="span-exporter", daemon=True
+        )
+        self._thread.start()
+
+    def on_end(self, span: ReadableSpan) -> None:
+        context = span.context
+        if context.trace_flags.sampled:
+            if _is_local_root(span):
+                traces_kept.labels("head").inc()
+            self._enqueue(span)
+            return
+
+        with self._lock:
+            if not _is_local_root(span):
+                spans = self._pending.setdefault(context.trace_id, [])
+                spans.append(span)
+                if len(self._pending) > self.max_traces:
+                    oldest = next(iter(self._pending))
+                    spans_dropped.labels("evicted").inc(
+                        len(self._pending.pop(oldest))
+                    )
+                return
+            spans = self._pending.pop(context.trace_id, [])
+
+        if span.status.status_code is StatusCode.ERROR:
+            traces_kept.labels("error").inc()
+        elif span.end_time - span.start_time >= self.slow_threshold_ns:
+            traces_kept.labels("slow").inc()
+        else:
+            return
+        for child in spans:
+            self._enqueue(child)
+        self._enqueue(span)
+
+    def _enqueue(self, span: ReadableSpan) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            spans_dropped.labels("queue_full").inc()
+
+    def _export(self, batch: list[ReadableSpan]) -> list[ReadableSpan]:
+        if batch:
+            try:
+                self.exporter.export(batch)
+            except Exception:
+                logger.exception("Failed to export %d spans", len(batch))
+        return []
+
+    def _run(self) -> None:
+        batch: list[ReadableSpan] = []
+        while True:
+            try:
+                item = self._queue.get(timeout=self.export_interval)
+            except queue.Empty:
+                batch = self._export(batch)
+                continue
+            if item is _STOP:
+                self._export(batch)
+                return
+            if isinstance(item, threading.Event):
+                batch = self._export(batch)
+                item.set()
+                continue
+            batch.append(item)
+            if len(batch) >= self.max_batch_size:
+                batch = self._export(batch)
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout_millis / 1000)
+        except queue.Full:
+            return False
+        return done.wait(timeout_millis / 1000)
+
+    def shutdown(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self.exporter.shutdown()
+
+
+def _is_local_root(span: ReadableSpan) -> bool:
+    return span.parent is None or span.parent.is_remote
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """
+    Appends each span as a JSON line to a file, a stand-in for a collector
+    in development and benchmarks (`jq`, or any log shipper, can read it).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        lines = []
+        for span in spans:
+            parent = span.parent
+            lines.append(
+                orjson.dumps(
+                    {
+                        "trace_id": f"{span.context.trace_id:032x}",
+                        "span_id": f"{span.context.span_id:016x}",
+                        "parent_id": f"{parent.span_id:016x}" if parent else None,
+                        "name": span.name,
+                        "kind": span.kind.name,
+                        "start": span.start_time,
+                        "duration_ms": (span.end_time - span.start_time) / 1e6,
+                        "status": span.status.status_code.name,
+                        "attributes": dict(span.attributes or {}),
+                        "pid": os.getpid(),
+                    }
+                )
+            )
+        self._file.write(b"\n".join(lines) + b"\n")
+        self._file.flush()
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def build_exporter(kind: str = TRACING_EXPORTER) -> SpanExporter:
+    """
+    Raises:
+        ValueError: If `kind` is neither "file" nor "otlp".
+    """
+    if kind == "file":
+        return JsonLinesSpanExporter(TRACING_FILE_PATH)
+    if kind == "otlp":
+        # Pulls in protobuf and requests, only loaded when used
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        return OTLPSpanExporter(endpoint=TRACING_OTLP_ENDPOINT)
+    raise ValueError(f"Unknown TRACING_EXPORTER {kind!r}")
+
+
+def setup_tracing(
+    exporter: SpanExporter | None = None, sample_rate: float = TRACING_SAMPLE_RATE
+) -> None:
+    """
+    Starts tracing in this process. Runs in each worker, after any fork,
+    since the export thread does not survive one.
+    """
+    global _tracer, _provider
+    if _provider is not None:
+        return
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": TRACING_SERVICE_NAME}),
+        sampler=HeadSampler(sample_rate),
+    )
+    _provider.add_span_processor(TailSamplingProcessor(exporter or build_exporter()))
+    _tracer = _provider.get_tracer("app")
+
+
+def shutdown_tracing() -> None:
+    """
+    Exports the spans still queued and stops tracing.
+    """
+    global _tracer, _provider
+    if _provider is None:
+        return
+    provider, _provider, _tracer = _provider, None, None
+    provider.shutdown()
+
+
+def client_span(system: str, operation: str):
+    """
+    Span around a call to a backend, inside the current request's trace.
+    A no-op outside of traced requests (background tasks, tracing disabled).
+    """
+    if _tracer is None or not trace.get_current_span().is_recording():
+        return _NO_SPAN
+    return _tracer.start_as_current_span(
+        f"{system} {operation}",
+        kind=SpanKind.CLIENT,
+        attributes={"db.system": system, "db.operation": operation},
+    )
+
+
+def trace_queries(engine: Engine) -> None:
+    """
+    Traces every SQL statement run by `engine` (the `sync_engine` of an async
+    one) as a span of the current request.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _tracer is None or not trace.get_current_span().is_recording():
+            return
+        operation = statement.split(None, 1)[0].upper()
+        context._span = _tracer.start_span(
+            f"{engine.dialect.name} {operation}",
+            kind=SpanKind.CLIENT,
+            attributes={
+                "db.system": engine.dialect.name,
+                "db.operation": operation,
+                "db.statement": statement,
+            },
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        if span := getattr(context, "_span", None):
+            span.end()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        context = exception_context.execution_context
+        if span := getattr(context, "_span", None):
+            span.set_status(
+                Status(StatusCode.ERROR, repr(exception_context.original_exception))
+            )
+            span.end()
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root span of each HTTP request, continuing
+    the caller's trace when a `traceparent` header is sent. The span is
+    named after the matched route (`GET /{url_id}`).
+
+    Args:
+        app: The ASGI application.
+        excluded_paths (set[str] | None): Paths never traced, by default
+            TRACING_EXCLUDED_PATHS (metrics and probes).
+    """
+
+    def __init__(self, app, excluded_paths: set[str] | None = None):
+        self.app = app
+        if excluded_paths is None:
+            excluded_paths = set(filter(None, TRACING_EXCLUDED_PATHS.split(",")))
+        self.excluded_paths = excluded_paths
+
+    async def __call__(self, scope, receive, send):
+        if (
+            _tracer is None
+            or scope["type"] != "http"
+            or scope["path"] in self.excluded_paths
+        ):
+            return await self.app(scope, receive, send)
+
+        carrier = {
+            name.decode("latin-1"): value.decode("latin-1")
+            for name, value in scope["headers"]
+            if name in (b"traceparent", b"tracestate")
+        }
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        with _tracer.start_as_current_span(
+            method,
+            context=extract(carrier),
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": scope["path"]},
+        ) as span:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                if route := scope.get("route"):
+                    span.update_name(f"{method} {route.path}")
+                    span.set_attribute("http.route", route.path)
+                if endpoint := scope.get("endpoint"):
+                    span.set_attribute("code.function", endpoint.__name__)
+                span.set_attribute("http.response.status_code", status_code)
+                if status_code >= 500:
+                    span.set_status(Status(StatusCode.ERROR))
+
@@ -1,10 +1,94 @@
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Callable
 
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import AsyncSessionLocal
+from app.core.ratelimit import RateLimiter, is_overloaded
+from app.settings import (
+    RATE_LIMIT_API_KEYS,
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_TRUST_FORWARDED,
+)
+
+API_KEYS = frozenset(filter(None, map(str.strip, RATE_LIMIT_API_KEYS.split(","))))
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def json_body(model: type[BaseModel]) -> Callable:
+    """
+    Builds a dependency parsing the request body into `model` in one pass
+    with pydantic's JSON parser (`model_validate_json`), instead of
+    `json.loads` followed by validation of the resulting dict as FastAPI
+    does for body parameters. Invalid bodies still get FastAPI's 422.
+    """
+
+    async def _parse(request: Request) -> BaseModel:
+        try:
+            return model.model_validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError(
+                [
+                    {**error, "loc": ("body", *error["loc"])}
+                    for error in e.errors(include_url=False)
+                ]
+            )
+
+    return _parse
+
+
+def client_key(request: Request) -> str:
+    """
+    Identifies the caller for rate limiting: the API key when a known one
+    (RATE_LIMIT_API_KEYS) is sent, otherwise the client IP (first
+    X-Forwarded-For hop if trusted). Unknown keys are ignored, so callers
+    cannot get a fresh bucket by sending a new key with each request.
+    """
+    api_key = request.headers.get("x-api-key")
+    if api_key in API_KEYS:
+        return f"key:{api_key}"
+    if RATE_LIMIT_TRUST_FORWARDED and (
+        forwarded := request.headers.get("x-forwarded-for")
+    ):
+        return f"ip:{forwarded.split(',')[0].strip()}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def check_rate_limit(limiter: RateLimiter, request: Request, cost: int = 1) -> None:
+    """
+    Rejects the caller with 429 when `cost` more requests would take it over
+    `limiter`.
+    """
+    if RATE_LIMIT_ENABLED and not limiter.allow(client_key(request), cost):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(limiter.retry_after())},
+        )
+
+
+def rate_limited(limiter: RateLimiter) -> Callable:
+    """
+    Builds a dependency rejecting callers over `limiter` with 429.
+    """
+
+    async def _rate_limit(request: Request) -> None:
+        check_rate_limit(limiter, request)
+
+    return _rate_limit
+
+
+async def admission_control() -> None:
+    """
+    Sheds the request with a fast 503 while the worker is overloaded.
+    """
+    if is_overloaded():
+        raise HTTPException(
+            status_code=503, detail="Service overloaded", headers={"Retry-After": "1"}
+        )
@@ -0,0 +1,293 @@
+"""
+Change feed of `url_shortened`, keeping the caches in line with the table.
+
+Every insert, update and delete reaches each worker, including the ones
+made outside the request path (replication from peer regions, migrations,
+bulk imports). Workers drop the changed tokens from their local cache, and
+the worker holding a short Redis lease applies the batch to Redis with one
+pipelined call per operation, so the Redis writes are not repeated by every
+worker.
+
+Sources:
+    postgres  LISTEN to the notifications of the `url_shortened_change_feed`
+              trigger, on one direct connection per worker (counted in the
+              pool budget, see `pool_size_for`). Notifications sent while a
+              worker is disconnected are lost; caches catch up through
+              their TTL.
+    stream    Read the replication stream written by `publish_change`
+              (CHANGE_STREAM_ENABLED), for tests and databases without the
+              trigger. Only sees changes made through the app.
+
+Notifying serializes committing transactions on a global lock, so the
+trigger only exists while the feed is in use. Install it before enabling
+CHANGE_FEED_ENABLED, and drop it after disabling it:
+
+    python -m app.generator.changefeed enable
+    python -m app.generator.changefeed disable
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import time
+
+import asyncpg
+import orjson
+import redis
+from prometheus_client import Counter, Gauge
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+from app.core.cache import local_cache, redis_client, url_cache
+from app.core.circuit import redis_breaker
+from app.core.storage import stream_id
+from app.generator.links import unpack_link
+from app.generator.replication import STREAM_KEY
+from app.settings import (
+    CACHE_DEFAULT_TIMEOUT,
+    CHANGE_FEED_BATCH_SIZE,
+    CHANGE_FEED_DATABASE_URL,
+    CHANGE_FEED_ENABLED,
+    CHANGE_FEED_INTERVAL,
+    CHANGE_FEED_SOURCE,
+    SYNC_DATABASE_URL,
+)
+
+CHANNEL = "url_shortened_changes"
+LEASE_KEY = "changefeed:lease"
+TRIGGER = "url_shortened_change_feed"
+
+logger = logging.getLogger(__name__)
+
+change_feed_changes = Counter(
+    "change_feed_changes", "Changes applied from the change feed", ["op"]
+)
+change_feed_lag_seconds = Gauge(
+    "change_feed_lag_seconds",
+    "Time between the last applied change and its application",
+)
+
+# (token, url, changed_at): a None url invalidates the token
+Change = tuple[str, str | None, float]
+
+
+class PostgresChangeSource:
+    """
+    Notifications of the `url_shortened` trigger, received on a dedicated
+    asyncpg connection and buffered until read.
+
+    Args:
+        database_url (str): PostgreSQL URL, SQLAlchemy style accepted.
+        channel (str): Notification channel of the trigger.
+    """
+
+    def __init__(self, database_url: str = CHANGE_FEED_DATABASE_URL, channel=CHANNEL):
+        url = make_url(database_url).set(drivername="postgresql")
+        self.dsn = url.render_as_string(hide_password=False)
+        self.channel = channel
+        self.conn: asyncpg.Connection | None = None
+        self._pending: list[str] = []
+
+    def _notified(self, conn, pid, channel, payload: str) -> None:
+        self._pending.append(payload)
+
+    async def _connect(self) -> None:
+        if self.conn is not None:
+            logger.warning("Change feed connection lost, changes may be missed")
+        self.conn = await asyncpg.connect(self.dsn)
+        await self.conn.add_listener(self.channel, self._notified)
+
+    async def read(self, count: int) -> list[Change]:
+        if self.conn is None or self.conn.is_closed():
+            await self._connect()
+        payloads, self._pending = self._pending[:count], self._pending[count:]
+        changes = []
+        for payload in payloads:
+            fields = orjson.loads(payload)
+            changes.append((fields["id"], fields.get("url"), fields["at"]))
+        return changes
+
+    async def close(self) -> None:
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+
+
+class StreamChangeSource:
+    """
+    Entries of the replication stream, read from the latest one at the time
+    of the first read.
+
+    Args:
+        client (redis.Redis): Redis holding the stream.
+    """
+
+    def __init__(self, client: redis.Redis = redis_client):
+        self.client = client
+        self.offset: str | None = None
+
+    def _read(self, count: int) -> list[tuple[str, dict]]:
+        if self.offset is None:
+            latest = self.client.xrevrange(STREAM_KEY, count=1)
+            self.offset = latest[0][0] if latest else "0-0"
+        response = self.client.xread({STREAM_KEY: self.offset}, count=count)
+        return response[0][1] if response else []
+
+    async def read(self, count: int) -> list[Change]:
+        entries = await asyncio.to_thread(self._read, count)
+        if entries:
+            self.offset = entries[-1][0]
+        return [
+            (fields["token"], fields.get("url"), stream_id(entry_id)[0] / 1000)
+            for entry_id, fields in entries
+        ]
+
+    async def close(self) -> None:
+        pass
+
+
+def build_change_source(kind: str = CHANGE_FEED_SOURCE):
+    """
+    Change source named by CHANGE_FEED_SOURCE ("postgres" or "stream").
+    """
+    if kind == "postgres":
+        return PostgresChangeSource()
+    if kind == "stream":
+        return StreamChangeSource()
+    raise ValueError(f"Unknown change feed source: {kind}")
+
+
+class ChangeFeed:
+    """
+    Applies the changes of `source` to the caches in batches of up to
+    `batch_size`, checking for more every `interval` seconds.
+
+    Within a batch only a token's last change counts. Changed tokens leave
+    the local cache; Redis gets the new values (links with an expiry, and
+    changes without a URL, are deleted instead and cached again on the next
+    read) when this worker holds the lease.
+    """
+
+    def __init__(
+        self,
+        source=None,
+        client: redis.Redis = redis_client,
+        batch_size: int = CHANGE_FEED_BATCH_SIZE,
+        interval: float = CHANGE_FEED_INTERVAL,
+    ):
+        self.source = source
+        self.client = client
+        self.batch_size = batch_size
+        self.interval = interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.lease = max(10 * interval, 5.0)
+        self._task: asyncio.Task | None = None
+
+    def _hold_lease(self) -> bool:
+        ttl = int(self.lease)
+        if self.client.set(LEASE_KEY, self.worker_id, nx=True, ex=ttl):
+            return True
+        if self.client.get(LEASE_KEY) == self.worker_id:
+            self.client.expire(LEASE_KEY, ttl)
+            return True
+        return False
+
+    def apply(self, changes: list[Change]) -> None:
+        latest = {token: url for token, url, _ in changes}
+        for token in latest:
+            local_cache.delete(token)
+
+        cached, dropped = [], []
+        for token, url in latest.items():
+            if url is None or unpack_link(url)[2] is not None:
+                dropped.append(token)
+            else:
+                cached.append((token, url))
+        if redis_breaker.guard(self._hold_lease, fallback=False):
+            if cached:
+                redis_breaker.guard(
+                    url_cache.set_many, cached, ex=CACHE_DEFAULT_TIMEOUT
+                )
+            if dropped:
+                redis_breaker.guard(url_cache.delete_many, dropped)
+
+        change_feed_changes.labels("set").inc(len(cached))
+        change_feed_changes.labels("delete").inc(len(dropped))
+        change_feed_lag_seconds.set(max(time.time() - changes[-1][2], 0.0))
+
+    async def poll(self) -> int:
+        """
+        Applies the next batch of changes.
+
+        Returns:
+            int: The number of changes read from the source.
+        """
+        changes = await self.source.read(self.batch_size)
+        if changes:
+            self.apply(changes)
+        else:
+            change_feed_lag_seconds.set(0)
+        return len(changes)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                while await self.poll() == self.batch_size:
+                    pass
+            except Exception as e:
+                logger.warning("Change feed failed: %r", e)
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        if not CHANGE_FEED_ENABLED:
+            return
+        if self.source is None:
+            self.source = build_change_source()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self.source is not None:
+            await self.source.close()
+
+
+change_feed = ChangeFeed()
+
+
+def install_trigger(database_url: str, enabled: bool) -> None:
+    """
+    Creates (`enabled`) or drops the trigger notifying the changes of
+    `url_shortened`, calling the `url_shortened_notify` function created
+    by the migrations.
+    """
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {TRIGGER} ON url_shortened"))
+        if enabled:
+            conn.execute(
+                text(
+                    f"CREATE TRIGGER {TRIGGER} "
+                    "AFTER INSERT OR UPDATE OR DELETE ON url_shortened "
+                    "FOR EACH ROW EXECUTE FUNCTION url_shortened_notify()"
+                )
+            )
+    engine.dispose()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("action", choices=["enable", "disable"])
+    parser.add_argument("--database-url", default=SYNC_DATABASE_URL)
+    args = parser.parse_args()
+
+    install_trigger(args.database_url, args.action == "enable")
+    logger.info("Change feed trigger %sd", args.action)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Embedded storage for redirect-only edge nodes.
+
+Build the initial copy from the primary PostgreSQL before starting a node
+with STORAGE_BACKEND=sqlite:
+
+    python -m app.generator.edge --output data/urls.sqlite3
+
+Running nodes then apply the primary's change stream every
+EMBEDDED_SYNC_INTERVAL seconds.
+"""
+
+import argparse
+import asyncio
+import fcntl
+import logging
+import os
+
+import redis
+from sqlalchemy import create_engine, text
+
+from app.core.cache import local_cache, url_cache
+from app.core.circuit import redis_breaker
+from app.core.storage import SqliteUrlStore, UrlStore, stream_id, url_store
+from app.generator.replication import STREAM_KEY
+from app.settings import (
+    EMBEDDED_SYNC_INTERVAL,
+    EMBEDDED_SYNC_REDIS_URL,
+    REDIS_CONNECT_TIMEOUT,
+    REPLICATION_BATCH_SIZE,
+    SYNC_DATABASE_URL,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class EdgeSync:
+    """
+    Keeps an embedded store up to date from the primary's change stream.
+
+    Every worker on the node runs the loop, but only the one holding the
+    store's file lock (`<store path>.lock`) writes the changes to it, off
+    the event loop; the others only follow the stream to drop changed
+    tokens from their local cache. The lock is released when its holder
+    exits, and another worker takes over from the store's offset. If the
+    stream was trimmed past the store's offset, changes were lost and the
+    snapshot must be rebuilt.
+    """
+
+    def __init__(
+        self,
+        store: UrlStore | None = url_store,
+        source: redis.Redis | None = None,
+        batch_size: int = REPLICATION_BATCH_SIZE,
+        interval: float = EMBEDDED_SYNC_INTERVAL,
+    ):
+        self.store = store
+        self.source = source
+        self.batch_size = batch_size
+        self.interval = interval
+        self.lagging = False
+        self.offset: str | None = None
+        self._lock = None
+        self._task: asyncio.Task | None = None
+
+    def _source(self) -> redis.Redis:
+        if self.source is None:
+            self.source = redis.Redis.from_url(
+                EMBEDDED_SYNC_REDIS_URL,
+                decode_responses=True,
+                socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+            )
+        return self.source
+
+    def _hold_lock(self) -> bool:
+        if self._lock is not None:
+            return True
+        lock = open(f"{self.store.path}.lock", "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        self._lock = lock
+        logger.info("Worker %d syncs %s", os.getpid(), self.store.path)
+        return True
+
+    def _check_trimmed(self, offset: str) -> None:
+        first = self._source().xrange(STREAM_KEY, count=1)
+        self.lagging = bool(
+            first and offset != "0-0" and stream_id(first[0][0]) > stream_id(offset)
+        )
+        if self.lagging:
+            logger.error(
+                "Change stream was trimmed past %s, rebuild %s",
+                offset,
+                getattr(self.store, "path", "the embedded store"),
+            )
+
+    async def poll(self) -> int:
+        """
+        Reads the next batch of changes, and applies it to the store when
+        this worker holds the lock.
+
+        The stream read and the store write (which may wait on SQLite's
+        write lock) run in threads, off the event loop.
+
+        Returns:
+            int: The number of changes read from the stream.
+        """
+        syncing = self._hold_lock()
+        offset = self.store.offset if syncing or self.offset is None else self.offset
+        response = await asyncio.to_thread(
+            self._source().xread, {STREAM_KEY: offset}, count=self.batch_size
+        )
+        entries = response[0][1] if response else []
+        if not entries:
+            return 0
+
+        changes = [(entry_id, f["token"], f.get("url")) for entry_id, f in entries]
+        if syncing:
+            if offset != "0-0" and not self.lagging:
+                await asyncio.to_thread(self._check_trimmed, offset)
+            await asyncio.to_thread(self.store.apply, changes)
+            for _, token, url in changes:
+                if url is None:
+                    redis_breaker.guard(url_cache.delete, token)
+        for _, token, _ in changes:
+            local_cache.delete(token)
+        self.offset = entries[-1][0]
+        return len(entries)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                while await self.poll() == self.batch_size:
+                    pass
+            except Exception as e:
+                logger.warning("Edge sync failed: %r", e)
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        if isinstance(self.store, SqliteUrlStore):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+
+edge_sync = EdgeSync()
+
+
+def build_snapshot(
+    output: str, database_url: str, source: redis.Redis, batch_size: int = 10_000
+) -> int:
+    """
+    Exports `url_shortened` into a new SQLite store at `output`.
+
+    The position of the change stream in `source` is read before the
+    export, so changes made
+    while it runs are applied again by the first sync (applying is
+    idempotent). The file is written next to `output` and moved in place.
+
+    Returns:
+        int: The number of tokens exported.
+    """
+    latest = source.xrevrange(STREAM_KEY, count=1)
+    offset = latest[0][0] if latest else "0-0"
+
+    tmp_path = f"{output}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    store = SqliteUrlStore(tmp_path)
+
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(
+            text("SELECT id, url FROM url_shortened")
+        )
+        while rows := result.fetchmany(batch_size):
+            store.load([tuple(row) for row in rows], offset)
+    engine.dispose()
+
+    count = len(store)
+    store.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    store.close()
+    os.replace(tmp_path, output)
+    return count
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--database-url", default=SYNC_DATABASE_URL)
+    args = parser.parse_args()
+
+    source = EdgeSync()._source()
+    count = build_snapshot(args.output, args.database_url, source)
+    logger.info("Exported %d tokens to %s", count, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,3 +9,45 @@ class ShortenUrlDeletionFailed(Exception):
     def __init__(self, message="Failed to delete the shortened URL."):
         self.message = message
         super().__init__(self.message)
+
+
+class ServiceOverloaded(Exception):
+    """
+    Exception raised when a request needing the database is shed because
+    the service is overloaded.
+
+    Attributes:
+        message (str): Explanation of the error.
+    """
+
+    def __init__(self, message="Service overloaded."):
+        self.message = message
+        super().__init__(self.message)
+
+
+class BackendUnavailable(Exception):
+    """
+    Exception raised when a storage backend is down, too slow or its
+    circuit breaker is open.
+
+    Attributes:
+        message (str): Explanation of the error.
+    """
+
+    def __init__(self, message="Backend unavailable."):
+        self.message = message
+        super().__init__(self.message)
+
+
+class AliasUnavailable(Exception):
+    """
+    Exception raised when a requested custom alias is taken or cannot be
+    created in this region.
+
+    Attributes:
+        message (str): Explanation of the error.
+    """
+
+    def __init__(self, message="Alias unavailable."):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,137 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from app.core.compression import UrlCompressor
+from app.settings import (
+    REDIRECT_DEFAULT_CODE,
+    REDIRECT_PERMANENT_MAX_AGE,
+    REDIRECT_TEMPORARY_MAX_AGE,
+)
+
+LINK_PREFIX = "~l"
+PERMANENT_CODES = (301, 308)
+
+
+class Link:
+    """
+    A resolved short link: destination URL and its redirect policy.
+
+    Args:
+        url (str): The original (decompressed) URL.
+        redirect_code (int): 301, 302, 307 or 308.
+        expires_at (int | None): Unix time after which the link is gone.
+        etag (str): Validator of the stored value, changes with the URL or
+            the policy.
+    """
+
+    __slots__ = ("url", "redirect_code", "expires_at", "etag")
+
+    def __init__(
+        self,
+        url: str,
+        redirect_code: int = REDIRECT_DEFAULT_CODE,
+        expires_at: int | None = None,
+        etag: str = "",
+    ):
+        self.url = url
+        self.redirect_code = redirect_code
+        self.expires_at = expires_at
+        self.etag = etag
+
+    def ttl(self) -> float | None:
+        """
+        Seconds left before the link expires, None if it never does.
+        """
+        return None if self.expires_at is None else self.expires_at - time.time()
+
+    @property
+    def expired(self) -> bool:
+        ttl = self.ttl()
+        return ttl is not None and ttl <= 0
+
+
+def to_timestamp(value: datetime) -> int:
+    """
+    Converts an expiry datetime to Unix time; naive datetimes are UTC.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def pack_link(
+    stored_url: str, redirect_code: int | None = None, expires_at: int | None = None
+) -> str:
+    """
+    Prefixes the stored URL with its redirect policy, as in
+    `~l308;1767225600;<stored url>`.
+
+    Links without a policy of their own are stored unchanged and follow
+    REDIRECT_DEFAULT_CODE, so existing rows need no migration.
+    """
+    if redirect_code is None and expires_at is None:
+        return stored_url
+    code = "" if redirect_code is None else str(redirect_code)
+    expiry = "" if expires_at is None else str(expires_at)
+    return f"{LINK_PREFIX}{code};{expiry};{stored_url}"
+
+
+def unpack_link(value: str) -> tuple[str, int, int | None]:
+    """
+    Splits a value written by `pack_link`.
+
+    Returns:
+        tuple: The stored URL, redirect code and expiry (or None).
+    """
+    if not value.startswith(LINK_PREFIX):
+        return value, REDIRECT_DEFAULT_CODE, None
+    code, expiry, stored_url = value[len(LINK_PREFIX) :].split(";", 2)
+    return (
+        stored_url,
+        int(code) if code else REDIRECT_DEFAULT_CODE,
+        int(expiry) if expiry else None,
+    )
+
+
+def decode_link(value: str, compressor: UrlCompressor) -> Link:
+    """
+    Builds the `Link` for a value read from the database or the caches.
+    """
+    stored_url, redirect_code, expires_at = unpack_link(value)
+    etag = hashlib.blake2b(value.encode(), digest_size=8).hexdigest()
+    return Link(compressor.decompress(stored_url), redirect_code, expires_at, etag)
+
+
+def cache_headers(link: Link) -> dict[str, str]:
+    """
+    Returns the `Cache-Control` and `ETag` headers of a redirect to `link`.
+
+    Permanent redirects may be kept by browsers and CDNs for
+    REDIRECT_PERMANENT_MAX_AGE seconds and temporary ones for
+    REDIRECT_TEMPORARY_MAX_AGE (0 means revalidate every time, answered
+    with a 304 while the ETag matches), never past the link's expiry.
+    """
+    if link.redirect_code in PERMANENT_CODES:
+        max_age = REDIRECT_PERMANENT_MAX_AGE
+    else:
+        max_age = REDIRECT_TEMPORARY_MAX_AGE
+
+    ttl = link.ttl()
+    if ttl is not None:
+        max_age = min(max_age, max(int(ttl), 0))
+
+    return {
+        "Cache-Control": f"public, max-age={max_age}" if max_age > 0 else "no-cache",
+        "ETag": f'"{link.etag}"',
+    }
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    True when an `If-None-Match` header matches `etag` (weak comparison).
+    """
+    if not if_none_match:
+        return False
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return any(tag in ("*", etag) for tag in candidates)
@@ -0,0 +1,20 @@
+"""
+Prebuilt Core statements for the hot token queries.
+
+Building a `select()` per request and running it through the ORM costs
+more CPU than the query itself on a primary key. These statements are
+built once, on the table rather than the mapped class, and executed with
+parameters: SQLAlchemy reuses their compiled form, and asyncpg its prepared
+statement on each pooled connection, since the SQL text never changes.
+"""
+
+from sqlalchemy import bindparam, insert, select
+
+from app.generator.models import UrlShorted
+
+url_table = UrlShorted.__table__
+
+# Parameters: token
+SELECT_URL = select(url_table.c.url).where(url_table.c.id == bindparam("token"))
+# Parameters: id, url
+INSERT_URL = insert(url_table)
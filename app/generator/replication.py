@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import os
+import socket
+import weakref
+
+import redis
+from sqlalchemy import delete
+
+from app.core.cache import (
+    LocalCache,
+    build_url_cache,
+    local_cache,
+    redis_client,
+    url_cache,
+)
+from app.core.database import AsyncSessionLocal
+from app.core.regions import RegionRouter, region_router
+from app.generator.models import UrlShorted
+from app.settings import (
+    CACHE_DEFAULT_TIMEOUT,
+    CACHE_HASH_PREFIX_LENGTH,
+    CACHE_LAYOUT,
+    CHANGE_STREAM_ENABLED,
+    REGION_LOOKUP_TIMEOUT,
+    REGION_MISS_TIMEOUT,
+    REPLICATION_BATCH_SIZE,
+    REPLICATION_INTERVAL,
+    REPLICATION_STREAM_MAXLEN,
+)
+
+STREAM_KEY = "replication:mappings"
+OFFSET_KEY = "replication:offset:{region}"
+LEASE_KEY = "replication:lease:{region}"
+
+logger = logging.getLogger(__name__)
+
+# Token cache wrapper of each peer Redis client, built on first use
+_peer_caches: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+# Remote tokens the owner region did not answer for, not asked again for
+# REGION_MISS_TIMEOUT seconds
+_remote_misses = LocalCache(10_000, REGION_MISS_TIMEOUT)
+
+
+def publish_change(token: str, url: str | None = None) -> None:
+    """
+    Appends a created (`url` set) or deleted mapping to this region's
+    replication stream, read by every peer region and by edge nodes.
+
+    No-op unless regions or CHANGE_STREAM_ENABLED are configured.
+    """
+    publish_changes([(token, url)])
+
+
+def publish_changes(changes: list[tuple[str, str | None]]) -> None:
+    """
+    Appends several `(token, url)` changes in one pipeline. See
+    `publish_change`.
+    """
+    if not (region_router.enabled or CHANGE_STREAM_ENABLED) or not changes:
+        return
+
+    pipe = redis_client.pipeline(transaction=False)
+    for token, url in changes:
+        fields = {"token": token, "url": url} if url is not None else {"token": token}
+        pipe.xadd(
+            STREAM_KEY, fields, maxlen=REPLICATION_STREAM_MAXLEN, approximate=True
+        )
+    pipe.execute()
+
+
+async def lookup_owner_region(token: str) -> str | None:
+    """
+    Reads `token` from the cache of the region that created it.
+
+    Covers mappings created remotely that have not been replicated here yet.
+    Returns None when the token is local, the owning region has no
+    configured Redis or it cannot be reached in time. Misses and failures
+    are remembered for a few seconds, so repeated unknown tokens do not
+    each cost a cross-region round trip.
+    """
+    if region_router.is_local(token) or _remote_misses.get(token) is not None:
+        return None
+
+    peer = region_router.peer(region_router.owner(token))
+    if peer is None:
+        return None
+
+    cache = _peer_caches.get(peer)
+    if cache is None:
+        cache = build_url_cache(peer, CACHE_LAYOUT, CACHE_HASH_PREFIX_LENGTH)
+        _peer_caches[peer] = cache
+    try:
+        url = await asyncio.wait_for(
+            asyncio.to_thread(cache.get, token), timeout=REGION_LOOKUP_TIMEOUT
+        )
+    except (redis.RedisError, asyncio.TimeoutError) as e:
+        logger.debug("Owner region lookup of %s failed: %r", token, e)
+        url = None
+    if url is None:
+        _remote_misses.set(token, "")
+    return url
+
+
+class Replicator:
+    """
+    Copies the mappings created and deleted in peer regions into the local
+    database and cache.
+
+    Each peer's stream is read in batches from the last applied entry,
+    whose id is kept in the local Redis so restarts resume where they left
+    off. Applying is idempotent; a short Redis lease makes a single worker
+    per region do the work at a time.
+    """
+
+    def __init__(
+        self,
+        router: RegionRouter = region_router,
+        client: redis.Redis = redis_client,
+        batch_size: int = REPLICATION_BATCH_SIZE,
+        interval: float = REPLICATION_INTERVAL,
+    ):
+        self.router = router
+        self.client = client
+        self.batch_size = batch_size
+        self.interval = interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.lease = max(10 * interval, 5.0)
+        self._task: asyncio.Task | None = None
+
+    def _hold_lease(self, region: str) -> bool:
+        key = LEASE_KEY.format(region=region)
+        ttl = int(self.lease)
+        if self.client.set(key, self.worker_id, nx=True, ex=ttl):
+            return True
+        if self.client.get(key) == self.worker_id:
+            self.client.expire(key, ttl)
+            return True
+        return False
+
+    async def apply(self, entries: list[tuple[str, dict]]) -> None:
+        created: dict[str, str] = {}
+        deleted: set[str] = set()
+        async with AsyncSessionLocal() as db:
+            for _, fields in entries:
+                token = fields["token"]
+                if "url" in fields:
+                    await db.merge(UrlShorted(id=token, url=fields["url"]))
+                    created[token] = fields["url"]
+                    deleted.discard(token)
+                else:
+                    await db.execute(delete(UrlShorted).where(UrlShorted.id == token))
+                    deleted.add(token)
+                    created.pop(token, None)
+            await db.commit()
+
+        url_cache.set_many(created.items(), ex=CACHE_DEFAULT_TIMEOUT)
+        for token in deleted:
+            url_cache.delete(token)
+        for token in created.keys() | deleted:
+            local_cache.delete(token)
+
+    async def poll(self, region: str) -> int:
+        """
+        Applies the next batch of `region`'s stream.
+
+        Returns:
+            int: The number of entries applied.
+        """
+        peer = self.router.peer(region)
+        if peer is None or not self._hold_lease(region):
+            return 0
+
+        offset_key = OFFSET_KEY.format(region=region)
+        offset = self.client.get(offset_key) or "0-0"
+        response = await asyncio.to_thread(
+            peer.xread, {STREAM_KEY: offset}, count=self.batch_size
+        )
+        entries = response[0][1] if response else []
+        if not entries:
+            return 0
+
+        await self.apply(entries)
+        self.client.set(offset_key, entries[-1][0])
+        return len(entries)
+
+    async def _run(self) -> None:
+        while True:
+            for region in self.router.peer_urls:
+                try:
+                    while await self.poll(region) == self.batch_size:
+                        pass
+                except Exception as e:
+                    logger.warning("Replication from %s failed: %r", region, e)
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        if self.router.enabled and self.router.peer_urls:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+replicator = Replicator()
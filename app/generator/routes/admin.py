@@ -0,0 +1,70 @@
+import asyncio
+import secrets
+import threading
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.core.profiling import ProfileSession, StackSampler
+from app.settings import (
+    PROFILING_ENABLED,
+    PROFILING_MAX_SECONDS,
+    PROFILING_SAMPLE_INTERVAL,
+    PROFILING_TOKEN,
+)
+
+router = APIRouter(prefix="/admin", tags=["admin"], include_in_schema=False)
+
+_profile_lock = asyncio.Lock()
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = 10.0,
+    mode: str = "sample",
+    x_profiling_token: str | None = Header(default=None),
+):
+    """
+    Profiles this worker's event loop for `seconds` and returns the result.
+
+    Only available with PROFILING_ENABLED and PROFILING_TOKEN set, to
+    requests sending the token in the X-Profiling-Token header.
+
+    Args:
+        seconds (float): Profiling duration, capped by PROFILING_MAX_SECONDS.
+        mode (str): "sample" returns folded stacks ready for flamegraph.pl or
+            speedscope; "cprofile" returns the cProfile report.
+
+    Returns:
+        PlainTextResponse: The folded stacks or the cProfile report.
+    """
+    if not (PROFILING_ENABLED and PROFILING_TOKEN):
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(
+        (x_profiling_token or "").encode(), PROFILING_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if mode not in {"sample", "cprofile"}:
+        raise HTTPException(status_code=400, detail="Unknown profiling mode")
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="Profiling already running")
+
+    seconds = max(min(seconds, PROFILING_MAX_SECONDS), 0.0)
+    async with _profile_lock:
+        # Stopped even when the request is cancelled (client gone)
+        if mode == "cprofile":
+            session = ProfileSession()
+            session.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                session.stop()
+            return session.report()
+
+        sampler = StackSampler(threading.get_ident(), PROFILING_SAMPLE_INTERVAL)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            await asyncio.to_thread(sampler.stop)
+        return sampler.folded()
@@ -0,0 +1,58 @@
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
+
+from app.core.health import health_monitor
+from app.generator.warmup import warmup_state
+from app.settings import (
+    HEALTH_LIVENESS_MAX_LOOP_LAG,
+    HEALTH_READINESS_MAX_LOOP_LAG,
+    HEALTH_READINESS_MAX_POOL_SATURATION,
+)
+
+router = APIRouter(prefix="", tags=["health"])
+
+
+def _health_response(ok: bool, data: dict) -> ORJSONResponse:
+    return ORJSONResponse(
+        status_code=200 if ok else 503,
+        content={"success": ok, "data": data, "message": None},
+    )
+
+
+@router.get("/healthz", include_in_schema=False)
+async def liveness():
+    """
+    Liveness probe: the worker is running and its event loop is responsive.
+
+    Answered from the last background probe results; no backend is called.
+    """
+    ok = (
+        not health_monitor.stale
+        and health_monitor.loop_lag <= HEALTH_LIVENESS_MAX_LOOP_LAG
+    )
+    return _health_response(ok, health_monitor.snapshot())
+
+
+@router.get("/readyz", include_in_schema=False)
+async def readiness():
+    """
+    Readiness probe: the worker can take traffic.
+
+    Requires PostgreSQL and Redis to be reachable, the cache warm-up to be
+    finished, the event loop lag and DB pool saturation under their limits.
+    """
+    data = {
+        **health_monitor.snapshot(),
+        "cache_warm": warmup_state.finished,
+        "cache_warmed_tokens": warmup_state.warmed,
+    }
+    ok = (
+        not health_monitor.stale
+        and health_monitor.db_ok
+        and health_monitor.redis_ok
+        and warmup_state.finished
+        and health_monitor.loop_lag <= HEALTH_READINESS_MAX_LOOP_LAG
+        and health_monitor.pool.get("saturation", 0)
+        < HEALTH_READINESS_MAX_POOL_SATURATION
+    )
+    return _health_response(ok, data)
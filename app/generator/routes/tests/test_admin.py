@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from fastapi import status
+
+import app.generator.routes.admin as admin
+
+
+@pytest.fixture
+def profiling_enabled(monkeypatch):
+    monkeypatch.setattr(admin, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(admin, "PROFILING_TOKEN", "secret")
+
+
+def test_profile_when_disabled_returns_404(make_client):
+    client = make_client()
+
+    response = client.get("/admin/profile", params={"seconds": 0})
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_profile_without_a_configured_token_returns_404(make_client, monkeypatch):
+    monkeypatch.setattr(admin, "PROFILING_ENABLED", True)
+    client = make_client()
+
+    response = client.get("/admin/profile", params={"seconds": 0})
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_profile_without_token_returns_403(make_client, profiling_enabled):
+    client = make_client()
+
+    response = client.get("/admin/profile", params={"seconds": 0})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    response = client.get(
+        "/admin/profile", params={"seconds": 0}, headers={"X-Profiling-Token": "x"}
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.parametrize("mode, expected", [("sample", ""), ("cprofile", "calls")])
+def test_profile_returns_plain_text_report(
+    make_client, profiling_enabled, mode, expected
+):
+    client = make_client()
+
+    response = client.get(
+        "/admin/profile",
+        params={"seconds": 0.05, "mode": mode},
+        headers={"X-Profiling-Token": "secret"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert expected in response.text
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["sample", "cprofile"])
+async def test_profile_stops_profiling_when_cancelled(
+    monkeypatch, profiling_enabled, mode
+):
+    stopped = []
+
+    class Sampler(admin.StackSampler):
+        def stop(self):
+            super().stop()
+            stopped.append(self)
+
+    class Session(admin.ProfileSession):
+        def stop(self):
+            super().stop()
+            stopped.append(self)
+
+    monkeypatch.setattr(admin, "StackSampler", Sampler)
+    monkeypatch.setattr(admin, "ProfileSession", Session)
+    task = asyncio.create_task(
+        admin.profile(seconds=10, mode=mode, x_profiling_token="secret")
+    )
+    await asyncio.sleep(0.05)
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert len(stopped) == 1
+    assert not admin._profile_lock.locked()
@@ -0,0 +1,79 @@
+import time
+
+import pytest
+from fastapi import status
+
+from app.core.health import health_monitor
+from app.generator.warmup import warmup_state
+
+
+@pytest.fixture
+def healthy(monkeypatch):
+    monkeypatch.setattr(health_monitor, "checked_at", time.monotonic())
+    monkeypatch.setattr(health_monitor, "loop_lag", 0.001)
+    monkeypatch.setattr(health_monitor, "db_ok", True)
+    monkeypatch.setattr(health_monitor, "redis_ok", True)
+    monkeypatch.setattr(health_monitor, "pool", {"saturation": 0.1})
+    monkeypatch.setattr(warmup_state, "finished", True)
+
+
+def test_readiness_when_all_probes_pass_returns_200(make_client, healthy):
+    client = make_client()
+
+    response = client.get("/readyz")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["success"] is True
+    assert response.json()["data"]["cache_warm"] is True
+
+
+@pytest.mark.parametrize(
+    "attribute, value",
+    [
+        ("redis_ok", False),
+        ("db_ok", False),
+        ("loop_lag", 2.0),
+        ("pool", {"saturation": 1.0}),
+        ("checked_at", 0.0),
+    ],
+)
+def test_readiness_when_a_probe_fails_returns_503(
+    make_client, healthy, monkeypatch, attribute, value
+):
+    client = make_client()
+    monkeypatch.setattr(health_monitor, attribute, value)
+
+    response = client.get("/readyz")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["success"] is False
+
+
+def test_readiness_before_cache_warm_up_returns_503(make_client, healthy, monkeypatch):
+    client = make_client()
+    monkeypatch.setattr(warmup_state, "finished", False)
+
+    response = client.get("/readyz")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+def test_liveness_ignores_backend_failures(make_client, healthy, monkeypatch):
+    client = make_client()
+    monkeypatch.setattr(health_monitor, "redis_ok", False)
+    monkeypatch.setattr(health_monitor, "db_ok", False)
+
+    response = client.get("/healthz")
+
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_liveness_when_probe_loop_is_stale_returns_503(
+    make_client, healthy, monkeypatch
+):
+    client = make_client()
+    monkeypatch.setattr(health_monitor, "checked_at", 0.0)
+
+    response = client.get("/healthz")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
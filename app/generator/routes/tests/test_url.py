@@ -1,7 +1,11 @@
+import time
+
+import fakeredis
 import pytest
 from fastapi import status
 from httpx import InvalidURL
 import app.generator.service as service
+from app.generator.links import Link
 
 
 def test_get_url_shortened_url_redirects_success(make_client, monkeypatch, db_session):
@@ -12,9 +16,9 @@ def test_get_url_shortened_url_redirects_success(make_client, monkeypatch, db_se
     async def fake_retrieve(token_arg, db_arg):
         assert token_arg == token
         assert db_arg is db_session
-        return expected_destination
+        return Link(expected_destination)
 
-    monkeypatch.setattr("app.generator.routes.url.retrieve_url", fake_retrieve)
+    monkeypatch.setattr("app.generator.routes.url.resolve_link", fake_retrieve)
 
     response = client.get(f"/{token}")
 
@@ -45,7 +49,7 @@ def test_get_url_when_token_is_registered_will_return_404_not_found(
     async def fake_retrieve(token_arg, db_arg):
         return None
 
-    monkeypatch.setattr("app.generator.routes.url.retrieve_url", fake_retrieve)
+    monkeypatch.setattr("app.generator.routes.url.resolve_link", fake_retrieve)
 
     response = client.get(f"/{token}")
 
@@ -60,7 +64,7 @@ def test_generate_shortened_url_success(make_client, monkeypatch, db_session):
 
     monkeypatch.setattr("app.generator.routes.url.validate_url_scheme", lambda url: url)
 
-    async def fake_generate(url_arg, db_arg):
+    async def fake_generate(url_arg, db_arg, **policy):
         assert url_arg == original
         assert db_arg is db_session
         return expected_short
@@ -183,3 +187,296 @@ async def test_delete_url_token_raises_shorten_url_deletion_failed(
         "data": None,
         "message": "Could not delete the Token",
     }
+
+
+def test_get_url_when_service_is_overloaded_returns_503(make_client, monkeypatch):
+    client = make_client()
+
+    async def overloaded_retrieve(token_arg, db_arg):
+        raise service.ServiceOverloaded()
+
+    monkeypatch.setattr("app.generator.routes.url.resolve_link", overloaded_retrieve)
+
+    response = client.get("/ABC123")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["retry-after"] == "1"
+
+
+def test_generate_shortened_url_when_overloaded_returns_503(make_client, monkeypatch):
+    client = make_client()
+    monkeypatch.setattr("app.dependencies.is_overloaded", lambda: True)
+
+    response = client.post("/", json={"url": "https://google.com/"})
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json() == {"detail": "Service overloaded"}
+
+
+def test_delete_shortened_url_over_rate_limit_returns_429(make_client, monkeypatch):
+    from app.core.ratelimit import delete_limiter
+
+    client = make_client()
+    monkeypatch.setattr("app.dependencies.RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(delete_limiter, "allow", lambda key, cost=1: False)
+
+    response = client.delete("/DEL123")
+
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert response.json() == {"detail": "Too many requests"}
+    assert int(response.headers["retry-after"]) >= 1
+
+
+def test_generate_shortened_url_when_database_is_unavailable_returns_503(
+    make_client, monkeypatch
+):
+    client = make_client()
+
+    async def unavailable_generate(url_arg, db_arg, **policy):
+        raise service.BackendUnavailable()
+
+    monkeypatch.setattr(
+        "app.generator.routes.url.generate_url_token", unavailable_generate
+    )
+
+    response = client.post("/", json={"url": "https://google.com/"})
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json() == {
+        "success": False,
+        "message": "Service unavailable",
+        "data": None,
+    }
+
+
+def test_get_url_uses_link_redirect_code_and_cache_headers(make_client, monkeypatch):
+    client = make_client()
+    link = Link("https://original.example/", redirect_code=308, etag="abc")
+
+    async def fake_resolve(token_arg, db_arg):
+        return link
+
+    monkeypatch.setattr("app.generator.routes.url.resolve_link", fake_resolve)
+    monkeypatch.setattr("app.generator.links.REDIRECT_PERMANENT_MAX_AGE", 600)
+
+    response = client.get("/ABC123")
+
+    assert response.status_code == status.HTTP_308_PERMANENT_REDIRECT
+    assert response.headers["location"] == "https://original.example/"
+    assert response.headers["cache-control"] == "public, max-age=600"
+    assert response.headers["etag"] == '"abc"'
+
+    response = client.get("/ABC123", headers={"If-None-Match": 'W/"abc"'})
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert "location" not in response.headers
+    assert response.headers["etag"] == '"abc"'
+
+
+def test_get_url_caps_max_age_at_expiry_and_rejects_expired_links(
+    make_client, monkeypatch
+):
+    client = make_client()
+    links = {
+        "SOON11": Link("https://a.example/", 301, int(time.time()) + 30, "a"),
+        "GONE11": Link("https://b.example/", 301, int(time.time()) - 1, "b"),
+    }
+
+    async def fake_resolve(token_arg, db_arg):
+        return links[token_arg]
+
+    monkeypatch.setattr("app.generator.routes.url.resolve_link", fake_resolve)
+
+    response = client.get("/SOON11")
+    max_age = int(response.headers["cache-control"].rsplit("=", 1)[1])
+
+    assert response.status_code == status.HTTP_301_MOVED_PERMANENTLY
+    assert 0 < max_age <= 30
+    assert client.get("/GONE11").status_code == status.HTTP_410_GONE
+
+
+def test_generate_shortened_url_passes_redirect_policy(make_client, monkeypatch):
+    client = make_client()
+    received = {}
+
+    async def fake_generate(url_arg, db_arg, **policy):
+        received.update(policy)
+        return "http://short/ABC123"
+
+    monkeypatch.setattr("app.generator.routes.url.generate_url_token", fake_generate)
+
+    response = client.post(
+        "/",
+        json={
+            "url": "https://google.com/",
+            "redirect_code": 307,
+            "expires_at": "2999-01-01T00:00:00Z",
+        },
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert received == {
+        "redirect_code": 307,
+        "expires_at": 32472144000,
+        "alias": None,
+    }
+
+    response = client.post(
+        "/", json={"url": "https://google.com/", "expires_at": "2000-01-01T00:00:00"}
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["message"] == "Invalid expiration"
+
+    response = client.post(
+        "/", json={"url": "https://google.com/", "redirect_code": 303}
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_generate_shortened_url_with_alias(make_client, monkeypatch):
+    client = make_client()
+
+    async def fake_generate(url_arg, db_arg, **policy):
+        if policy["alias"] == "taken":
+            raise service.AliasUnavailable("Alias taken")
+        return f"http://short/{policy['alias']}"
+
+    monkeypatch.setattr("app.generator.routes.url.generate_url_token", fake_generate)
+
+    response = client.post("/", json={"url": "https://google.com/", "alias": "promo"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["data"] == {"url": "http://short/promo"}
+
+    for alias in ("metrics", "no-dash", "abc"):
+        response = client.post("/", json={"url": "https://google.com/", "alias": alias})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["message"] == "Invalid alias"
+
+    response = client.post("/", json={"url": "https://google.com/", "alias": "taken"})
+
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.json()["message"] == "Alias unavailable"
+
+
+def test_generate_shortened_url_with_invalid_body_returns_422(make_client):
+    client = make_client()
+
+    response = client.post("/", content=b"{not json")
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"][0]["loc"] == ["body"]
+
+    response = client.post("/", json={"link": "https://google.com/"})
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"][0]["loc"] == ["body", "url"]
+
+
+def test_resolve_urls_returns_a_result_per_token(make_client, monkeypatch):
+    client = make_client()
+    seen = []
+
+    async def fake_resolve_links(tokens, db):
+        seen.extend(tokens)
+        return {
+            "ABC123": Link("https://a.example/", 301),
+            "OLD123": Link("https://old.example/", expires_at=1),
+        }
+
+    monkeypatch.setattr("app.generator.routes.url.resolve_links", fake_resolve_links)
+
+    response = client.post(
+        "/resolve", json={"tokens": ["ABC123", "OLD123", "bad-token", "NOP123", "ABC123"]}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert seen == ["ABC123", "OLD123", "NOP123"]
+    assert response.json()["data"]["results"] == [
+        {
+            "token": "ABC123",
+            "status": "found",
+            "url": "https://a.example/",
+            "redirect_code": 301,
+            "expires_at": None,
+        },
+        {"token": "OLD123", "status": "expired"},
+        {"token": "bad-token", "status": "invalid"},
+        {"token": "NOP123", "status": "not_found"},
+    ]
+
+
+def test_resolve_urls_rejects_empty_token_lists(make_client):
+    client = make_client()
+
+    response = client.post("/resolve", json={"tokens": []})
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_delete_urls_returns_a_result_per_token(make_client, monkeypatch):
+    client = make_client()
+
+    async def fake_delete_url_tokens(tokens, db):
+        return {token: token == "ABC123" for token in tokens}
+
+    monkeypatch.setattr(
+        "app.generator.routes.url.delete_url_tokens", fake_delete_url_tokens
+    )
+
+    response = client.post("/delete", json={"tokens": ["ABC123", "NOP123", "x"]})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["data"]["results"] == [
+        {"token": "ABC123", "status": "deleted"},
+        {"token": "NOP123", "status": "not_found"},
+        {"token": "x", "status": "invalid"},
+    ]
+
+
+def test_delete_urls_charges_the_rate_limit_per_token(make_client, monkeypatch):
+    from app.core.ratelimit import RateLimiter
+
+    client = make_client()
+    limiter = RateLimiter("delete", 2, 60, client=fakeredis.FakeRedis())
+    monkeypatch.setattr("app.dependencies.RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr("app.generator.routes.url.delete_limiter", limiter)
+    deleted = []
+
+    async def fake_delete_url_tokens(tokens, db):
+        deleted.extend(tokens)
+        return {token: True for token in tokens}
+
+    monkeypatch.setattr(
+        "app.generator.routes.url.delete_url_tokens", fake_delete_url_tokens
+    )
+
+    response = client.post("/delete", json={"tokens": ["ABC123", "DEF456", "GHI789"]})
+
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert deleted == []
+
+    response = client.post("/delete", json={"tokens": ["ABC123", "DEF456"]})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert deleted == ["ABC123", "DEF456"]
+
+
+def test_delete_urls_when_database_is_unavailable_returns_503(
+    make_client, monkeypatch
+):
+    client = make_client()
+
+    async def fake_delete_url_tokens(tokens, db):
+        raise service.BackendUnavailable()
+
+    monkeypatch.setattr(
+        "app.generator.routes.url.delete_url_tokens", fake_delete_url_tokens
+    )
+
+    response = client.post("/delete", json={"tokens": ["ABC123"]})
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
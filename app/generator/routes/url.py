@@ -1,83 +1,202 @@
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import RedirectResponse
+import orjson
+from fastapi import APIRouter, Depends, Header, Request
+from fastapi.responses import ORJSONResponse, RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from starlette.responses import JSONResponse
+from starlette.responses import Response
 
-from app.dependencies import get_db
-from app.generator.exeception import ShortenUrlDeletionFailed
+from app.core.ratelimit import create_limiter, delete_limiter
+from app.dependencies import (
+    admission_control,
+    check_rate_limit,
+    get_db,
+    json_body,
+    rate_limited,
+)
+from app.generator.exeception import (
+    AliasUnavailable,
+    BackendUnavailable,
+    ServiceOverloaded,
+    ShortenUrlDeletionFailed,
+)
+from app.generator.links import cache_headers, etag_matches, to_timestamp
 from app.generator.schema import (
+    BatchResponse,
+    BatchTokensRequest,
     GeneratorRequest,
     StandardResponse,
     ShortenedURLResponse,
     DeleteURLResponse,
 )
-from app.generator.service import generate_url_token, retrieve_url, delete_url_token
+from app.generator.service import (
+    delete_url_token,
+    delete_url_tokens,
+    generate_url_token,
+    resolve_link,
+    resolve_links,
+)
 from app.generator.utils import (
     is_safe_url_path,
+    is_valid_alias,
     validate_url_scheme,
 )
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="", tags=["url"])
 
+RETRY_AFTER = {"Retry-After": "1"}
+
+
+def _detail(message: str) -> bytes:
+    return orjson.dumps({"detail": message})
+
+
+def _failure(message: str) -> bytes:
+    return orjson.dumps({"success": False, "message": message, "data": None})
+
+
+# Constant bodies are encoded once at import instead of on every request
+BAD_TOKEN = _detail("Bad token")
+NOT_FOUND = _detail("URL not found")
+EXPIRED = _detail("URL expired")
+OVERLOADED = _detail("Service overloaded")
+UNAVAILABLE = _detail("Service unavailable")
+INVALID_URL = _failure("Invalid URL")
+INVALID_EXPIRATION = _failure("Invalid expiration")
+INVALID_ALIAS = _failure("Invalid alias")
+ALIAS_UNAVAILABLE = _failure("Alias unavailable")
+INVALID_TOKEN = _failure("Bad token")
+DELETION_FAILED = _failure("Could not delete the Token")
+SERVICE_UNAVAILABLE = _failure("Service unavailable")
+INTERNAL_ERROR = _failure("Internal server error")
+DELETED = orjson.dumps(
+    {
+        "success": True,
+        "data": {"message": "URL deleted successfully"},
+        "message": None,
+    }
+)
+
+
+def _json(body: bytes, status_code: int, headers: dict | None = None) -> Response:
+    return Response(
+        body, status_code=status_code, headers=headers, media_type="application/json"
+    )
+
+
+def _request_body(model) -> dict:
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": model.model_json_schema()}},
+        }
+    }
+
 
 @router.get("/{url_id}", response_class=RedirectResponse, status_code=302)
-async def get_url(url_id: str, db: AsyncSession = Depends(get_db)):
+async def get_url(
+    url_id: str,
+    db: AsyncSession = Depends(get_db),
+    if_none_match: str | None = Header(None),
+):
     """
     Retrieves the original URL associated with the given token and redirects to it.
 
     Args:
         url_id (str): The token of the shortened URL.
         db (AsyncSession): The database session.
+        if_none_match (str | None): ETag of a redirect cached by the client.
 
     Returns:
-        RedirectResponse: A 302 redirect to the original URL.
+        RedirectResponse: A redirect to the original URL with the link's
+            status code (302 by default) and Cache-Control/ETag headers, or
+            a 304 when the client's cached redirect is still current.
 
-    Raises:
-        HTTPException: If the token is unsafe or the URL is not found.
+    Errors (unsafe token, URL not found or expired, lookup needing the
+    database while the service is overloaded or the database is
+    unavailable) are answered with pre-encoded `{"detail": ...}` bodies.
     """
     if not is_safe_url_path(url_id):
-        raise HTTPException(status_code=400, detail="Bad token")
+        return _json(BAD_TOKEN, 400)
+
+    try:
+        link = await resolve_link(url_id, db)
+    except ServiceOverloaded:
+        return _json(OVERLOADED, 503, RETRY_AFTER)
+    except BackendUnavailable:
+        return _json(UNAVAILABLE, 503, RETRY_AFTER)
 
-    if url := await retrieve_url(url_id, db):
-        return url
+    if link is None:
+        return _json(NOT_FOUND, 404)
+    if link.expired:
+        return _json(EXPIRED, 410)
 
-    raise HTTPException(status_code=404, detail="URL not found")
+    headers = cache_headers(link)
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return RedirectResponse(link.url, status_code=link.redirect_code, headers=headers)
 
 
-@router.post("/", response_model=StandardResponse[ShortenedURLResponse])
+@router.post(
+    "/",
+    response_model=StandardResponse[ShortenedURLResponse],
+    dependencies=[Depends(rate_limited(create_limiter)), Depends(admission_control)],
+    openapi_extra=_request_body(GeneratorRequest),
+)
 async def generate_url(
-    data: GeneratorRequest, db: AsyncSession = Depends(get_db)
-) -> JSONResponse:
+    data: GeneratorRequest = Depends(json_body(GeneratorRequest)),
+    db: AsyncSession = Depends(get_db),
+) -> Response:
     """
     Generates a shortened URL token for the provided URL.
 
     Args:
-        data (GeneratorRequest): The request payload containing the URL to shorten.
-            eg: {"url":"https://www.google.com/"}
+        data (GeneratorRequest): The request payload containing the URL to shorten
+            and optionally its redirect code, expiry and custom alias.
+            eg: {"url":"https://www.google.com/", "redirect_code": 301}
         db (AsyncSession): The database session.
 
     Returns:
-        dict: A dictionary containing the generated token.
+        dict: A dictionary containing the generated token. An invalid or
+            reserved alias answers 400, a taken one 409.
     """
+    expires_at = to_timestamp(data.expires_at) if data.expires_at else None
+    if expires_at is not None and expires_at <= time.time():
+        return _json(INVALID_EXPIRATION, 400)
+    if data.alias is not None and not is_valid_alias(data.alias):
+        return _json(INVALID_ALIAS, 400)
+
     try:
         received_url = validate_url_scheme(data.url)
-        shortened_url = await generate_url_token(received_url, db)
-        return JSONResponse(
+        shortened_url = await generate_url_token(
+            received_url,
+            db,
+            redirect_code=data.redirect_code,
+            expires_at=expires_at,
+            alias=data.alias,
+        )
+        return ORJSONResponse(
             status_code=200,
             content={"success": True, "data": {"url": shortened_url}, "message": None},
         )
     except ValueError as e:
-        logger.warning(f"URL invalid data {data.url} — {e}")
-        return JSONResponse(
-            status_code=400,
-            content={"success": False, "message": "Invalid URL", "data": None},
+        logger.warning(
+            "Invalid URL submitted: %s", e, extra={"url_length": len(data.url)}
         )
+        return _json(INVALID_URL, 400)
+    except AliasUnavailable:
+        return _json(ALIAS_UNAVAILABLE, 409)
+    except BackendUnavailable:
+        return _json(SERVICE_UNAVAILABLE, 503)
 
 
-@router.delete("/{url_id}", response_model=StandardResponse[DeleteURLResponse])
+@router.delete(
+    "/{url_id}",
+    response_model=StandardResponse[DeleteURLResponse],
+    dependencies=[Depends(rate_limited(delete_limiter)), Depends(admission_control)],
+)
 async def delete_url(url_id: str, db: AsyncSession = Depends(get_db)):
     """
     Deletes a shortened URL by its token.
@@ -90,32 +209,122 @@ async def delete_url(url_id: str, db: AsyncSession = Depends(get_db)):
         dict: A message indicating the deletion was successful.
     """
     if not is_safe_url_path(url_id) or not url_id:
-        return JSONResponse(
-            status_code=400,
-            content={"success": False, "message": "Bad token", "data": None},
-        )
+        return _json(INVALID_TOKEN, 400)
 
     try:
         await delete_url_token(url_id, db)
-        return {"success": True, "data": {"message": "URL deleted successfully"}}
+        return _json(DELETED, 200)
 
     except ShortenUrlDeletionFailed:
-        return JSONResponse(
-            status_code=400,
-            content={
-                "success": False,
-                "message": "Could not delete the Token",
-                "data": None,
-            },
-        )
+        return _json(DELETION_FAILED, 400)
+
+    except BackendUnavailable:
+        return _json(SERVICE_UNAVAILABLE, 503)
 
     except Exception:
-        logger.error(f"Failed to delete URL {url_id}")
-        return JSONResponse(
-            status_code=500,
-            content={
-                "success": False,
-                "message": "Internal server error",
-                "data": None,
-            },
+        logger.exception("Failed to delete URL %s", url_id)
+        return _json(INTERNAL_ERROR, 500)
+
+
+def _batch(results: list[dict]) -> Response:
+    return ORJSONResponse(
+        {"success": True, "data": {"results": results}, "message": None}
+    )
+
+
+@router.post(
+    "/resolve",
+    response_model=StandardResponse[BatchResponse],
+    dependencies=[Depends(admission_control)],
+    openapi_extra=_request_body(BatchTokensRequest),
+)
+async def resolve_urls(
+    data: BatchTokensRequest = Depends(json_body(BatchTokensRequest)),
+    db: AsyncSession = Depends(get_db),
+) -> Response:
+    """
+    Resolves a list of tokens without redirecting.
+
+    Args:
+        data (BatchTokensRequest): Up to BATCH_MAX_TOKENS tokens.
+            eg: {"tokens": ["ABC123", "XYZ789"]}
+        db (AsyncSession): The database session.
+
+    Returns:
+        dict: One result per distinct token, in request order, with status
+            "found" (and the URL and redirect policy), "expired",
+            "not_found" or "invalid".
+    """
+    tokens = list(dict.fromkeys(data.tokens))
+    try:
+        links = await resolve_links([t for t in tokens if is_safe_url_path(t)], db)
+    except (ServiceOverloaded, BackendUnavailable):
+        return _json(SERVICE_UNAVAILABLE, 503, RETRY_AFTER)
+
+    results = []
+    for token in tokens:
+        link = links.get(token)
+        if not is_safe_url_path(token):
+            results.append({"token": token, "status": "invalid"})
+        elif link is None:
+            results.append({"token": token, "status": "not_found"})
+        elif link.expired:
+            results.append({"token": token, "status": "expired"})
+        else:
+            results.append(
+                {
+                    "token": token,
+                    "status": "found",
+                    "url": link.url,
+                    "redirect_code": link.redirect_code,
+                    "expires_at": link.expires_at,
+                }
+            )
+    return _batch(results)
+
+
+@router.post(
+    "/delete",
+    response_model=StandardResponse[BatchResponse],
+    dependencies=[Depends(admission_control)],
+    openapi_extra=_request_body(BatchTokensRequest),
+)
+async def delete_urls(
+    request: Request,
+    data: BatchTokensRequest = Depends(json_body(BatchTokensRequest)),
+    db: AsyncSession = Depends(get_db),
+) -> Response:
+    """
+    Deletes a list of tokens. Each distinct token counts as one DELETE
+    against the caller's rate limit.
+
+    Args:
+        request (Request): The incoming request, identifying the caller.
+        data (BatchTokensRequest): Up to BATCH_MAX_TOKENS tokens.
+        db (AsyncSession): The database session.
+
+    Returns:
+        dict: One result per distinct token, in request order, with status
+            "deleted", "not_found" or "invalid". A failed chunk answers 400,
+            with the tokens of earlier chunks already deleted.
+    """
+    tokens = list(dict.fromkeys(data.tokens))
+    check_rate_limit(delete_limiter, request, len(tokens))
+    try:
+        deleted = await delete_url_tokens(
+            [t for t in tokens if is_safe_url_path(t)], db
         )
+    except ShortenUrlDeletionFailed:
+        return _json(DELETION_FAILED, 400)
+    except BackendUnavailable:
+        return _json(SERVICE_UNAVAILABLE, 503)
+
+    results = []
+    for token in tokens:
+        if token not in deleted:
+            results.append({"token": token, "status": "invalid"})
+        elif deleted[token]:
+            results.append({"token": token, "status": "deleted"})
+        else:
+            results.append({"token": token, "status": "not_found"})
+    return _batch(results)
@@ -1,5 +1,8 @@
-from typing import Generic, TypeVar, Optional
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Generic, Literal, TypeVar, Optional
+from pydantic import BaseModel, Field
+
+from app.settings import BATCH_MAX_TOKENS
 
 T = TypeVar("T")
 
@@ -17,6 +20,25 @@ class ErrorResponse(BaseModel):
 
 class GeneratorRequest(BaseModel):
     url: str
+    redirect_code: Optional[Literal[301, 302, 307, 308]] = None
+    expires_at: Optional[datetime] = None
+    alias: Optional[str] = None
+
+
+class BatchTokensRequest(BaseModel):
+    tokens: list[str] = Field(min_length=1, max_length=BATCH_MAX_TOKENS)
+
+
+class TokenResult(BaseModel):
+    token: str
+    status: Literal["found", "expired", "deleted", "not_found", "invalid"]
+    url: Optional[str] = None
+    redirect_code: Optional[int] = None
+    expires_at: Optional[int] = None
+
+
+class BatchResponse(BaseModel):
+    results: list[TokenResult]
 
 
 class RouteStats(BaseModel):
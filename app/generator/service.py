@@ -1,13 +1,44 @@
 import logging
-from sqlalchemy import delete
+from sqlalchemy import String, any_, bindparam, delete
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from app.core.cache import redis_client
-from app.generator.exeception import ShortenUrlDeletionFailed
+from app.core.batching import MicroBatcher
+from app.core.cache import local_cache, url_cache
+from app.core.circuit import CircuitOpen, db_breaker, redis_breaker
+from app.core.compression import url_compressor
+from app.core.database import AsyncSessionLocal, engine
+from app.core.ratelimit import is_overloaded
+from app.core.regions import region_router
+from app.core.storage import url_store
+from app.generator.exeception import (
+    AliasUnavailable,
+    BackendUnavailable,
+    ServiceOverloaded,
+    ShortenUrlDeletionFailed,
+)
+from app.generator.links import Link, decode_link, pack_link
 from app.generator.models import UrlShorted
-from app.settings import CACHE_DEFAULT_TIMEOUT, BASE_URL
+from app.generator.queries import INSERT_URL, SELECT_URL
+from app.generator.replication import (
+    lookup_owner_region,
+    publish_change,
+    publish_changes,
+)
+from app.generator.tokens import reserved_names, token_length
+from app.generator.warmup import record_hit
+from app.settings import (
+    BATCH_CHUNK_SIZE,
+    CACHE_DEFAULT_TIMEOUT,
+    BASE_URL,
+    DB_PGBOUNCER_MODE,
+    DB_QUERY_TIMEOUT,
+    LOOKUP_BATCH_ENABLED,
+    LOOKUP_BATCH_MAX_SIZE,
+    LOOKUP_BATCH_WINDOW,
+)
 import string
 import secrets
 
@@ -16,71 +47,276 @@ ALPHANUMERIC_CHARS = string.ascii_letters + string.digits
 logger = logging.getLogger(__name__)
 
 
-async def generate_url_token(url: str, db: AsyncSession) -> str:
+async def _db_call(fn, *args):
     """
-    Generates a unique token.
-    - 6 alphanumeric characters
+    Runs a database call through the PostgreSQL circuit breaker.
+
+    Raises:
+        BackendUnavailable: If the breaker is open or the call timed out or
+            could not reach the database.
+    """
+    try:
+        return await db_breaker.call(fn, *args, timeout=DB_QUERY_TIMEOUT)
+    except (CircuitOpen, OSError) as e:
+        raise BackendUnavailable("Database unavailable") from e
+
+
+def _ensure_writable() -> None:
+    """
+    Raises:
+        BackendUnavailable: On read-only nodes serving from embedded storage.
+    """
+    if url_store is not None:
+        raise BackendUnavailable("Read-only node")
+
+
+def _tokens_in(tokens: list[str]):
+    """
+    `id = ANY(:ids)` on PostgreSQL: a single array parameter, so every batch
+    size shares one prepared statement. `IN (...)` elsewhere.
+    """
+    if engine.dialect.name == "postgresql":
+        return UrlShorted.id == any_(bindparam("ids", tokens, type_=ARRAY(String)))
+    return UrlShorted.id.in_(tokens)
+
+
+async def _select_many(tokens: list[str], db: AsyncSession) -> dict[str, str]:
+    """
+    Reads the stored URLs of `tokens` with a single query, from the embedded
+    store when configured.
+    """
+    if url_store is not None:
+        return url_store.get_many(tokens)
+
+    stmt = select(UrlShorted.id, UrlShorted.url).where(_tokens_in(tokens))
+    try:
+        result = await _db_call(db.execute, stmt)
+    except SQLAlchemyError as e:
+        raise BackendUnavailable("Database unavailable") from e
+    return dict(result.all())
+
+
+async def _lookup_many(tokens: list[str]) -> dict[str, str]:
+    """
+    `_select_many` on a session of its own, since the batch serves several
+    requests.
+    """
+    if url_store is not None:
+        return url_store.get_many(tokens)
+
+    async with AsyncSessionLocal() as session:
+        return await _select_many(tokens, session)
+
+
+async def _cache_get_many(tokens: list[str]) -> dict[str, str]:
+    values = redis_breaker.guard(url_cache.get_many, tokens, fallback=[])
+    return {token: value for token, value in zip(tokens, values) if value}
+
+
+cache_batcher = MicroBatcher(
+    "redis", _cache_get_many, LOOKUP_BATCH_WINDOW, LOOKUP_BATCH_MAX_SIZE
+)
+lookup_batcher = MicroBatcher(
+    "database", _lookup_many, LOOKUP_BATCH_WINDOW, LOOKUP_BATCH_MAX_SIZE
+)
+
+
+async def _cache_get(token: str) -> str | None:
+    """
+    Reads the cached value of `token`, through the Redis batcher when
+    lookup batching is enabled.
+    """
+    if LOOKUP_BATCH_ENABLED:
+        return await cache_batcher.load(token)
+    return redis_breaker.guard(url_cache.get, token)
+
+
+async def _lookup(token: str, db: AsyncSession) -> str | None:
+    """
+    Reads the stored URL of `token` from the embedded store when configured,
+    otherwise from PostgreSQL. With lookup batching enabled, misses of
+    concurrent requests are read together (see `_lookup_many`).
+    """
+    if LOOKUP_BATCH_ENABLED:
+        return await lookup_batcher.load(token)
+
+    if url_store is not None:
+        return url_store.get(token)
+
+    try:
+        result = await _db_call(db.execute, SELECT_URL, {"token": token})
+    except SQLAlchemyError as e:
+        raise BackendUnavailable("Database unavailable") from e
+    stored_url = result.scalar_one_or_none()
+    if DB_PGBOUNCER_MODE:
+        # Ends the read transaction now, so PgBouncer can hand the server
+        # connection to another client while this request finishes
+        await db.rollback()
+    return stored_url
+
+
+def _cache_timeout(link: Link) -> int:
+    """
+    Redis TTL for `link`: CACHE_DEFAULT_TIMEOUT, or less if it expires sooner.
+    """
+    ttl = link.ttl()
+    if ttl is None:
+        return CACHE_DEFAULT_TIMEOUT
+    return max(min(CACHE_DEFAULT_TIMEOUT, int(ttl)), 1)
+
+
+def _random_token() -> str:
+    """
+    A random token of `token_length.current` characters, starting with one of
+    this region's prefix characters when regions are configured. Tokens
+    matching a reserved name or containing a blocked word are drawn again.
+    """
+    while True:
+        prefix = region_router.token_prefix()
+        token = prefix + "".join(
+            secrets.choice(ALPHANUMERIC_CHARS)
+            for _ in range(token_length.current - len(prefix))
+        ).upper()
+        if token not in reserved_names:
+            return token
+
+
+async def generate_url_token(
+    url: str,
+    db: AsyncSession,
+    redirect_code: int | None = None,
+    expires_at: int | None = None,
+    alias: str | None = None,
+) -> str:
+    """
+    Generates a unique token, or stores the link under a custom alias.
+    - TOKEN_LENGTH alphanumeric characters (grown as collisions become
+      frequent, see `TokenLength`), starting with one of this region's
+      prefix characters when regions are configured
+    - Compresses long URLs when URL compression is enabled
+    - Stores the link's own redirect code and expiry along with the URL
     - Stores the token and URL in the database
-    - Caches the token and URL in Redis
+    - Caches the token and URL in Redis (skipped while Redis is unhealthy)
+    - Publishes the mapping for replication to the other regions
     - Returns the full shortened URL
 
     Args:
         url (str): The original URL to shorten.
         db (AsyncSession): The database session.
+        redirect_code (int | None): Redirect status, REDIRECT_DEFAULT_CODE
+            when None.
+        expires_at (int | None): Unix time after which the link is gone.
+        alias (str | None): Custom token, already validated with
+            `is_valid_alias`; a random token when None.
 
     Returns:
         str: The shortened URL.
     Raises:
         Exception: If the maximum number of retries is exceeded while generating a unique token.
+        AliasUnavailable: If the alias is taken, or starts with another
+            region's prefix character.
+        BackendUnavailable: If the database is unavailable or this node is
+            read-only.
     """
 
-    async def _generate_token(retries=0) -> str:
-        if retries >= 5:
-            raise Exception("Max retries exceeded while generating unique token.")
-
-        new_token = "".join(
-            secrets.choice(ALPHANUMERIC_CHARS) for _ in range(6)
-        ).upper()
-
-        new_entry = UrlShorted(id=new_token, url=url)
-        db.add(new_entry)
+    _ensure_writable()
+    if alias is not None and not region_router.owns(alias):
+        raise AliasUnavailable("Alias belongs to another region")
+    stored_url = pack_link(url_compressor.compress(url), redirect_code, expires_at)
 
+    async def _insert(token: str) -> bool:
         try:
-            await db.commit()
+            await _db_call(db.execute, INSERT_URL, {"id": token, "url": stored_url})
+            await _db_call(db.commit)
         except IntegrityError:
             await db.rollback()
-            return await _generate_token(retries + 1)
+            return False
+        except SQLAlchemyError as e:
+            await db.rollback()
+            raise BackendUnavailable("Database unavailable") from e
+        return True
 
+    async def _generate_token(retries=0) -> str:
+        if retries >= 5:
+            raise Exception("Max retries exceeded while generating unique token.")
+
+        new_token = _random_token()
+        inserted = await _insert(new_token)
+        token_length.record(collided=not inserted)
+        if not inserted:
+            return await _generate_token(retries + 1)
         return new_token
 
-    token = await _generate_token()
-    redis_client.set(token, url, ex=CACHE_DEFAULT_TIMEOUT)
+    if alias is None:
+        token = await _generate_token()
+    elif await _insert(alias):
+        token = alias
+    else:
+        raise AliasUnavailable("Alias taken")
+
+    ex = _cache_timeout(Link(url, expires_at=expires_at))
+    redis_breaker.guard(url_cache.set, token, stored_url, ex=ex)
+    redis_breaker.guard(publish_change, token, stored_url)
     return f"{BASE_URL}/{token}"
 
 
-async def retrieve_url(token: str, db: AsyncSession) -> str | None:
+async def resolve_link(token: str, db: AsyncSession) -> Link | None:
     """
-    Retrieves the original URL from the token using ORM.
+    Retrieves the link (URL and redirect policy) of the token.
 
     Args:
         token (str): The token to look up.
         db (AsyncSession): The database session.
     Returns:
-        str | None: The original URL if found, otherwise None.
-    Caches the result in Redis for faster access.
+        Link | None: The link if found, otherwise None. Expired links are
+            returned as well; callers check `Link.expired`.
+    Raises:
+        ServiceOverloaded: On a cache miss while the service is shedding load.
+        BackendUnavailable: On a cache miss while the database is unavailable.
+    Caches the result in Redis for faster access. Values are kept in their
+    stored (possibly compressed) form and decoded on the way out; the
+    local in-process cache keeps the decoded link. Redis is skipped
+    while its circuit breaker is open. Misses are read from the embedded
+    store on edge nodes, otherwise from PostgreSQL. Tokens created by
+    another region and not replicated here yet are read from that region's
+    cache. With LOOKUP_BATCH_ENABLED, the Redis and database reads of
+    concurrent requests are batched (`cache_batcher`, `lookup_batcher`).
     """
 
-    if url_cached := redis_client.get(token):
-        return url_cached
+    record_hit(token)
+
+    if link_local := local_cache.get(token):
+        return link_local
+
+    if url_cached := await _cache_get(token):
+        link = decode_link(url_cached, url_compressor)
+        local_cache.set(token, link)
+        return link
 
-    result = await db.execute(select(UrlShorted.url).where(UrlShorted.id == token))
-    url = result.scalar_one_or_none()
+    if is_overloaded():
+        raise ServiceOverloaded()
 
-    if url is None:
+    stored_url = await _lookup(token, db)
+    if stored_url is None:
+        stored_url = await lookup_owner_region(token)
+    if stored_url is None:
         return None
 
-    redis_client.set(token, url, ex=CACHE_DEFAULT_TIMEOUT)
-    return url
+    link = decode_link(stored_url, url_compressor)
+    redis_breaker.guard(url_cache.set, token, stored_url, ex=_cache_timeout(link))
+    local_cache.set(token, link)
+    return link
+
+
+async def retrieve_url(token: str, db: AsyncSession) -> str | None:
+    """
+    Retrieves the original URL from the token, None if it is unknown or
+    expired. See `resolve_link`.
+    """
+    link = await resolve_link(token, db)
+    if link is None or link.expired:
+        return None
+    return link.url
 
 
 async def delete_url_token(token: str, db: AsyncSession) -> None:
@@ -93,15 +329,129 @@ async def delete_url_token(token: str, db: AsyncSession) -> None:
 
     Raises:
         ShortenUrlDeletionFailed: If the deletion from the database fails.
+        BackendUnavailable: If the database is unavailable or this node is
+            read-only.
     """
 
-    redis_client.delete(token)
+    _ensure_writable()
+    if redis_breaker.guard(url_cache.delete, token, fallback=False) is False:
+        logger.warning("Redis unavailable, %s stays cached until it expires", token)
+    local_cache.delete(token)
     stmt = delete(UrlShorted).where(UrlShorted.id == token)
 
     try:
-        await db.execute(stmt)
-        await db.commit()
+        await _db_call(db.execute, stmt)
+        await _db_call(db.commit)
     except SQLAlchemyError as e:
         await db.rollback()
-        logger.error(f"Failed to delete URL from database: {e}")
+        logger.error("Failed to delete URL from database: %s", e)
         raise ShortenUrlDeletionFailed("Failed to delete URL from database") from e
+
+    redis_breaker.guard(publish_change, token)
+
+
+def _chunks(tokens: list[str], size: int):
+    for i in range(0, len(tokens), size):
+        yield tokens[i : i + size]
+
+
+async def resolve_links(tokens: list[str], db: AsyncSession) -> dict[str, Link]:
+    """
+    Resolves many tokens at once, for link checkers and other bulk jobs.
+
+    Tokens missing from the local cache are read from Redis with a single
+    MGET per chunk of BATCH_CHUNK_SIZE, and the remaining ones with a single
+    `id = ANY(:ids)` query per chunk; database hits are cached back in
+    Redis in one pipeline. Requests are not counted in the hot set, and
+    tokens of another region not replicated here yet are not looked up
+    remotely.
+
+    Args:
+        tokens (list[str]): Distinct tokens to look up.
+        db (AsyncSession): The database session.
+    Returns:
+        dict[str, Link]: The links found, by token; expired links included.
+    Raises:
+        ServiceOverloaded: On cache misses while the service is shedding load.
+        BackendUnavailable: On cache misses while the database is unavailable.
+    """
+    links: dict[str, Link] = {}
+    missing = []
+    for token in tokens:
+        if link := local_cache.get(token):
+            links[token] = link
+        else:
+            missing.append(token)
+
+    for chunk in _chunks(missing, BATCH_CHUNK_SIZE):
+        cached = await _cache_get_many(chunk)
+        misses = [token for token in chunk if token not in cached]
+        found = {}
+        if misses:
+            if is_overloaded():
+                raise ServiceOverloaded()
+            found = await _select_many(misses, db)
+
+        lasting = []
+        for token, value in (cached | found).items():
+            link = links[token] = decode_link(value, url_compressor)
+            local_cache.set(token, link)
+            if token not in found:
+                continue
+            if link.expires_at is None:
+                lasting.append((token, value))
+            else:
+                redis_breaker.guard(
+                    url_cache.set, token, value, ex=_cache_timeout(link)
+                )
+        if lasting:
+            redis_breaker.guard(url_cache.set_many, lasting, ex=CACHE_DEFAULT_TIMEOUT)
+    return links
+
+
+async def delete_url_tokens(tokens: list[str], db: AsyncSession) -> dict[str, bool]:
+    """
+    Deletes many tokens at once, for cleanup jobs.
+
+    Each chunk of BATCH_CHUNK_SIZE tokens is removed from Redis with one
+    pipelined call and from the database with a single
+    `DELETE ... WHERE id = ANY(:ids) RETURNING id`, committed per chunk.
+
+    Args:
+        tokens (list[str]): Distinct tokens to delete.
+        db (AsyncSession): The database session.
+    Returns:
+        dict[str, bool]: Whether each token existed and was deleted.
+    Raises:
+        ShortenUrlDeletionFailed: If deleting a chunk fails; earlier chunks
+            stay deleted.
+        BackendUnavailable: If the database is unavailable or this node is
+            read-only.
+    """
+    _ensure_writable()
+    deleted: dict[str, bool] = {}
+    for chunk in _chunks(tokens, BATCH_CHUNK_SIZE):
+        cleared = redis_breaker.guard(url_cache.delete_many, chunk, fallback=False)
+        if cleared is False:
+            logger.warning(
+                "Redis unavailable, %d deleted tokens stay cached until they expire",
+                len(chunk),
+            )
+        for token in chunk:
+            local_cache.delete(token)
+
+        stmt = delete(UrlShorted).where(_tokens_in(chunk)).returning(UrlShorted.id)
+        try:
+            result = await _db_call(db.execute, stmt)
+            removed = {row[0] for row in result.all()}
+            await _db_call(db.commit)
+        except SQLAlchemyError as e:
+            await db.rollback()
+            logger.error("Failed to delete URLs from database: %s", e)
+            raise ShortenUrlDeletionFailed(
+                "Failed to delete URLs from database"
+            ) from e
+
+        redis_breaker.guard(publish_changes, [(token, None) for token in removed])
+        deleted.update((token, token in removed) for token in chunk)
+    return deleted
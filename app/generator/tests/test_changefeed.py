@@ -0,0 +1,103 @@
+import time
+
+import fakeredis
+import pytest
+
+import app.generator.changefeed as changefeed
+from app.core.cache import KeyCache, LocalCache
+from app.generator.links import pack_link
+from app.generator.replication import STREAM_KEY
+
+
+@pytest.fixture
+def caches(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(changefeed, "url_cache", KeyCache(client))
+    monkeypatch.setattr(changefeed, "local_cache", LocalCache(100, 60))
+    return client
+
+
+@pytest.mark.asyncio
+async def test_stream_source_reads_entries_after_the_first_read(caches):
+    caches.xadd(STREAM_KEY, {"token": "OLD111", "url": "http://old"})
+    source = changefeed.StreamChangeSource(caches)
+
+    assert await source.read(10) == []
+
+    caches.xadd(STREAM_KEY, {"token": "AAAAAA", "url": "http://a"})
+    caches.xadd(STREAM_KEY, {"token": "BBBBBB"})
+    changes = await source.read(10)
+
+    assert [change[:2] for change in changes] == [
+        ("AAAAAA", "http://a"),
+        ("BBBBBB", None),
+    ]
+    assert abs(changes[0][2] - time.time()) < 5
+    assert await source.read(10) == []
+
+
+@pytest.mark.asyncio
+async def test_postgres_source_parses_buffered_notifications():
+    class Connection:
+        def is_closed(self):
+            return False
+
+    source = changefeed.PostgresChangeSource("postgresql+asyncpg://u:p@db:5432/urls")
+    source.conn = Connection()
+    source._notified(None, 1, changefeed.CHANNEL, '{"id":"A1","url":"x","at":1.5}')
+    source._notified(None, 1, changefeed.CHANNEL, '{"id":"D4","at":2}')
+
+    assert source.dsn == "postgresql://u:p@db:5432/urls"
+    assert await source.read(1) == [("A1", "x", 1.5)]
+    assert await source.read(10) == [("D4", None, 2)]
+
+
+def test_build_change_source_rejects_unknown_sources():
+    source = changefeed.build_change_source("stream")
+
+    assert isinstance(source, changefeed.StreamChangeSource)
+    with pytest.raises(ValueError):
+        changefeed.build_change_source("kafka")
+
+
+def test_change_feed_bulk_updates_redis_and_local_cache(caches):
+    expiring = pack_link("http://e", 302, int(time.time()) + 60)
+    caches.set("BBBBBB", "http://stale")
+    caches.set("EEEEEE", "http://stale")
+    changefeed.local_cache.set("AAAAAA", "http://stale")
+    feed = changefeed.ChangeFeed(client=caches)
+
+    feed.apply(
+        [
+            ("AAAAAA", "http://old", time.time() - 2),
+            ("AAAAAA", "http://a", time.time() - 2),
+            ("BBBBBB", None, time.time() - 2),
+            ("EEEEEE", expiring, time.time() - 2),
+        ]
+    )
+
+    assert caches.get("AAAAAA") == "http://a"
+    assert caches.ttl("AAAAAA") > 0
+    assert caches.get("BBBBBB") is None
+    assert caches.get("EEEEEE") is None
+    assert changefeed.local_cache.get("AAAAAA") is None
+    assert changefeed.change_feed_lag_seconds._value.get() >= 2
+
+
+@pytest.mark.asyncio
+async def test_change_feed_writes_redis_only_from_the_lease_holder(caches):
+    source = changefeed.StreamChangeSource(caches)
+    holder = changefeed.ChangeFeed(source, caches, batch_size=10)
+    other = changefeed.ChangeFeed(source, caches, batch_size=10)
+    other.worker_id = "other"
+    holder.apply([("CCCCCC", "http://c", time.time())])
+    changefeed.local_cache.set("DDDDDD", "http://stale")
+
+    await source.read(10)
+    caches.xadd(STREAM_KEY, {"token": "DDDDDD", "url": "http://d"})
+
+    assert await other.poll() == 1
+    assert caches.get("DDDDDD") is None
+    assert changefeed.local_cache.get("DDDDDD") is None
+    assert await other.poll() == 0
+    assert changefeed.change_feed_lag_seconds._value.get() == 0
@@ -0,0 +1,97 @@
+import fakeredis
+import pytest
+from sqlalchemy import create_engine, text
+
+import app.generator.edge as edge
+from app.core.cache import KeyCache, LocalCache
+from app.core.storage import SqliteUrlStore
+from app.generator.replication import STREAM_KEY
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SqliteUrlStore(str(tmp_path / "urls.sqlite3"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def source(monkeypatch):
+    fake = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(edge, "url_cache", KeyCache(fake))
+    monkeypatch.setattr(edge, "local_cache", LocalCache(100, 60))
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_edge_sync_applies_change_stream(store, source):
+    edge.local_cache.set("AAAAAA", "http://stale")
+    source.set("AAAAAA", "http://stale")
+    source.xadd(STREAM_KEY, {"token": "AAAAAA", "url": "http://a"})
+    source.xadd(STREAM_KEY, {"token": "BBBBBB", "url": "http://b"})
+    source.xadd(STREAM_KEY, {"token": "AAAAAA"})
+    sync = edge.EdgeSync(store, source, batch_size=2)
+
+    assert await sync.poll() == 2
+    assert await sync.poll() == 1
+    assert await sync.poll() == 0
+
+    assert store.get("AAAAAA") is None
+    assert store.get("BBBBBB") == "http://b"
+    assert edge.local_cache.get("AAAAAA") is None
+    assert source.get("AAAAAA") is None
+    assert not sync.lagging
+
+
+@pytest.mark.asyncio
+async def test_edge_sync_flags_trimmed_stream(store, source):
+    store.load([], "1-0")
+    source.xadd(STREAM_KEY, {"token": "AAAAAA", "url": "http://a"}, id="5-0")
+    sync = edge.EdgeSync(store, source)
+
+    assert await sync.poll() == 1
+    assert sync.lagging
+
+
+@pytest.mark.asyncio
+async def test_edge_sync_writes_the_store_from_one_worker_only(store, source):
+    holder = edge.EdgeSync(store, source)
+    follower = edge.EdgeSync(store, source)
+    assert await holder.poll() == 0
+    source.xadd(STREAM_KEY, {"token": "AAAAAA", "url": "http://a"})
+    edge.local_cache.set("AAAAAA", "http://stale")
+
+    assert await follower.poll() == 1
+    assert edge.local_cache.get("AAAAAA") is None
+    assert store.get("AAAAAA") is None
+    assert await holder.poll() == 1
+    assert store.get("AAAAAA") == "http://a"
+
+    await holder.stop()
+    source.xadd(STREAM_KEY, {"token": "AAAAAA"})
+    assert await follower.poll() == 1
+    assert store.get("AAAAAA") is None
+    await follower.stop()
+
+
+def test_build_snapshot_exports_table_at_stream_position(tmp_path, source):
+    database_url = f"sqlite:///{tmp_path / 'primary.db'}"
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE url_shortened (id TEXT, url TEXT)"))
+        conn.execute(
+            text(
+                "INSERT INTO url_shortened VALUES "
+                "('AAAAAA', 'http://a'), ('BBBBBB', 'http://b')"
+            )
+        )
+    engine.dispose()
+    source.xadd(STREAM_KEY, {"token": "AAAAAA", "url": "http://a"}, id="7-0")
+    output = str(tmp_path / "edge.sqlite3")
+
+    assert edge.build_snapshot(output, database_url, source, batch_size=1) == 2
+
+    exported = SqliteUrlStore(output)
+    assert exported.get("BBBBBB") == "http://b"
+    assert exported.offset == "7-0"
+    exported.close()
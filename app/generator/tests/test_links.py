@@ -0,0 +1,40 @@
+from app.core.compression import UrlCompressor
+from app.generator.links import (
+    decode_link,
+    etag_matches,
+    pack_link,
+    unpack_link,
+)
+
+
+def test_pack_link_keeps_values_without_policy_unchanged():
+    assert pack_link("http://a") == "http://a"
+    assert unpack_link("http://a") == ("http://a", 302, None)
+
+
+def test_pack_and_unpack_link_policy():
+    value = pack_link("~zcompressed;data", 308, 1767225600)
+
+    assert value == "~l308;1767225600;~zcompressed;data"
+    assert unpack_link(value) == ("~zcompressed;data", 308, 1767225600)
+    assert unpack_link(pack_link("http://a", expires_at=5)) == ("http://a", 302, 5)
+
+
+def test_decode_link_decompresses_and_tags_the_value():
+    compressor = UrlCompressor(min_length=16)
+    url = "https://orig.com/path?utm_source=google&utm_medium=cpc"
+    value = pack_link(compressor.compress(url), 301)
+
+    link = decode_link(value, compressor)
+
+    assert link.url == url
+    assert link.redirect_code == 301
+    assert not link.expired
+    assert link.etag != decode_link(pack_link(url, 302), compressor).etag
+
+
+def test_etag_matches():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
@@ -0,0 +1,100 @@
+import fakeredis
+import pytest
+
+import app.generator.replication as replication
+from app.core.cache import KeyCache, LocalCache
+from app.core.regions import RegionRouter
+
+
+@pytest.fixture
+def regions(monkeypatch):
+    local = fakeredis.FakeRedis(decode_responses=True)
+    peer = fakeredis.FakeRedis(decode_responses=True)
+    router = RegionRouter("sa", {"sa": "AB", "us": "CD"}, {"us": "redis://peer"})
+    router._peers["us"] = peer
+    monkeypatch.setattr(replication, "region_router", router)
+    monkeypatch.setattr(replication, "redis_client", local)
+    monkeypatch.setattr(replication, "url_cache", KeyCache(local))
+    monkeypatch.setattr(replication, "local_cache", LocalCache(100, 60))
+    monkeypatch.setattr(replication, "_remote_misses", LocalCache(100, 60))
+    return router, local, peer
+
+
+def test_publish_change_appends_to_stream(regions):
+    _, local, _ = regions
+
+    replication.publish_change("AAAAAA", "http://a")
+    replication.publish_change("AAAAAA")
+
+    entries = [fields for _, fields in local.xrange(replication.STREAM_KEY)]
+    assert entries == [{"token": "AAAAAA", "url": "http://a"}, {"token": "AAAAAA"}]
+
+
+def test_publish_change_is_noop_without_regions(regions, monkeypatch):
+    _, local, _ = regions
+    monkeypatch.setattr(replication, "region_router", RegionRouter())
+
+    replication.publish_change("AAAAAA", "http://a")
+
+    assert local.exists(replication.STREAM_KEY) == 0
+
+
+@pytest.mark.asyncio
+async def test_lookup_owner_region_reads_peer_cache_for_remote_tokens(regions):
+    _, _, peer = regions
+    peer.set("CAAAAA", "http://remote")
+    peer.set("AAAAAA", "http://not-ours")
+
+    assert await replication.lookup_owner_region("CAAAAA") == "http://remote"
+    assert await replication.lookup_owner_region("AAAAAA") is None
+    assert await replication.lookup_owner_region("DAAAAA") is None
+
+
+@pytest.mark.asyncio
+async def test_lookup_owner_region_remembers_misses(regions, monkeypatch):
+    _, _, peer = regions
+    calls = []
+    monkeypatch.setattr(peer, "get", lambda token: calls.append(token))
+
+    assert await replication.lookup_owner_region("CAAAAA") is None
+    assert await replication.lookup_owner_region("CAAAAA") is None
+    assert calls == ["CAAAAA"]
+    assert peer in replication._peer_caches
+
+
+@pytest.mark.asyncio
+async def test_replicator_applies_peer_changes_and_resumes_from_offset(
+    regions, make_db_session, make_session_factory, monkeypatch
+):
+    router, local, peer = regions
+    db_client = make_db_session(commit_side_effects=[None, None])
+    monkeypatch.setattr(
+        replication, "AsyncSessionLocal", make_session_factory(db_client)
+    )
+    local.set("DBBBBB", "http://stale")
+    replication.local_cache.set("DBBBBB", "http://stale")
+    peer.xadd(replication.STREAM_KEY, {"token": "CAAAAA", "url": "http://c"})
+    peer.xadd(replication.STREAM_KEY, {"token": "DBBBBB"})
+    replicator = replication.Replicator(router, local, batch_size=10)
+
+    assert await replicator.poll("us") == 2
+    assert [entry.id for entry in db_client.added] == ["CAAAAA"]
+    assert len(db_client.exec_args) == 1
+    assert db_client.commits == 1
+    assert local.get("CAAAAA") == "http://c"
+    assert local.get("DBBBBB") is None
+    assert replication.local_cache.get("DBBBBB") is None
+
+    assert await replicator.poll("us") == 0
+
+    peer.xadd(replication.STREAM_KEY, {"token": "CCCCCC", "url": "http://cc"})
+    assert await replicator.poll("us") == 1
+
+
+@pytest.mark.asyncio
+async def test_replicator_skips_peer_while_another_worker_holds_the_lease(regions):
+    router, local, peer = regions
+    peer.xadd(replication.STREAM_KEY, {"token": "CAAAAA", "url": "http://c"})
+    local.set(replication.LEASE_KEY.format(region="us"), "other-worker")
+
+    assert await replication.Replicator(router, local).poll("us") == 0
@@ -1,9 +1,22 @@
+import asyncio
+import time
+
+import fakeredis
 import pytest
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import IntegrityError
 import app.generator.service as service
+from app.core.compression import UrlCompressor
+from app.core.regions import RegionRouter
+from app.core.storage import SqliteUrlStore
+from app.generator.models import UrlShorted
+from app.generator.exeception import AliasUnavailable
+from app.generator.queries import INSERT_URL, SELECT_URL
+from app.generator.tokens import ReservedNames, TokenLength
 from app.generator.service import (
     generate_url_token,
     retrieve_url,
+    resolve_link,
     delete_url_token,
 )
 
@@ -145,6 +158,95 @@ async def test_retrieve_url_when_token_not_in_cache_and_db_returns_none(
     assert cache_client.get(token) is None
 
 
+@pytest.mark.asyncio
+async def test_generate_and_retrieve_url_with_compression_enabled(
+    make_redis_client, make_db_session, monkeypatch
+):
+    cache_client = make_redis_client()
+    db_client = make_db_session()
+    compressor = UrlCompressor(min_length=32)
+    monkeypatch.setattr(service, "url_compressor", compressor)
+    monkeypatch.setattr(service.secrets, "choice", lambda _: "c")
+
+    original_url = "https://orig.com/path?utm_source=google&utm_medium=cpc&ref=abc"
+    token = "CCCCCC"
+
+    await generate_url_token(original_url, db_client)
+    stored_url = db_client.added[0].url
+
+    assert stored_url == compressor.compress(original_url)
+    assert stored_url != original_url
+    assert cache_client.get(token) == stored_url
+    assert await retrieve_url(token, db_client) == original_url
+
+    cache_client.delete(token)
+    db_client._return_value = stored_url
+
+    assert await retrieve_url(token, db_client) == original_url
+    assert cache_client.get(token) == stored_url
+
+
+@pytest.mark.asyncio
+async def test_retrieve_url_on_cache_miss_while_overloaded_raises_service_overloaded(
+    make_redis_client, make_db_session, monkeypatch
+):
+    cache_client = make_redis_client()
+    db_client = make_db_session(return_value="http://db-url")
+    cache_client.set("HITHIT", "http://cache-url", ex=60)
+    monkeypatch.setattr(service, "is_overloaded", lambda: True)
+
+    assert await retrieve_url("HITHIT", db_client) == "http://cache-url"
+
+    with pytest.raises(service.ServiceOverloaded):
+        await retrieve_url("MISSED", db_client)
+
+    assert db_client.exec_args == []
+
+
+@pytest.mark.asyncio
+async def test_retrieve_url_when_redis_circuit_is_open_serves_from_db(
+    make_redis_client, make_db_session, monkeypatch
+):
+    cache_client = make_redis_client()
+    db_client = make_db_session(return_value="http://db-url")
+    cache_client.set("ABC123", "http://stale-cache-url", ex=60)
+    monkeypatch.setattr(service.redis_breaker, "allow", lambda: False)
+
+    assert await retrieve_url("ABC123", db_client) == "http://db-url"
+    assert len(db_client.exec_args) == 1
+    assert cache_client.get("ABC123") == "http://stale-cache-url"
+
+
+@pytest.mark.asyncio
+async def test_retrieve_url_when_db_circuit_is_open_raises_backend_unavailable(
+    make_redis_client, make_db_session, monkeypatch
+):
+    make_redis_client()
+    db_client = make_db_session(return_value="http://db-url")
+    monkeypatch.setattr(service.db_breaker, "allow", lambda: False)
+
+    with pytest.raises(service.BackendUnavailable):
+        await retrieve_url("ABC123", db_client)
+
+    assert db_client.exec_args == []
+
+
+@pytest.mark.asyncio
+async def test_generate_url_token_when_redis_circuit_is_open_skips_cache_write(
+    make_redis_client, make_db_session, monkeypatch
+):
+    cache_client = make_redis_client()
+    db_client = make_db_session()
+    monkeypatch.setattr(service.secrets, "choice", lambda _: "a")
+    monkeypatch.setattr(service.redis_breaker, "allow", lambda: False)
+
+    short_url = await generate_url_token("http://orig.com", db_client)
+
+    assert short_url == "http://short/AAAAAA"
+    assert db_client.commits == 1
+    assert cache_client.get("AAAAAA") is None
+
+
 @pytest.mark.asyncio
 async def test_delete_url_token(make_redis_client, make_db_session):
     cache_client = make_redis_client()
@@ -160,3 +262,282 @@ async def test_delete_url_token(make_redis_client, make_db_session):
     assert cache_client.get(token) is None
     assert len(db_client.exec_args) == expected_execute_calls
     assert db_client.commits == 1
+
+
+@pytest.mark.asyncio
+async def test_generate_url_token_uses_region_prefix(
+    make_redis_client, make_db_session, monkeypatch
+):
+    make_redis_client()
+    db_client = make_db_session()
+    monkeypatch.setattr(
+        service, "region_router", RegionRouter("sa", {"sa": "Z", "us": "Y"})
+    )
+    monkeypatch.setattr(service, "publish_change", lambda *args: None)
+    monkeypatch.setattr(service.secrets, "choice", lambda chars: chars[0])
+
+    short_url = await generate_url_token("http://orig.com", db_client)
+
+    assert short_url == "http://short/ZAAAAA"
+
+
+@pytest.mark.asyncio
+async def test_generate_url_token_stores_the_alias(make_redis_client, make_db_session):
+    cache_client = make_redis_client()
+    db_client = make_db_session()
+
+    short_url = await generate_url_token("http://orig.com", db_client, alias="promo")
+
+    assert short_url == "http://short/promo"
+    assert cache_client.get("promo") == "http://orig.com"
+
+
+@pytest.mark.asyncio
+async def test_generate_url_token_with_taken_alias_raises_alias_unavailable(
+    make_redis_client, make_db_session
+):
+    make_redis_client()
+    db_client = make_db_session()
+    db_client._commit_side_effects = [IntegrityError(None, None, None)]
+
+    with pytest.raises(AliasUnavailable):
+        await generate_url_token("http://orig.com", db_client, alias="promo")
+
+    assert db_client.commits == 1
+    assert db_client.rollbacks == 1
+
+
+@pytest.mark.asyncio
+async def test_generate_url_token_rejects_alias_of_another_region(
+    make_redis_client, make_db_session, monkeypatch
+):
+    make_redis_client()
+    db_client = make_db_session()
+    monkeypatch.setattr(
+        service, "region_router", RegionRouter("sa", {"sa": "Z", "us": "Y"})
+    )
+
+    with pytest.raises(AliasUnavailable):
+        await generate_url_token("http://orig.com", db_client, alias="Ypromo")
+
+    assert db_client.added == []
+
+
+@pytest.mark.asyncio
+async def test_generate_url_token_redraws_reserved_tokens(
+    make_redis_client, make_db_session, monkeypatch
+):
+    make_redis_client()
+    db_client = make_db_session()
+    seq = ["a"] * 6 + ["b"] * 6
+    monkeypatch.setattr(service.secrets, "choice", lambda _: seq.pop(0))
+    monkeypatch.setattr(service, "reserved_names", ReservedNames(["aaaaaa"], []))
+
+    short_url = await generate_url_token("http://orig.com", db_client)
+
+    assert short_url == "http://short/BBBBBB"
+    assert len(db_client.added) == 1
+
+
+@pytest.mark.asyncio
+async def test_generate_url_token_grows_the_token_after_collisions(
+    make_redis_client, make_db_session, monkeypatch
+):
+    make_redis_client()
+    db_client = make_db_session()
+    length = TokenLength(
+        length=6,
+        max_length=7,
+        max_collision_rate=0.4,
+        window=2,
+        client=fakeredis.FakeRedis(),
+    )
+    monkeypatch.setattr(service, "token_length", length)
+    monkeypatch.setattr(service.secrets, "choice", lambda _: "a")
+    db_client._commit_side_effects = [IntegrityError(None, None, None), None, None]
+
+    assert await generate_url_token("http://a.com", db_client) == "http://short/AAAAAA"
+    assert length.current == 7
+    assert await generate_url_token("http://b.com", db_client) == "http://short/AAAAAAA"
+
+
+@pytest.mark.asyncio
+async def test_retrieve_url_falls_back_to_owner_region_on_miss(
+    make_redis_client, make_db_session, monkeypatch
+):
+    cache_client = make_redis_client()
+    db_client = make_db_session(return_value=None)
+
+    async def lookup(token):
+        return "http://remote" if token == "YAAAAA" else None
+
+    monkeypatch.setattr(service, "lookup_owner_region", lookup)
+
+    assert await retrieve_url("YAAAAA", db_client) == "http://remote"
+    assert cache_client.get("YAAAAA") == "http://remote"
+    assert await retrieve_url("ZAAAAA", db_client) is None
+
+
+@pytest.mark.asyncio
+async def test_retrieve_url_reads_embedded_store_instead_of_db(
+    make_redis_client, make_db_session, monkeypatch, tmp_path
+):
+    cache_client = make_redis_client()
+    db_client = make_db_session(return_value="http://db-url")
+    store = SqliteUrlStore(str(tmp_path / "urls.sqlite3"))
+    store.load([("ABC123", "http://edge")], "0-0")
+    monkeypatch.setattr(service, "url_store", store)
+
+    assert await retrieve_url("ABC123", db_client) == "http://edge"
+    assert db_client.exec_args == []
+    assert cache_client.get("ABC123") == "http://edge"
+
+    with pytest.raises(service.BackendUnavailable):
+        await generate_url_token("http://orig.com", db_client)
+    with pytest.raises(service.BackendUnavailable):
+        await delete_url_token("ABC123", db_client)
+    assert db_client.commits == 0
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_generate_and_resolve_link_with_redirect_policy(
+    make_redis_client, make_db_session, monkeypatch
+):
+    cache_client = make_redis_client()
+    db_client = make_db_session()
+    monkeypatch.setattr(service.secrets, "choice", lambda _: "p")
+    expires_at = int(time.time()) + 30
+
+    await generate_url_token(
+        "http://orig.com", db_client, redirect_code=301, expires_at=expires_at
+    )
+    stored_url = db_client.added[0].url
+
+    assert stored_url == f"~l301;{expires_at};http://orig.com"
+    assert 0 < cache_client.ttl("PPPPPP") <= 30
+
+    link = await resolve_link("PPPPPP", db_client)
+
+    assert (link.url, link.redirect_code, link.expires_at) == (
+        "http://orig.com",
+        301,
+        expires_at,
+    )
+    assert link.etag
+
+
+@pytest.mark.asyncio
+async def test_retrieve_url_returns_none_for_expired_links(
+    make_redis_client, make_db_session
+):
+    cache_client = make_redis_client()
+    cache_client.set("OLDOLD", f"~l;{int(time.time()) - 1};http://old", ex=60)
+
+    assert await retrieve_url("OLDOLD", make_db_session()) is None
+
+
+@pytest.mark.asyncio
+async def test_retrieve_url_batches_concurrent_misses(
+    make_redis_client, make_db_session, monkeypatch
+):
+    cache_client = make_redis_client()
+    cache_client.set("CACHED", "http://cached")
+    db_client = make_db_session()
+    batches = []
+
+    async def lookup_many(tokens):
+        batches.append(sorted(tokens))
+        return {"AAAAAA": "http://a", "BBBBBB": "http://b"}
+
+    monkeypatch.setattr(service, "LOOKUP_BATCH_ENABLED", True)
+    monkeypatch.setattr(service.lookup_batcher, "load_many", lookup_many)
+
+    results = await asyncio.gather(
+        *(
+            retrieve_url(token, db_client)
+            for token in ("AAAAAA", "BBBBBB", "AAAAAA", "CACHED", "ZZZZZZ")
+        )
+    )
+
+    assert results == ["http://a", "http://b", "http://a", "http://cached", None]
+    assert batches == [["AAAAAA", "BBBBBB", "ZZZZZZ"]]
+    assert db_client.exec_args == []
+    assert cache_client.get("BBBBBB") == "http://b"
+
+
+def test_tokens_in_uses_a_single_array_parameter_on_postgresql(monkeypatch):
+    monkeypatch.setattr(service.engine.dialect, "name", "postgresql")
+    stmt = service.select(UrlShorted.id).where(service._tokens_in(["A", "B"]))
+
+    sql = str(stmt.compile(dialect=postgresql.asyncpg.dialect()))
+
+    assert "url_shortened.id = ANY ($1::VARCHAR[])" in sql
+
+
+@pytest.mark.asyncio
+async def test_resolve_links_reads_cache_then_database_in_chunks(
+    make_redis_client, make_db_session, monkeypatch
+):
+    cache_client = make_redis_client()
+    cache_client.set("CACHED", "http://cached")
+    db_client = make_db_session(return_value=[("AAAAAA", "http://a")])
+    monkeypatch.setattr(service, "BATCH_CHUNK_SIZE", 2)
+
+    links = await service.resolve_links(["CACHED", "AAAAAA", "ZZZZZZ"], db_client)
+
+    assert {token: link.url for token, link in links.items()} == {
+        "CACHED": "http://cached",
+        "AAAAAA": "http://a",
+    }
+    assert len(db_client.exec_args) == 2
+    assert cache_client.get("AAAAAA") == "http://a"
+
+
+@pytest.mark.asyncio
+async def test_delete_url_tokens_deletes_each_chunk_with_one_statement(
+    make_redis_client, make_db_session, monkeypatch
+):
+    cache_client = make_redis_client()
+    cache_client.set("AAAAAA", "http://a")
+    cache_client.set("BBBBBB", "http://b")
+    db_client = make_db_session(
+        commit_side_effects=[None, None], return_value=[("AAAAAA",)]
+    )
+    monkeypatch.setattr(service, "BATCH_CHUNK_SIZE", 2)
+
+    deleted = await service.delete_url_tokens(
+        ["AAAAAA", "BBBBBB", "CCCCCC"], db_client
+    )
+
+    assert deleted == {"AAAAAA": True, "BBBBBB": False, "CCCCCC": False}
+    assert len(db_client.exec_args) == 2
+    assert db_client.commits == 2
+    assert cache_client.get("AAAAAA") is None
+    assert cache_client.get("BBBBBB") is None
+
+
+@pytest.mark.asyncio
+async def test_lookup_and_insert_reuse_the_prebuilt_statements(
+    make_redis_client, make_db_session, monkeypatch
+):
+    make_redis_client()
+    db_client = make_db_session(commit_side_effects=[None])
+    monkeypatch.setattr(service.secrets, "choice", lambda _: "a")
+
+    await generate_url_token("http://orig.com", db_client)
+    await retrieve_url("ZZZZZZ", db_client)
+
+    assert db_client.exec_args == [INSERT_URL, SELECT_URL]
+
+
+@pytest.mark.asyncio
+async def test_lookup_ends_the_transaction_in_pgbouncer_mode(
+    make_redis_client, make_db_session, monkeypatch
+):
+    make_redis_client()
+    db_client = make_db_session(return_value="http://db-url")
+    monkeypatch.setattr(service, "DB_PGBOUNCER_MODE", True)
+
+    assert await retrieve_url("AAAAAA", db_client) == "http://db-url"
+    assert db_client.rollbacks == 1
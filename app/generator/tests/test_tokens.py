@@ -0,0 +1,69 @@
+import logging
+
+import fakeredis
+
+from app.generator.tokens import ReservedNames, TokenLength, load_reserved_names
+
+
+def test_reserved_names_match_exact_names_and_blocked_words():
+    names = ReservedNames()
+
+    assert "metrics" in names
+    assert "HEALTHZ" in names
+    assert "metricsX" not in names
+    assert "XXSHITXX" in names
+    assert "sh1t99" in names
+    assert "F0CKED" not in names
+    assert "promo2024" not in names
+
+
+def test_load_reserved_names_adds_the_words_of_the_file(tmp_path):
+    path = tmp_path / "words.txt"
+    path.write_text("# local words\nbanana\n\n  kiwi  # fruit\n")
+
+    names = load_reserved_names(str(path))
+
+    assert "XBANANAX" in names
+    assert "kiwi" in names
+    assert "fuck" in names
+    assert "apple" not in names
+    assert "banana" not in load_reserved_names(None)
+
+
+def test_token_length_grows_when_collisions_are_frequent(caplog):
+    length = TokenLength(
+        length=6,
+        max_length=7,
+        max_collision_rate=0.25,
+        window=4,
+        client=fakeredis.FakeRedis(),
+    )
+
+    for collided in (True, False, False, False):
+        length.record(collided)
+    assert length.current == 6
+
+    with caplog.at_level(logging.WARNING):
+        for collided in (True, True, False, False):
+            length.record(collided)
+    assert length.current == 7
+    assert "new tokens have 7 characters" in caplog.text
+
+    for _ in range(4):
+        length.record(True)
+    assert length.current == 7
+
+
+def test_token_length_is_shared_through_redis():
+    client = fakeredis.FakeRedis()
+    grown = TokenLength(length=6, max_collision_rate=0, window=1, client=client)
+    other = TokenLength(length=6, client=client, sync_interval=60)
+
+    assert other.current == 6
+    grown.record(collided=True)
+
+    assert grown.current == 7
+    assert other.current == 6
+    other.sync()
+    assert other.current == 7
+    assert TokenLength(length=6, client=client).current == 7
@@ -1,6 +1,6 @@
 import pytest
 
-from app.generator.utils import validate_url_scheme, is_safe_url_path
+from app.generator.utils import validate_url_scheme, is_safe_url_path, is_valid_alias
 
 
 @pytest.mark.parametrize(
@@ -78,8 +78,11 @@ def test_validate_url_scheme_with_malicious_patterns_raises_value_error(url):
         ("abc123", True),
         ("ABCdef", True),
         ("a1B2c3", True),
-        ("abc12", False),
-        ("abcdefg", False),
+        ("abc12", True),
+        ("abcdefg", True),
+        ("abc", False),
+        ("a" * 33, False),
+        ("abcdéf", False),
         ("ab_cd1", False),
         ("abc$12", False),
         ("a bC12", False),
@@ -87,3 +90,21 @@ def test_validate_url_scheme_with_malicious_patterns_raises_value_error(url):
 )
 def test_is_safe_url_path(path, expected):
     assert is_safe_url_path(path) == expected
+
+
+@pytest.mark.parametrize(
+    "alias, expected",
+    [
+        ("promo2024", True),
+        ("BlackFriday", True),
+        ("abc", False),
+        ("a" * 33, False),
+        ("promo-2024", False),
+        ("promoção", False),
+        ("metrics", False),
+        ("Healthz", False),
+        ("sh1tdeal", False),
+    ],
+)
+def test_is_valid_alias(alias, expected):
+    assert is_valid_alias(alias) == expected
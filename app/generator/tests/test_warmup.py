@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import fakeredis
+import pytest
+
+import app.generator.warmup as warmup
+from app.core.cache import KeyCache, LocalCache
+from app.generator.links import pack_link
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(warmup, "redis_client", fake)
+    monkeypatch.setattr(warmup, "url_cache", KeyCache(fake))
+    monkeypatch.setattr(warmup, "local_cache", LocalCache(100, 60))
+    monkeypatch.setattr(warmup, "warmup_state", warmup.WarmupState())
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_warm_up_cache_loads_hottest_tokens_from_cache_and_db(
+    fake_redis, make_db_session, make_session_factory, monkeypatch
+):
+    fake_redis.zadd(warmup.HOTSET_KEY, {"AAAAAA": 10, "BBBBBB": 5, "CCCCCC": 1})
+    fake_redis.set("AAAAAA", "http://a")
+    db_client = make_db_session(return_value=[("BBBBBB", "http://b")])
+    monkeypatch.setattr(warmup, "AsyncSessionLocal", make_session_factory(db_client))
+
+    warmed = await warmup.warm_up_cache(limit=2, batch_size=10, time_budget=1)
+
+    assert warmed == 2
+    assert len(db_client.exec_args) == 1
+    assert fake_redis.get("BBBBBB") == "http://b"
+    assert warmup.local_cache.get("AAAAAA").url == "http://a"
+    assert warmup.local_cache.get("BBBBBB").url == "http://b"
+    assert warmup.local_cache.get("CCCCCC") is None
+    assert warmup.warmup_state.finished
+
+
+@pytest.mark.asyncio
+async def test_warm_up_cache_leaves_expiring_links_out_of_redis(
+    fake_redis, make_db_session, make_session_factory, monkeypatch
+):
+    expiring = pack_link("http://b", expires_at=int(time.time()) + 5)
+    fake_redis.zadd(warmup.HOTSET_KEY, {"AAAAAA": 10, "BBBBBB": 5})
+    db_client = make_db_session(
+        return_value=[("AAAAAA", "http://a"), ("BBBBBB", expiring)]
+    )
+    monkeypatch.setattr(warmup, "AsyncSessionLocal", make_session_factory(db_client))
+
+    warmed = await warmup.warm_up_cache(limit=2, batch_size=10, time_budget=1)
+
+    assert warmed == 2
+    assert fake_redis.get("AAAAAA") == "http://a"
+    assert fake_redis.get("BBBBBB") is None
+    assert warmup.local_cache.get("BBBBBB").expires_at is not None
+
+
+@pytest.mark.asyncio
+async def test_warm_up_cache_stops_when_time_budget_is_exceeded(
+    fake_redis, monkeypatch
+):
+    fake_redis.zadd(warmup.HOTSET_KEY, {"AAAAAA": 10})
+
+    async def slow_batch(tokens):
+        await asyncio.sleep(1)
+        return len(tokens)
+
+    monkeypatch.setattr(warmup, "_warm_batch", slow_batch)
+
+    warmed = await warmup.warm_up_cache(limit=10, batch_size=10, time_budget=0.01)
+
+    assert warmed == 0
+    assert warmup.warmup_state.finished
+
+
+def test_load_hot_tokens_falls_back_to_snapshot(fake_redis, monkeypatch, tmp_path):
+    snapshot = tmp_path / "hotset.txt"
+    monkeypatch.setattr(warmup, "HOTSET_SNAPSHOT_PATH", str(snapshot))
+    fake_redis.zadd(warmup.HOTSET_KEY, {"AAAAAA": 3, "BBBBBB": 2, "CCCCCC": 1})
+
+    warmup.save_hot_tokens(limit=2)
+    fake_redis.delete(warmup.HOTSET_KEY)
+
+    assert snapshot.read_text() == "AAAAAA\nBBBBBB"
+    assert [path.name for path in tmp_path.iterdir()] == ["hotset.txt"]
+    assert warmup.load_hot_tokens(limit=1) == ["AAAAAA"]
+
+
+def test_record_hit_increments_hot_set_when_sampled(fake_redis, monkeypatch):
+    monkeypatch.setattr(warmup, "HOTSET_SAMPLE_RATE", 1)
+
+    warmup.record_hit("AAAAAA")
+    warmup.record_hit("AAAAAA")
+
+    assert fake_redis.zscore(warmup.HOTSET_KEY, "AAAAAA") == 2
+
+
+def test_record_hit_trims_hot_set_periodically(fake_redis, monkeypatch):
+    monkeypatch.setattr(warmup, "HOTSET_SAMPLE_RATE", 1)
+    monkeypatch.setattr(warmup, "HOTSET_MAX_SIZE", 2)
+    monkeypatch.setattr(warmup, "HOTSET_TRIM_EVERY", 4)
+    monkeypatch.setattr(warmup, "_recorded_hits", 0)
+
+    for token in ("AAAAAA", "AAAAAA", "BBBBBB", "CCCCCC"):
+        warmup.record_hit(token)
+
+    assert fake_redis.zrange(warmup.HOTSET_KEY, 0, -1) == ["CCCCCC", "AAAAAA"]
@@ -0,0 +1,197 @@
+import logging
+import time
+
+import redis
+from prometheus_client import Gauge
+
+from app.core.cache import redis_client
+from app.core.circuit import redis_breaker
+from app.settings import (
+    RESERVED_NAMES_PATH,
+    TOKEN_GROW_COLLISION_RATE,
+    TOKEN_GROW_WINDOW,
+    TOKEN_LENGTH,
+    TOKEN_LENGTH_SYNC_INTERVAL,
+    TOKEN_MAX_LENGTH,
+)
+
+# Sorted set holding the grown length as the score of member "length", so
+# workers raise it with ZADD GT and it never goes back down
+LENGTH_KEY = "tokens:length"
+
+logger = logging.getLogger(__name__)
+
+token_length_gauge = Gauge("token_length", "Characters of new random tokens")
+
+# Paths served by other routes, which GET /{url_id} never sees, and names
+# that would pass for one of the service's own pages
+RESERVED_NAMES = (
+    "admin",
+    "api",
+    "delete",
+    "docs",
+    "favicon",
+    "health",
+    "healthz",
+    "login",
+    "metrics",
+    "openapi",
+    "readyz",
+    "redoc",
+    "resolve",
+    "static",
+    "statics",
+    "stats",
+)
+
+# Matched anywhere in a name, after undoing digit-for-letter spellings, so
+# only words unlikely inside innocent ones
+BLOCKED_WORDS = (
+    "bitch",
+    "bosta",
+    "buceta",
+    "caralho",
+    "cunt",
+    "cuzao",
+    "fuck",
+    "merda",
+    "nazi",
+    "porra",
+    "shit",
+    "slut",
+    "whore",
+)
+
+_LEET = str.maketrans("013457", "oieast")
+
+
+class ReservedNames:
+    """
+    Names that may not be used as tokens: exact reserved names, and names
+    containing a blocked word.
+
+    Both are hash sets of casefolded strings, so a name of n characters
+    costs one lookup plus n lookups per distinct blocked word length, with
+    no regex or scan over the word list; names are at most ALIAS_MAX_LENGTH
+    characters long, which bounds the check.
+
+    Args:
+        names (Iterable[str]): Exact reserved names.
+        words (Iterable[str]): Words blocked anywhere in a name.
+    """
+
+    def __init__(self, names=RESERVED_NAMES, words=BLOCKED_WORDS):
+        self.names = frozenset(name.casefold() for name in names)
+        self.words = frozenset(word.casefold() for word in words)
+        self.lengths = sorted({len(word) for word in self.words})
+
+    def __contains__(self, name: str) -> bool:
+        folded = name.casefold()
+        if folded in self.names:
+            return True
+        folded = folded.translate(_LEET)
+        words = self.words
+        for length in self.lengths:
+            for start in range(len(folded) - length + 1):
+                if folded[start : start + length] in words:
+                    return True
+        return False
+
+
+def load_reserved_names(path: str | None = RESERVED_NAMES_PATH) -> ReservedNames:
+    """
+    The built-in reserved names and blocked words, plus the words of `path`
+    (one per line, `#` comments), blocked anywhere in a name.
+    """
+    words = list(BLOCKED_WORDS)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                word = line.split("#", 1)[0].strip()
+                if word:
+                    words.append(word)
+    return ReservedNames(RESERVED_NAMES, words)
+
+
+class TokenLength:
+    """
+    Length of new random tokens, grown by one character (up to
+    `max_length`) when more than `max_collision_rate` of the last `window`
+    allocations hit a taken token, so the keyspace grows with the table
+    instead of inserts retrying more and more.
+
+    Each worker measures its own allocations, but the length is shared: a
+    worker growing it stores it in Redis (LENGTH_KEY), and every worker
+    adopts the stored length on its first token and then at least every
+    `sync_interval` seconds, so restarts and deploys keep it. While Redis
+    is unavailable the worker keeps the length it has.
+
+    Args:
+        length (int): Initial token length.
+        max_length (int): Length it never grows past.
+        max_collision_rate (float): Collisions per allocation that grow it.
+        window (int): Allocations per measurement.
+        client (redis.Redis): Redis holding the shared length.
+        sync_interval (float): Seconds between reads of the shared length.
+    """
+
+    def __init__(
+        self,
+        length: int = TOKEN_LENGTH,
+        max_length: int = TOKEN_MAX_LENGTH,
+        max_collision_rate: float = TOKEN_GROW_COLLISION_RATE,
+        window: int = TOKEN_GROW_WINDOW,
+        client: redis.Redis = redis_client,
+        sync_interval: float = TOKEN_LENGTH_SYNC_INTERVAL,
+    ):
+        self.length = length
+        self.max_length = max_length
+        self.max_collision_rate = max_collision_rate
+        self.window = window
+        self.client = client
+        self.sync_interval = sync_interval
+        self.attempts = 0
+        self.collisions = 0
+        self._next_sync = 0.0
+        token_length_gauge.set(length)
+
+    @property
+    def current(self) -> int:
+        if time.monotonic() >= self._next_sync:
+            self.sync()
+        return self.length
+
+    def sync(self) -> None:
+        """
+        Adopts the shared length when another worker grew it.
+        """
+        self._next_sync = time.monotonic() + self.sync_interval
+        stored = redis_breaker.guard(self.client.zscore, LENGTH_KEY, "length")
+        if stored is not None and int(stored) > self.length:
+            self.length = min(int(stored), self.max_length)
+            token_length_gauge.set(self.length)
+
+    def record(self, collided: bool) -> None:
+        self.attempts += 1
+        self.collisions += collided
+        if self.attempts < self.window:
+            return
+        rate = self.collisions / self.attempts
+        self.attempts = self.collisions = 0
+        if rate > self.max_collision_rate and self.current < self.max_length:
+            self.length += 1
+            token_length_gauge.set(self.length)
+            redis_breaker.guard(
+                self.client.zadd, LENGTH_KEY, {"length": self.length}, gt=True
+            )
+            logger.warning(
+                "%.1f%% of the last %d token allocations collided, "
+                "new tokens have %d characters",
+                rate * 100,
+                self.window,
+                self.length,
+            )
+
+
+reserved_names = load_reserved_names()
+token_length = TokenLength()
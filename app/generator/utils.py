@@ -1,6 +1,19 @@
 import re
 from urllib.parse import urlparse, unquote
 
+from app.generator.tokens import reserved_names
+from app.settings import (
+    ALIAS_MAX_LENGTH,
+    ALIAS_MIN_LENGTH,
+    TOKEN_LENGTH,
+    TOKEN_MAX_LENGTH,
+)
+
+# Every random token and alias, including tokens created before the length
+# settings last changed
+MIN_TOKEN_LENGTH = min(6, TOKEN_LENGTH, ALIAS_MIN_LENGTH)
+MAX_TOKEN_LENGTH = max(6, TOKEN_MAX_LENGTH, ALIAS_MAX_LENGTH)
+
 
 def validate_url_scheme(url: str) -> str:
     """
@@ -47,8 +60,11 @@ def is_safe_url_path(path: str) -> bool:
     Validates if the provided URL token is safe.
 
     A safe token must:
-    - Have exactly 6 characters
-    - Contain only alphanumeric characters (a-z, A-Z, 0-9)
+    - Have between MIN_TOKEN_LENGTH and MAX_TOKEN_LENGTH characters
+    - Contain only ASCII alphanumeric characters (a-z, A-Z, 0-9)
+
+    The length is checked first, so the cost is bounded by MAX_TOKEN_LENGTH
+    whatever the path: this runs on every redirect.
 
     Args:
         path (str): The token extracted from the URL path.
@@ -56,4 +72,31 @@ def is_safe_url_path(path: str) -> bool:
     Returns:
         bool: True if the token is safe, False otherwise.
     """
-    return len(path) == 6 and path.isalnum()
+    return (
+        MIN_TOKEN_LENGTH <= len(path) <= MAX_TOKEN_LENGTH
+        and path.isascii()
+        and path.isalnum()
+    )
+
+
+def is_valid_alias(alias: str) -> bool:
+    """
+    Validates a custom alias requested for a new link.
+
+    A valid alias must:
+    - Have between ALIAS_MIN_LENGTH and ALIAS_MAX_LENGTH characters
+    - Contain only ASCII alphanumeric characters (a-z, A-Z, 0-9)
+    - Not be a reserved name nor contain a blocked word (`reserved_names`)
+
+    Args:
+        alias (str): The requested alias.
+
+    Returns:
+        bool: True if the alias may be used, False otherwise.
+    """
+    return (
+        ALIAS_MIN_LENGTH <= len(alias) <= ALIAS_MAX_LENGTH
+        and alias.isascii()
+        and alias.isalnum()
+        and alias not in reserved_names
+    )
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import os
+import random
+import time
+
+import redis
+from sqlalchemy.future import select
+
+from app.core.cache import local_cache, redis_client, url_cache
+from app.core.compression import url_compressor
+from app.core.database import AsyncSessionLocal
+from app.core.storage import url_store
+from app.generator.links import decode_link, unpack_link
+from app.generator.models import UrlShorted
+from app.settings import (
+    CACHE_DEFAULT_TIMEOUT,
+    HOTSET_MAX_SIZE,
+    HOTSET_SAMPLE_RATE,
+    HOTSET_SNAPSHOT_PATH,
+    WARMUP_BATCH_SIZE,
+    WARMUP_TIME_BUDGET,
+    WARMUP_TOP_N,
+)
+
+HOTSET_KEY = "hotset:tokens"
+# Recorded hits of a worker between trims of the hot set to HOTSET_MAX_SIZE
+HOTSET_TRIM_EVERY = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupState:
+    """
+    Outcome of the startup warm-up for this worker.
+    """
+
+    def __init__(self):
+        self.finished = False
+        self.warmed = 0
+        self.duration = 0.0
+
+
+warmup_state = WarmupState()
+_recorded_hits = 0
+
+
+def record_hit(token: str) -> None:
+    """
+    Counts a sampled redirect of `token` in the shared hot set.
+
+    Only a fraction (HOTSET_SAMPLE_RATE) of redirects touch Redis, which is
+    enough to rank the hottest tokens without a write per request. Every
+    HOTSET_TRIM_EVERY recorded hits the set is trimmed to HOTSET_MAX_SIZE
+    in the same round trip, so it stays bounded between deploys.
+    """
+    global _recorded_hits
+    if HOTSET_SAMPLE_RATE <= 0 or random.random() >= HOTSET_SAMPLE_RATE:
+        return
+
+    _recorded_hits += 1
+    try:
+        if _recorded_hits % HOTSET_TRIM_EVERY:
+            redis_client.zincrby(HOTSET_KEY, 1, token)
+            return
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zincrby(HOTSET_KEY, 1, token)
+        pipe.zremrangebyrank(HOTSET_KEY, 0, -(HOTSET_MAX_SIZE + 1))
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.debug("Could not record hit for %s: %s", token, e)
+
+
+def load_hot_tokens(limit: int) -> list[str]:
+    """
+    Returns the `limit` most requested tokens, hottest first.
+
+    Reads the Redis hot set and falls back to the snapshot file when Redis
+    has none (e.g. Redis was restarted along with the deploy).
+    """
+    try:
+        tokens = redis_client.zrevrange(HOTSET_KEY, 0, limit - 1)
+    except redis.RedisError as e:
+        logger.warning("Could not read hot set from Redis: %s", e)
+        tokens = []
+
+    if tokens or not HOTSET_SNAPSHOT_PATH or not os.path.exists(HOTSET_SNAPSHOT_PATH):
+        return tokens
+
+    with open(HOTSET_SNAPSHOT_PATH) as f:
+        return [line.strip() for line, _ in zip(f, range(limit)) if line.strip()]
+
+
+def save_hot_tokens(limit: int = WARMUP_TOP_N) -> None:
+    """
+    Persists the current hot set to HOTSET_SNAPSHOT_PATH and trims the Redis
+    sorted set to HOTSET_MAX_SIZE entries.
+    """
+    try:
+        redis_client.zremrangebyrank(HOTSET_KEY, 0, -(HOTSET_MAX_SIZE + 1))
+        tokens = redis_client.zrevrange(HOTSET_KEY, 0, limit - 1)
+    except redis.RedisError as e:
+        logger.warning("Could not snapshot hot set: %s", e)
+        return
+
+    if not HOTSET_SNAPSHOT_PATH or not tokens:
+        return
+
+    # Every worker saves at shutdown: each writes its own file
+    tmp_path = f"{HOTSET_SNAPSHOT_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(tokens))
+    os.replace(tmp_path, HOTSET_SNAPSHOT_PATH)
+
+
+async def _warm_batch(tokens: list[str]) -> int:
+    cached = url_cache.get_many(tokens)
+    found = {token: value for token, value in zip(tokens, cached) if value}
+
+    missing = [token for token in tokens if token not in found]
+    if missing and url_store is not None:
+        found.update(url_store.get_many(missing))
+    elif missing:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(UrlShorted.id, UrlShorted.url).where(UrlShorted.id.in_(missing))
+            )
+            rows = dict(result.all())
+        # Links with an expiry are cached on their next read instead, with a
+        # TTL that does not outlive them
+        lasting = [
+            (token, url) for token, url in rows.items() if unpack_link(url)[2] is None
+        ]
+        url_cache.set_many(lasting, ex=CACHE_DEFAULT_TIMEOUT)
+        found.update(rows)
+
+    for token, value in found.items():
+        local_cache.set(token, decode_link(value, url_compressor))
+
+    return len(found)
+
+
+async def warm_up_cache(
+    limit: int = WARMUP_TOP_N,
+    batch_size: int = WARMUP_BATCH_SIZE,
+    time_budget: float = WARMUP_TIME_BUDGET,
+) -> int:
+    """
+    Preloads the hottest tokens into the Redis and local caches.
+
+    Tokens are processed in batches: one MGET (or pipeline) against Redis,
+    one `WHERE id IN (...)` query for the misses and one pipelined write
+    back. The whole stage is bounded by `time_budget` seconds so a slow
+    backend delays worker readiness by at most that much.
+
+    Returns:
+        int: The number of tokens loaded.
+    """
+    start = time.monotonic()
+
+    async def _run():
+        tokens = load_hot_tokens(limit)
+        for i in range(0, len(tokens), batch_size):
+            warmup_state.warmed += await _warm_batch(tokens[i : i + batch_size])
+
+    try:
+        await asyncio.wait_for(_run(), timeout=time_budget)
+    except asyncio.TimeoutError:
+        logger.warning("Cache warm-up stopped after %.1fs time budget", time_budget)
+    except Exception as e:
+        logger.warning("Cache warm-up failed: %r", e)
+
+    warmup_state.finished = True
+    warmup_state.duration = time.monotonic() - start
+    logger.info(
+        "Cache warm-up loaded %d tokens in %.3fs",
+        warmup_state.warmed,
+        warmup_state.duration,
+    )
+    return warmup_state.warmed
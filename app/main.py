@@ -1,17 +1,36 @@
+import asyncio
 import logging.config
 import os
-import subprocess
 
 from contextlib import asynccontextmanager
+import orjson
 from fastapi.requests import Request
-from fastapi.responses import JSONResponse
-
-from app.generator.routes import url, stats
+from fastapi.responses import ORJSONResponse, Response
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from app.core.database import AsyncSessionLocal
+from app.core.health import health_monitor
+from app.core.migrations import check_schema_revision, run_migrations
+from app.core.startup import startup_timer
+from app.core.storage import url_store
+from app.core.tracing import TracingMiddleware, setup_tracing, shutdown_tracing
+from app.generator.changefeed import change_feed
+from app.generator.edge import edge_sync
+from app.generator.replication import replicator
+from app.generator.routes import admin, health, url, stats
+from app.generator.warmup import save_hot_tokens, warm_up_cache, warmup_state
 from app.generator.schema import ErrorResponse
 from fastapi import HTTPException, FastAPI, APIRouter
 
 from prometheus_fastapi_instrumentator import Instrumentator
 
+from app.settings import (
+    MIGRATE_ON_STARTUP,
+    SCHEMA_CHECK_STRICT,
+    TRACING_ENABLED,
+    WARMUP_ENABLED,
+)
+
 conf_path = os.path.join(os.path.dirname(__file__), "..", "logging.conf")
 logging.config.fileConfig(conf_path, disable_existing_loggers=False)
 
@@ -22,24 +41,75 @@ logger = logging.getLogger("app.main")
 async def lifespan(_app: FastAPI):
     """
     Handles the lifespan of the FastAPI application.
-    Applies Alembic migrations before starting.
+    Verifies the schema revision (migrations run from `python -m
+    app.core.migrations`, or here when MIGRATE_ON_STARTUP is set) and warms
+    up the caches before starting, persists the hot token set on shutdown.
+    Runs the background health probes and the replication from peer
+    regions (or the embedded store sync on edge nodes) and the change feed
+    while the app is up.
+    Tracing, when enabled, starts here so its export thread runs in each
+    worker. Each startup phase is timed (`startup_timer`).
     """
-    subprocess.run(["alembic", "upgrade", "head"])
+    if TRACING_ENABLED:
+        setup_tracing()
+    with startup_timer.phase("schema"):
+        if url_store is not None:
+            logger.info("Serving redirects from embedded storage, PostgreSQL unused")
+        elif MIGRATE_ON_STARTUP:
+            await asyncio.to_thread(run_migrations)
+        else:
+            async with AsyncSessionLocal() as db:
+                schema_ok = await check_schema_revision(db)
+            if not schema_ok and SCHEMA_CHECK_STRICT:
+                raise RuntimeError("Database schema is not at the expected revision")
+
+    with startup_timer.phase("background_tasks"):
+        await health_monitor.start()
+        await replicator.start()
+        await edge_sync.start()
+        await change_feed.start()
+    if WARMUP_ENABLED:
+        with startup_timer.phase("warmup"):
+            await warm_up_cache()
+    else:
+        warmup_state.finished = True
+    logger.info("Worker %d started: %s", os.getpid(), startup_timer.summary())
     yield
+    await change_feed.stop()
+    await edge_sync.stop()
+    await replicator.stop()
+    await health_monitor.stop()
+    save_hot_tokens()
+    shutdown_tracing()
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 root_router = APIRouter()
 instrumentator = Instrumentator().instrument(app).expose(app)
+if TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
+
+INTERNAL_ERROR = orjson.dumps(
+    ErrorResponse(message="Internal server error").model_dump()
+)
+
+
+@app.exception_handler(StarletteHTTPException)
+async def http_exception_handler(request: Request, exc: StarletteHTTPException):
+    headers = getattr(exc, "headers", None)
+    if exc.status_code in {204, 304}:
+        return Response(status_code=exc.status_code, headers=headers)
+    return ORJSONResponse(
+        {"detail": exc.detail}, status_code=exc.status_code, headers=headers
+    )
 
 
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Unhandled exception in {request.url.path}: {repr(exc)}")
-    return JSONResponse(
-        status_code=500, content=ErrorResponse(message="Internal server error").dict()
-    )
+    logger.error("Unhandled exception in %s: %r", request.url.path, exc)
+    return Response(INTERNAL_ERROR, status_code=500, media_type="application/json")
 
 
 @root_router.get("/favicon.ico", include_in_schema=False)
@@ -48,5 +118,7 @@ def favicon():
 
 
 app.include_router(root_router)
+app.include_router(health.router)
+app.include_router(admin.router)
 app.include_router(url.router)
 app.include_router(stats.router)
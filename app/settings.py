@@ -3,6 +3,14 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def getenv_bool(name: str, default: bool = False) -> bool:
+    value = getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
 BASE_URL = getenv("BASE_URL", "http://localhost:8000")
 
 DATABASE_USER = getenv("POSTGRES_USER", "postgres")
@@ -13,12 +21,206 @@ DATABASE_PORT = getenv("POSTGRES_PORT", "5432")
 DATABASE_URL = f"postgresql+asyncpg://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
 SYNC_DATABASE_URL = f"postgresql+psycopg2://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
 
+# Migrations run from `python -m app.core.migrations`; workers only check the
+# revision unless MIGRATE_ON_STARTUP is set (local development)
+MIGRATE_ON_STARTUP = getenv_bool("MIGRATE_ON_STARTUP")
+SCHEMA_CHECK_STRICT = getenv_bool("SCHEMA_CHECK_STRICT")
+DB_QUERY_TIMEOUT = float(getenv("DB_QUERY_TIMEOUT", "1.0"))  # seconds
+
+# Server (`python -m app.core.server`): WEB_CONCURRENCY workers per pod, one
+# per available CPU when 0, forked from a master that imported the app once.
+# "auto" picks uvloop and httptools when installed
+WEB_CONCURRENCY = int(getenv("WEB_CONCURRENCY", "0"))
+SERVER_BIND = getenv("SERVER_BIND", "0.0.0.0:8000")
+SERVER_PRELOAD = getenv_bool("SERVER_PRELOAD", True)
+SERVER_LOOP = getenv("SERVER_LOOP", "auto")
+SERVER_HTTP = getenv("SERVER_HTTP", "auto")
+SERVER_BACKLOG = int(getenv("SERVER_BACKLOG", "2048"))
+SERVER_KEEPALIVE = int(getenv("SERVER_KEEPALIVE", "5"))  # seconds
+SERVER_GRACEFUL_TIMEOUT = int(getenv("SERVER_GRACEFUL_TIMEOUT", "30"))  # seconds
+SERVER_ACCESS_LOG = getenv_bool("SERVER_ACCESS_LOG")
+
+# Connection pool of each worker: DB_POOL_SIZE when set, otherwise a share of
+# DB_CONNECTION_BUDGET (connections every replica may hold together, kept
+# under PostgreSQL's max_connections) across DB_REPLICAS pods of
+# WEB_CONCURRENCY workers; 20 when neither is set
+DB_POOL_SIZE = int(getenv("DB_POOL_SIZE", "0"))
+DB_CONNECTION_BUDGET = int(getenv("DB_CONNECTION_BUDGET", "0"))
+DB_REPLICAS = int(getenv("DB_REPLICAS", "1"))
+DB_MAX_OVERFLOW = int(getenv("DB_MAX_OVERFLOW", "0"))
+DB_POOL_TIMEOUT = float(getenv("DB_POOL_TIMEOUT", "30"))  # seconds
+# Transaction-pooling PgBouncer in front of PostgreSQL: no prepared statement
+# caches, and connections recycled after DB_POOL_RECYCLE seconds
+DB_PGBOUNCER_MODE = getenv_bool("DB_PGBOUNCER_MODE")
+DB_POOL_RECYCLE = int(getenv("DB_POOL_RECYCLE", "-1"))  # seconds, -1 never
+
 
 REDIS_HOST = getenv("REDIS_HOST", "localhost")
 REDIS_PORT = getenv("REDIS_PORT", "6379")
 REDIS_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
+REDIS_SOCKET_TIMEOUT = float(getenv("REDIS_SOCKET_TIMEOUT", "0.1"))  # seconds
+REDIS_CONNECT_TIMEOUT = float(getenv("REDIS_CONNECT_TIMEOUT", "0.5"))  # seconds
 CACHE_DEFAULT_TIMEOUT = 60 * 60 * 24  # 1 day
 
+# "key": one Redis key per token, "hash": tokens grouped in hashes by prefix
+CACHE_LAYOUT = getenv("CACHE_LAYOUT", "key")
+CACHE_HASH_PREFIX_LENGTH = int(getenv("CACHE_HASH_PREFIX_LENGTH", "4"))
+
+# Token cache spread over several Redis nodes (comma separated URLs) with
+# consistent hashing; empty keeps it on REDIS_URL. A node failing
+# CACHE_NODE_EJECT_AFTER calls in a row leaves the ring for a while
+REDIS_NODES = getenv("REDIS_NODES", "")
+CACHE_RING_VNODES = int(getenv("CACHE_RING_VNODES", "160"))
+CACHE_NODE_EJECT_AFTER = int(getenv("CACHE_NODE_EJECT_AFTER", "3"))
+CACHE_NODE_EJECT_SECONDS = float(getenv("CACHE_NODE_EJECT_SECONDS", "10"))
+
+# In-process cache in front of Redis (0 disables it)
+LOCAL_CACHE_MAX_ENTRIES = int(getenv("LOCAL_CACHE_MAX_ENTRIES", "0"))
+LOCAL_CACHE_TIMEOUT = int(getenv("LOCAL_CACHE_TIMEOUT", "60"))
+
+# Cache misses of concurrent requests are resolved together: one Redis MGET
+# and one database query per batch of up to LOOKUP_BATCH_MAX_SIZE tokens
+LOOKUP_BATCH_ENABLED = getenv_bool("LOOKUP_BATCH_ENABLED")
+LOOKUP_BATCH_WINDOW = float(getenv("LOOKUP_BATCH_WINDOW", "0.0005"))  # seconds
+LOOKUP_BATCH_MAX_SIZE = int(getenv("LOOKUP_BATCH_MAX_SIZE", "128"))
+
+# Tokens: random ones have TOKEN_LENGTH characters, one more (up to
+# TOKEN_MAX_LENGTH) each time over TOKEN_GROW_COLLISION_RATE of a worker's
+# last TOKEN_GROW_WINDOW allocations hit a taken token. The grown length is
+# kept in Redis and read by every worker at least every
+# TOKEN_LENGTH_SYNC_INTERVAL seconds, so it survives restarts. Custom aliases have
+# ALIAS_MIN_LENGTH to ALIAS_MAX_LENGTH characters and may not be reserved
+# (route names, offensive words, plus one word per line of RESERVED_NAMES_PATH)
+TOKEN_LENGTH = int(getenv("TOKEN_LENGTH", "6"))
+TOKEN_MAX_LENGTH = int(getenv("TOKEN_MAX_LENGTH", "10"))
+TOKEN_GROW_COLLISION_RATE = float(getenv("TOKEN_GROW_COLLISION_RATE", "0.1"))
+TOKEN_GROW_WINDOW = int(getenv("TOKEN_GROW_WINDOW", "1000"))
+TOKEN_LENGTH_SYNC_INTERVAL = float(getenv("TOKEN_LENGTH_SYNC_INTERVAL", "30"))
+ALIAS_MIN_LENGTH = int(getenv("ALIAS_MIN_LENGTH", "4"))
+ALIAS_MAX_LENGTH = int(getenv("ALIAS_MAX_LENGTH", "32"))
+RESERVED_NAMES_PATH = getenv("RESERVED_NAMES_PATH")
+
+# POST /resolve and POST /delete: tokens per request, and per backend call
+BATCH_MAX_TOKENS = int(getenv("BATCH_MAX_TOKENS", "5000"))
+BATCH_CHUNK_SIZE = int(getenv("BATCH_CHUNK_SIZE", "500"))
+
+# Startup warm-up from the most requested tokens
+HOTSET_SAMPLE_RATE = float(getenv("HOTSET_SAMPLE_RATE", "0.01"))
+HOTSET_MAX_SIZE = int(getenv("HOTSET_MAX_SIZE", "100000"))
+HOTSET_SNAPSHOT_PATH = getenv("HOTSET_SNAPSHOT_PATH")
+WARMUP_ENABLED = getenv_bool("WARMUP_ENABLED", True)
+WARMUP_TOP_N = int(getenv("WARMUP_TOP_N", "10000"))
+WARMUP_BATCH_SIZE = int(getenv("WARMUP_BATCH_SIZE", "500"))
+WARMUP_TIME_BUDGET = float(getenv("WARMUP_TIME_BUDGET", "2.0"))  # seconds
+
+# Long URLs are stored compressed (PostgreSQL and Redis) above this size
+URL_COMPRESSION_ENABLED = getenv_bool("URL_COMPRESSION_ENABLED")
+URL_COMPRESSION_MIN_LENGTH = int(getenv("URL_COMPRESSION_MIN_LENGTH", "128"))
+URL_COMPRESSION_DICTIONARY_PATH = getenv("URL_COMPRESSION_DICTIONARY_PATH")
+
+# Redirects: status code of links created without one (301, 302, 307, 308)
+# and how long browsers and CDNs may cache permanent and temporary ones
+REDIRECT_DEFAULT_CODE = int(getenv("REDIRECT_DEFAULT_CODE", "302"))
+REDIRECT_PERMANENT_MAX_AGE = int(getenv("REDIRECT_PERMANENT_MAX_AGE", "86400"))
+REDIRECT_TEMPORARY_MAX_AGE = int(getenv("REDIRECT_TEMPORARY_MAX_AGE", "0"))
+
 PROMETHEUS_HOST = getenv("PROMETHEUS_HOST", "http://localhost")
 PROMETHEUS_PORT = getenv("PROMETHEUS_PORT", "9090")
 PROMETHEUS_URL = f"{PROMETHEUS_HOST}:{PROMETHEUS_PORT}"
+
+# Health probes (/healthz, /readyz), refreshed in the background
+HEALTH_PROBE_INTERVAL = float(getenv("HEALTH_PROBE_INTERVAL", "1.0"))  # seconds
+HEALTH_PROBE_TIMEOUT = float(getenv("HEALTH_PROBE_TIMEOUT", "0.5"))  # seconds
+HEALTH_LIVENESS_MAX_LOOP_LAG = float(getenv("HEALTH_LIVENESS_MAX_LOOP_LAG", "5.0"))
+HEALTH_READINESS_MAX_LOOP_LAG = float(getenv("HEALTH_READINESS_MAX_LOOP_LAG", "0.5"))
+HEALTH_READINESS_MAX_POOL_SATURATION = float(
+    getenv("HEALTH_READINESS_MAX_POOL_SATURATION", "1.0")
+)
+
+# Per-client rate limits (requests per window) for POST / and DELETE /{url_id};
+# each token of a POST /delete counts as one DELETE
+RATE_LIMIT_ENABLED = getenv_bool("RATE_LIMIT_ENABLED", True)
+RATE_LIMIT_WINDOW = int(getenv("RATE_LIMIT_WINDOW", "60"))  # seconds
+RATE_LIMIT_CREATE = int(getenv("RATE_LIMIT_CREATE", "120"))
+RATE_LIMIT_DELETE = int(getenv("RATE_LIMIT_DELETE", "120"))
+RATE_LIMIT_LOCAL_MAX_KEYS = int(getenv("RATE_LIMIT_LOCAL_MAX_KEYS", "10000"))
+RATE_LIMIT_TRUST_FORWARDED = getenv_bool("RATE_LIMIT_TRUST_FORWARDED")
+# Known API keys (comma separated); callers sending one are limited by key
+# instead of by IP, any other X-API-Key header is ignored
+RATE_LIMIT_API_KEYS = getenv("RATE_LIMIT_API_KEYS", "")
+
+# Load shedding: reject database-bound work with 503 above these limits
+# (average pool checkout wait, checkouts queued for a connection right now)
+SHEDDING_ENABLED = getenv_bool("SHEDDING_ENABLED", True)
+SHED_MAX_POOL_WAIT = float(getenv("SHED_MAX_POOL_WAIT", "0.1"))  # seconds
+SHED_MAX_POOL_WAITERS = int(getenv("SHED_MAX_POOL_WAITERS", "50"))
+SHED_MAX_LOOP_LAG = float(getenv("SHED_MAX_LOOP_LAG", "0.2"))  # seconds
+
+# Circuit breakers around PostgreSQL and Redis
+BREAKER_FAILURE_THRESHOLD = int(getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(getenv("BREAKER_RESET_TIMEOUT", "5.0"))  # seconds
+BREAKER_HALF_OPEN_CALLS = int(getenv("BREAKER_HALF_OPEN_CALLS", "1"))
+
+# OpenTelemetry traces of HTTP requests with their Redis calls and SQL
+# queries: TRACING_SAMPLE_RATE of the traces (head sampling) plus every
+# request slower than TRACING_SLOW_THRESHOLD or failing (tail sampling),
+# exported in batches from a background thread to TRACING_EXPORTER: "file"
+# (JSON lines at TRACING_FILE_PATH) or "otlp" (a collector, over HTTP)
+TRACING_ENABLED = getenv_bool("TRACING_ENABLED")
+TRACING_SERVICE_NAME = getenv("TRACING_SERVICE_NAME", "url-shortener")
+TRACING_SAMPLE_RATE = float(getenv("TRACING_SAMPLE_RATE", "0.01"))
+TRACING_SLOW_THRESHOLD = float(getenv("TRACING_SLOW_THRESHOLD", "0.01"))  # seconds
+TRACING_EXPORTER = getenv("TRACING_EXPORTER", "file")
+TRACING_FILE_PATH = getenv("TRACING_FILE_PATH", "traces.jsonl")
+TRACING_OTLP_ENDPOINT = getenv(
+    "TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"
+)
+TRACING_EXCLUDED_PATHS = getenv("TRACING_EXCLUDED_PATHS", "/metrics,/healthz,/readyz")
+TRACING_QUEUE_SIZE = int(getenv("TRACING_QUEUE_SIZE", "2048"))
+TRACING_BATCH_SIZE = int(getenv("TRACING_BATCH_SIZE", "512"))
+TRACING_EXPORT_INTERVAL = float(getenv("TRACING_EXPORT_INTERVAL", "1.0"))  # seconds
+TRACING_MAX_PENDING_TRACES = int(getenv("TRACING_MAX_PENDING_TRACES", "10000"))
+
+# Opt-in profiling of live workers through GET /admin/profile, which stays
+# disabled until PROFILING_TOKEN is set as well
+PROFILING_ENABLED = getenv_bool("PROFILING_ENABLED")
+PROFILING_TOKEN = getenv("PROFILING_TOKEN")
+PROFILING_MAX_SECONDS = float(getenv("PROFILING_MAX_SECONDS", "60"))
+PROFILING_SAMPLE_INTERVAL = float(getenv("PROFILING_SAMPLE_INTERVAL", "0.005"))
+
+# Storage answering cache misses: "postgres", "sqlite" for redirect-only
+# edge nodes reading a local copy kept in sync from the primary's change
+# stream (published by the primary with CHANGE_STREAM_ENABLED), or "mmap" for
+# read-only replicas reading an immutable token index file
+STORAGE_BACKEND = getenv("STORAGE_BACKEND", "postgres")
+EMBEDDED_DB_PATH = getenv("EMBEDDED_DB_PATH", "data/urls.sqlite3")
+EMBEDDED_RELOAD_INTERVAL = float(getenv("EMBEDDED_RELOAD_INTERVAL", "5.0"))  # seconds
+EMBEDDED_SYNC_REDIS_URL = getenv("EMBEDDED_SYNC_REDIS_URL", REDIS_URL)
+EMBEDDED_SYNC_INTERVAL = float(getenv("EMBEDDED_SYNC_INTERVAL", "1.0"))  # seconds
+CHANGE_STREAM_ENABLED = getenv_bool("CHANGE_STREAM_ENABLED")
+
+# Multi-region: each region creates tokens starting with its own prefix
+# characters ("sa=ABCDEF,us=GHIJKL") and replicates new mappings to its peers
+# through a Redis stream read from every peer Redis ("us=redis://host:6379/0")
+REGION_ID = getenv("REGION_ID", "")
+REGION_TOKEN_PREFIXES = getenv("REGION_TOKEN_PREFIXES", "")
+REGION_PEER_REDIS_URLS = getenv("REGION_PEER_REDIS_URLS", "")
+REGION_LOOKUP_TIMEOUT = float(getenv("REGION_LOOKUP_TIMEOUT", "0.3"))  # seconds
+REGION_MISS_TIMEOUT = int(getenv("REGION_MISS_TIMEOUT", "2"))  # seconds
+REPLICATION_STREAM_MAXLEN = int(getenv("REPLICATION_STREAM_MAXLEN", "1000000"))
+REPLICATION_BATCH_SIZE = int(getenv("REPLICATION_BATCH_SIZE", "500"))
+REPLICATION_INTERVAL = float(getenv("REPLICATION_INTERVAL", "0.5"))  # seconds
+
+# Change feed: inserts, updates and deletes on url_shortened (made by the app,
+# replication, migrations or imports) streamed to every worker, which drops
+# its stale local cache entries; one worker at a time bulk-updates Redis.
+# CHANGE_FEED_SOURCE "postgres" listens to the table trigger's notifications
+# on a direct connection per worker (LISTEN does not survive PgBouncer
+# transaction pooling; counted in DB_CONNECTION_BUDGET), "stream" reads the
+# replication stream instead. The trigger is installed separately:
+# `python -m app.generator.changefeed enable`
+CHANGE_FEED_ENABLED = getenv_bool("CHANGE_FEED_ENABLED")
+CHANGE_FEED_SOURCE = getenv("CHANGE_FEED_SOURCE", "postgres")
+CHANGE_FEED_DATABASE_URL = getenv("CHANGE_FEED_DATABASE_URL", DATABASE_URL)
+CHANGE_FEED_BATCH_SIZE = int(getenv("CHANGE_FEED_BATCH_SIZE", "500"))
+CHANGE_FEED_INTERVAL = float(getenv("CHANGE_FEED_INTERVAL", "0.2"))  # seconds
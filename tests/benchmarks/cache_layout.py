@@ -0,0 +1,93 @@
+"""
+Compares Redis memory usage of the "key" and "hash" cache layouts.
+
+    python -m tests.benchmarks.cache_layout --entries 10000000 \
+        --redis-url redis://localhost:6379/15
+
+Needs a real Redis >= 7.4 (HEXPIRE). The target database is FLUSHED before
+each layout is loaded, so point it at a scratch database. For the hash
+layout to stay listpack encoded, configure Redis with a
+`hash-max-listpack-value` above the URL size, e.g.
+`redis-cli config set hash-max-listpack-value 256`.
+"""
+
+import argparse
+import json
+import random
+import time
+
+import redis
+
+from app.core.cache import HashBucketCache, KeyCache
+from app.generator.service import ALPHANUMERIC_CHARS
+
+TOKEN_CHARS = "".join(sorted(set(ALPHANUMERIC_CHARS.upper())))
+
+
+def random_tokens(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "".join(rng.choice(TOKEN_CHARS) for _ in range(6))
+
+
+def load(cache, entries: int, url_size: int, batch: int, ttl: int) -> float:
+    url = "https://example.com/" + "x" * max(url_size - 20, 0)
+    pipe = cache.client.pipeline(transaction=False)
+    start = time.perf_counter()
+    for i, token in enumerate(random_tokens(entries), start=1):
+        if isinstance(cache, HashBucketCache):
+            key, field = cache.locate(token)
+            pipe.hset(key, field, url)
+            pipe.hexpire(key, ttl, field)
+        else:
+            pipe.set(token, url, ex=ttl)
+        if i % batch == 0:
+            pipe.execute()
+    pipe.execute()
+    return time.perf_counter() - start
+
+
+def measure(client: redis.Redis, cache, args) -> dict:
+    client.flushdb()
+    baseline = client.info("memory")["used_memory"]
+    elapsed = load(cache, args.entries, args.url_size, args.batch, args.ttl)
+    used = client.info("memory")["used_memory"] - baseline
+
+    sample_key = client.randomkey()
+    return {
+        "entries": args.entries,
+        "keys": client.dbsize(),
+        "used_memory_bytes": used,
+        "bytes_per_entry": round(used / args.entries, 2),
+        "sample_encoding": sample_key and client.object("encoding", sample_key),
+        "load_seconds": round(elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--entries", type=int, default=10_000_000)
+    parser.add_argument("--url-size", type=int, default=48)
+    parser.add_argument("--prefix-length", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--ttl", type=int, default=60 * 60 * 24)
+    args = parser.parse_args()
+
+    client = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    results = {
+        "key": measure(client, KeyCache(client), args),
+        "hash": measure(client, HashBucketCache(client, args.prefix_length), args),
+    }
+    results["hash"]["saved_pct"] = round(
+        100
+        * (results["key"]["used_memory_bytes"] - results["hash"]["used_memory_bytes"])
+        / results["key"]["used_memory_bytes"],
+        2,
+    )
+    client.flushdb()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
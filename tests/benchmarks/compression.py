@@ -0,0 +1,111 @@
+"""
+Measures the storage saved by URL compression and its cost per redirect.
+
+    python -m tests.benchmarks.compression --urls 20000 --min-length 128
+    python -m tests.benchmarks.compression --input urls.txt --train
+
+`--input` reads one URL per line (e.g. an export of `url_shortened.url`),
+otherwise synthetic campaign URLs are generated. With `--train` a dictionary
+is trained on half of the sample and evaluated on the other half.
+"""
+
+import argparse
+import json
+import random
+import string
+import time
+
+from app.core.compression import DEFAULT_DICTIONARY, UrlCompressor, train_dictionary
+
+HOSTS = [
+    "https://www.mercadolivre.com.br",
+    "https://eletronicos.mercadolivre.com.br",
+    "https://produto.mercadolivre.com.br",
+    "https://play.mercadolivre.com.br",
+    "https://example.com",
+]
+PARAMS = [
+    "utm_source",
+    "utm_medium",
+    "utm_campaign",
+    "utm_content",
+    "tracking_id",
+    "position",
+    "search_layout",
+    "is_advertising",
+    "ad_click_id",
+    "pdp_filters",
+]
+
+
+def _random_word(rng: random.Random, size: int) -> str:
+    alphabet = string.ascii_lowercase + string.digits
+    return "".join(rng.choice(alphabet) for _ in range(size))
+
+
+def synthetic_urls(count: int, seed: int = 42) -> list[str]:
+    rng = random.Random(seed)
+    urls = []
+    for _ in range(count):
+        segments = rng.randint(1, 4)
+        path = "/".join(_random_word(rng, rng.randint(4, 24)) for _ in range(segments))
+        params = rng.sample(PARAMS, rng.randint(0, len(PARAMS)))
+        query = "&".join(f"{p}={_random_word(rng, rng.randint(3, 36))}" for p in params)
+        urls.append(f"{rng.choice(HOSTS)}/{path}" + (f"?{query}" if query else ""))
+    return urls
+
+
+def run(urls: list[str], compressor: UrlCompressor) -> dict:
+    start = time.perf_counter_ns()
+    stored = [compressor.compress(url) for url in urls]
+    encode_ns = (time.perf_counter_ns() - start) / len(urls)
+
+    start = time.perf_counter_ns()
+    for value in stored:
+        compressor.decompress(value)
+    decode_ns = (time.perf_counter_ns() - start) / len(urls)
+
+    raw_bytes = sum(len(url.encode()) for url in urls)
+    stored_bytes = sum(len(value.encode()) for value in stored)
+    compressed = [value for value in stored if value.startswith(compressor.prefix)]
+
+    return {
+        "urls": len(urls),
+        "compressed_urls": len(compressed),
+        "min_length": compressor.min_length,
+        "dictionary_bytes": len(compressor.dictionary),
+        "raw_bytes": raw_bytes,
+        "stored_bytes": stored_bytes,
+        "bytes_saved": raw_bytes - stored_bytes,
+        "saved_pct": round(100 * (raw_bytes - stored_bytes) / raw_bytes, 2),
+        "encode_ns_per_url": round(encode_ns),
+        "decode_ns_per_redirect": round(decode_ns),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--input", help="file with one URL per line")
+    parser.add_argument("--urls", type=int, default=20000)
+    parser.add_argument("--min-length", type=int, default=128)
+    parser.add_argument("--train", action="store_true")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input) as f:
+            urls = [line.strip() for line in f if line.strip()]
+    else:
+        urls = synthetic_urls(args.urls)
+
+    dictionary = DEFAULT_DICTIONARY
+    if args.train:
+        middle = len(urls) // 2
+        dictionary = train_dictionary(urls[:middle])
+        urls = urls[middle:]
+
+    result = run(urls, UrlCompressor(dictionary, min_length=args.min_length))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
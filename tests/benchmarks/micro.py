@@ -0,0 +1,176 @@
+"""
+Micro-benchmarks of the service-layer hot functions.
+
+    python -m tests.benchmarks.micro
+    python -m tests.benchmarks.micro --filter retrieve --json
+
+Each case runs in isolation on the same fakes the unit tests use
+(`FakeSession` from app/conftest.py and fakeredis), so only the Python cost
+of our own code and its libraries is measured. Reports ns/op (best of
+several rounds, like pytest-benchmark's "min") and the bytes allocated per
+call measured with tracemalloc.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+
+import fakeredis
+
+import app.generator.service as service
+import app.generator.warmup as warmup
+from app.conftest import FakeSession
+from app.core.cache import KeyCache, LocalCache
+from app.generator.links import Link
+from app.generator.utils import is_safe_url_path, validate_url_scheme
+
+LONG_URL = (
+    "https://www.mercadolivre.com.br/smart-camera-wi-fi/p/MLB27823553"
+    "?pdp_filters=item_id:MLB4460338862#is_advertising=true&position=1"
+    "&search_layout=grid&type=pad&tracking_id=a2808f20-3ac8-403a-a7b6"
+)
+
+
+def _setup():
+    cache_client = fakeredis.FakeRedis(decode_responses=True)
+    service.url_cache = KeyCache(cache_client)
+    service.local_cache = LocalCache(0, 60)
+    service.BASE_URL = "http://short"
+    warmup.HOTSET_SAMPLE_RATE = 0
+    return cache_client
+
+
+def _cases(loop: asyncio.AbstractEventLoop):
+    cache_client = _setup()
+    cache_client.set("REDIS1", LONG_URL)
+    local = LocalCache(10, 60)
+    local.set("LOCAL1", Link(LONG_URL))
+    miss_session = FakeSession(return_value=LONG_URL)
+    miss_session.exec_args = _Discard()
+
+    def run(coro_fn):
+        return lambda n: loop.run_until_complete(_repeat_async(coro_fn, n))
+
+    def retrieve_local():
+        service.local_cache = local
+        return service.retrieve_url("LOCAL1", miss_session)
+
+    def retrieve_redis():
+        service.local_cache = LocalCache(0, 60)
+        return service.retrieve_url("REDIS1", miss_session)
+
+    def retrieve_db_miss():
+        service.local_cache = LocalCache(0, 60)
+        cache_client.delete("DBMISS")
+        return service.retrieve_url("DBMISS", miss_session)
+
+    def generate():
+        session = FakeSession(commit_side_effects=[None])
+        return service.generate_url_token(LONG_URL, session)
+
+    return {
+        "retrieve_url[local hit]": run(retrieve_local),
+        "retrieve_url[redis hit]": run(retrieve_redis),
+        "retrieve_url[db miss]": run(retrieve_db_miss),
+        "generate_url_token": run(generate),
+        "validate_url_scheme": lambda n: _repeat(validate_url_scheme, LONG_URL, n),
+        "is_safe_url_path": lambda n: _repeat(is_safe_url_path, "ABC123", n),
+    }
+
+
+class _Discard(list):
+    """
+    Keeps FakeSession from accumulating executed statements across runs.
+    """
+
+    def append(self, item):
+        pass
+
+
+async def _repeat_async(coro_fn, n: int):
+    for _ in range(n):
+        await coro_fn()
+
+
+def _repeat(fn, arg, n: int):
+    for _ in range(n):
+        fn(arg)
+
+
+def _calibrate(case, target_seconds: float = 0.2) -> int:
+    n = 1
+    while True:
+        start = time.perf_counter()
+        case(n)
+        if time.perf_counter() - start >= target_seconds / 10:
+            elapsed = time.perf_counter() - start
+            return max(int(n * target_seconds / 10 / elapsed), 1)
+        n *= 2
+
+
+def _allocated_bytes_per_call(case, calls: int = 200) -> float:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        case(calls)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (peak - before) / calls
+
+
+def bench(name: str, case, rounds: int) -> dict:
+    n = _calibrate(case)
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        case(n)
+        timings.append((time.perf_counter_ns() - start) / n)
+
+    return {
+        "name": name,
+        "iterations": n * rounds,
+        "min_ns": round(min(timings)),
+        "mean_ns": round(statistics.mean(timings)),
+        "stddev_ns": round(statistics.pstdev(timings)),
+        "ops_per_sec": round(1e9 / min(timings)),
+        "alloc_bytes_per_call": round(_allocated_bytes_per_call(case), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--filter", default="", help="substring of case names")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print JSON")
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    results = [
+        bench(name, case, args.rounds)
+        for name, case in _cases(loop).items()
+        if args.filter in name
+    ]
+    loop.close()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    header = f"{'min ns/op':>12}{'mean ns/op':>12}{'stddev':>10}{'B/call':>10}"
+    print(f"{'case':<28}{header}")
+    for r in results:
+        print(
+            f"{r['name']:<28}{r['min_ns']:>12}{r['mean_ns']:>12}"
+            f"{r['stddev_ns']:>10}{r['alloc_bytes_per_call']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
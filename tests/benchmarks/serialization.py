@@ -0,0 +1,90 @@
+"""
+Serialization cost per request of the JSON responses and request bodies.
+
+    python -m tests.benchmarks.serialization
+
+Compares, for the bodies the URL routes produce, the stdlib-backed
+`JSONResponse` (the previous default), `ORJSONResponse` and the
+pre-encoded constant bodies, plus request parsing through `json.loads` and
+model validation against `model_validate_json`. Reports ns per request and
+the saving against the previous path.
+"""
+
+import argparse
+import json
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.generator.routes import url as routes
+from app.generator.schema import DeleteURLResponse, GeneratorRequest, StandardResponse
+from tests.benchmarks.micro import bench
+
+REQUEST_BODY = json.dumps(
+    {"url": "https://www.mercadolivre.com.br/p/MLB27823553?position=1&type=pad"}
+).encode()
+CREATED = {"success": True, "data": {"url": "http://localhost:8000/ABC123"}}
+DELETED = {"success": True, "data": {"message": "URL deleted successfully"}}
+DELETE_MODEL = StandardResponse[DeleteURLResponse]
+
+
+def _loop(fn):
+    def _case(n: int):
+        for _ in range(n):
+            fn()
+
+    return _case
+
+
+CASES = {
+    "error body": {
+        "JSONResponse": lambda: JSONResponse({"detail": "Bad token"}, 400),
+        "ORJSONResponse": lambda: ORJSONResponse({"detail": "Bad token"}, 400),
+        "pre-encoded": lambda: routes._json(routes.BAD_TOKEN, 400),
+    },
+    "create response": {
+        "JSONResponse": lambda: JSONResponse({**CREATED, "message": None}),
+        "ORJSONResponse": lambda: ORJSONResponse({**CREATED, "message": None}),
+    },
+    "delete response": {
+        "response_model + JSONResponse": lambda: JSONResponse(
+            jsonable_encoder(DELETE_MODEL.model_validate(DELETED))
+        ),
+        "pre-encoded": lambda: routes._json(routes.DELETED, 200),
+    },
+    "request body": {
+        "json.loads + model_validate": lambda: GeneratorRequest.model_validate(
+            json.loads(REQUEST_BODY)
+        ),
+        "model_validate_json": lambda: GeneratorRequest.model_validate_json(
+            REQUEST_BODY
+        ),
+    },
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print JSON")
+    args = parser.parse_args()
+
+    results = []
+    for group, variants in CASES.items():
+        baseline = None
+        for name, fn in variants.items():
+            result = bench(f"{group}: {name}", _loop(fn), args.rounds)
+            baseline = baseline or result["min_ns"]
+            result["saved_ns"] = baseline - result["min_ns"]
+            results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for r in results:
+        print(f"{r['name']:<54}{r['min_ns']:>8} ns{r['saved_ns']:>8} ns saved")
+
+
+if __name__ == "__main__":
+    main()
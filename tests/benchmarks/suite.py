@@ -0,0 +1,279 @@
+"""
+Reproducible benchmark of the redirect, creation and deletion paths.
+
+    python -m tests.benchmarks.suite --tokens 1000000 --requests 50000 \
+        --output tests/results/bench.json
+
+Seeds a throwaway database (SQLite by default, or any `--database-url` such
+as a scratch PostgreSQL) and drives the real FastAPI app in-process through
+httpx, with fakeredis (or `--redis-url`) as the cache. Redirect traffic
+follows a Zipf distribution over the seeded tokens, with a share of unknown
+tokens. Results are written as JSON with p50/p90/p99 latency and RPS per
+scenario, checked against the targets: 90% of redirects under 10ms and
+every creation under 1000ms.
+
+Latencies include the ASGI app, middleware, cache and database layers, but
+not the network or the HTTP server.
+"""
+
+import argparse
+import asyncio
+import bisect
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import secrets
+import subprocess
+import tempfile
+import time
+from collections import Counter
+
+import fakeredis
+import httpx
+import redis
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.dependencies as dependencies
+import app.generator.service as service
+import app.generator.warmup as warmup
+from app.core.cache import KeyCache
+from app.core.database import Base
+from app.generator.models import UrlShorted
+from app.main import app
+
+REDIRECT_P90_TARGET_MS = 10
+CREATE_MAX_TARGET_MS = 1000
+TOKEN_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+
+class ZipfSampler:
+    """
+    Samples ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** s.
+    """
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self.rng = rng
+        self.cumulative = list(
+            itertools.accumulate(1 / (rank + 1) ** s for rank in range(n))
+        )
+
+    def sample(self) -> int:
+        point = self.rng.random() * self.cumulative[-1]
+        return bisect.bisect_left(self.cumulative, point)
+
+
+def random_token(rng: random.Random) -> str:
+    return "".join(rng.choice(TOKEN_CHARS) for _ in range(6))
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(len(sorted_values) * pct / 100), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(name: str, latencies: list[float], statuses: Counter, elapsed: float):
+    ordered = sorted(latencies)
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 50), 3),
+        "p90_ms": round(percentile(ordered, 90), 3),
+        "p99_ms": round(percentile(ordered, 99), 3),
+        "max_ms": round(ordered[-1], 3) if ordered else 0.0,
+        "status_codes": dict(sorted(statuses.items())),
+    }
+
+
+async def seed(database_url: str, count: int, rng: random.Random) -> list[str]:
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    tokens = list({random_token(rng) for _ in range(count)})
+    rng.shuffle(tokens)
+    async with engine.begin() as conn:
+        for i in range(0, len(tokens), 10_000):
+            rows = [
+                {"id": token, "url": f"https://example.com/{token.lower()}?ref=bench"}
+                for token in tokens[i : i + 10_000]
+            ]
+            await conn.execute(insert(UrlShorted), rows)
+    await engine.dispose()
+    return tokens
+
+
+def install_backends(database_url: str, redis_url: str | None):
+    """
+    Points the app at the benchmark database and cache.
+    """
+    engine = create_async_engine(database_url)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def _get_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[dependencies.get_db] = _get_db
+    dependencies.RATE_LIMIT_ENABLED = False
+
+    if redis_url:
+        cache_client = redis.Redis.from_url(redis_url, decode_responses=True)
+        cache_client.flushdb()
+    else:
+        cache_client = fakeredis.FakeRedis(decode_responses=True)
+    service.url_cache = KeyCache(cache_client)
+    warmup.redis_client = cache_client
+    warmup.url_cache = service.url_cache
+    return engine
+
+
+async def run_scenario(name, client, make_request, total, concurrency):
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    remaining = iter(range(total))
+
+    async def _worker():
+        for _ in remaining:
+            method, path, kwargs = make_request()
+            start = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[f"{method} {response.status_code}"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_worker() for _ in range(concurrency)))
+    return summarize(name, latencies, statuses, time.perf_counter() - start)
+
+
+async def main_async(args) -> dict:
+    rng = random.Random(args.seed)
+    database_url = args.database_url
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "bench.db")
+        database_url = f"sqlite+aiosqlite:///{path}"
+
+    seed_start = time.perf_counter()
+    tokens = await seed(database_url, args.tokens, rng)
+    seed_seconds = time.perf_counter() - seed_start
+
+    engine = install_backends(database_url, args.redis_url)
+    zipf = ZipfSampler(len(tokens), args.zipf_s, rng)
+    created: list[str] = []
+
+    def redirect():
+        if rng.random() < args.miss_ratio:
+            return "GET", f"/{random_token(rng)}", {}
+        return "GET", f"/{tokens[zipf.sample()]}", {}
+
+    def create():
+        url = f"https://example.com/{secrets.token_hex(8)}?utm_source=bench"
+        return "POST", "/", {"json": {"url": url}}
+
+    def delete():
+        token = created.pop() if created else random_token(rng)
+        return "DELETE", f"/{token}", {}
+
+    def mixed():
+        roll = rng.random()
+        if roll < args.create_ratio:
+            return create()
+        if roll < args.create_ratio + args.delete_ratio:
+            return delete()
+        return redirect()
+
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", follow_redirects=False
+    ) as client:
+        original_request = client.request
+
+        async def tracking_request(method, path, **kwargs):
+            response = await original_request(method, path, **kwargs)
+            if method == "POST" and response.status_code == 200:
+                created.append(response.json()["data"]["url"].rsplit("/", 1)[-1])
+            return response
+
+        client.request = tracking_request
+
+        for name, factory, total in [
+            ("redirect_zipf", redirect, args.requests),
+            ("create", create, args.creates),
+            ("mixed", mixed, args.requests),
+        ]:
+            results.append(
+                await run_scenario(name, client, factory, total, args.concurrency)
+            )
+
+    await engine.dispose()
+    app.dependency_overrides.clear()
+
+    by_name = {result["scenario"]: result for result in results}
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "database": database_url.split(":", 1)[0],
+        "cache": "redis" if args.redis_url else "fakeredis",
+        "params": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in {"output", "database_url", "redis_url"}
+        },
+        "seed_seconds": round(seed_seconds, 2),
+        "scenarios": results,
+        "targets": {
+            "redirect_p90_under_10ms": by_name["redirect_zipf"]["p90_ms"]
+            < REDIRECT_P90_TARGET_MS,
+            "create_max_under_1000ms": by_name["create"]["max_ms"]
+            < CREATE_MAX_TARGET_MS,
+        },
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    # httpx logs every request at INFO, which would dominate the measurements
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--creates", type=int, default=2_000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--zipf-s", type=float, default=1.1)
+    parser.add_argument("--miss-ratio", type=float, default=0.02)
+    parser.add_argument("--create-ratio", type=float, default=0.08)
+    parser.add_argument("--delete-ratio", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--redis-url", help="defaults to fakeredis (flushed if set)")
+    parser.add_argument("--output", help="JSON file, printed to stdout otherwise")
+    args = parser.parse_args()
+
+    result = asyncio.run(main_async(args))
+    report = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Lookup cost of the memory-mapped token index against the Redis cache and
+the embedded SQLite store.
+
+    python -m tests.benchmarks.token_index --tokens 1000000
+    python -m tests.benchmarks.token_index --redis-url redis://localhost:6379/15
+
+Builds every store with the same random tokens and times lookups of a
+shuffled sample of them (plus unknown tokens), from a single process. With
+fakeredis the Redis column only measures the client-side cost; pass a
+scratch `--redis-url` (flushed) to include the round trip.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import fakeredis
+import redis
+
+from app.core.cache import KeyCache
+from app.core.storage import MmapUrlStore, SqliteUrlStore
+from app.core.token_index import write_index
+from tests.benchmarks.suite import random_token
+
+
+def time_lookups(get, tokens: list[str]) -> dict:
+    start = time.perf_counter_ns()
+    found = sum(1 for token in tokens if get(token) is not None)
+    elapsed = time.perf_counter_ns() - start
+    return {"ns_per_lookup": round(elapsed / len(tokens)), "found": found}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=200_000)
+    parser.add_argument("--lookups", type=int, default=50_000)
+    parser.add_argument("--miss-ratio", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--redis-url", help="defaults to fakeredis (flushed if set)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    tokens = sorted({random_token(rng) for _ in range(args.tokens)})
+    rows = [
+        (token, f"https://example.com/{token.lower()}?ref=bench") for token in tokens
+    ]
+    sample = [
+        random_token(rng) if rng.random() < args.miss_ratio else rng.choice(tokens)
+        for _ in range(args.lookups)
+    ]
+
+    directory = tempfile.mkdtemp(prefix="bench-index-")
+    index_path = os.path.join(directory, "tokens.idx")
+    start = time.perf_counter()
+    write_index(index_path, rows)
+    build_seconds = time.perf_counter() - start
+    index_store = MmapUrlStore(index_path)
+
+    sqlite_store = SqliteUrlStore(os.path.join(directory, "urls.sqlite3"))
+    sqlite_store.load(rows, "0-0")
+
+    if args.redis_url:
+        client = redis.Redis.from_url(args.redis_url, decode_responses=True)
+        client.flushdb()
+    else:
+        client = fakeredis.FakeRedis(decode_responses=True)
+    cache = KeyCache(client)
+    for i in range(0, len(rows), 10_000):
+        cache.set_many(rows[i : i + 10_000], ex=3600)
+
+    result = {
+        "tokens": len(tokens),
+        "lookups": len(sample),
+        "index_bytes": os.path.getsize(index_path),
+        "index_build_seconds": round(build_seconds, 3),
+        "mmap_index": time_lookups(index_store.get, sample),
+        "sqlite": time_lookups(sqlite_store.get, sample),
+        "redis" if args.redis_url else "fakeredis": time_lookups(cache.get, sample),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()